@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+批量请求基准测试：同样 N 个个性化任务，对比逐条发布 sendWechatMessage 与一条 sendWechatBatch（未压缩、zlib、gzip）
+的消息数、传输字节数、解码并展开全部任务的耗时，以及解码时的内存峰值（tracemalloc）。
+另给出把所有任务放进一个 JSON 数组整体解码的内存峰值作为对照
+
+用法:
+    python -m benchmarks.batch_benchmark
+    python -m benchmarks.batch_benchmark --tasks 20000 --text-size 200
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from service.batch import decode_payload, encode_batch
+from utils.json_utils import DECODER_JSON, create_json_decoder
+
+TEMPLATE = "${name}您好，您的订单 ${order} 已发货，"
+
+
+def make_tasks(tasks: int) -> list:
+    return [{"chatNames": [f"客户{i}"], "vars": {"name": f"客户{i}", "order": f"SO{i:08d}"}} for i in range(tasks)]
+
+
+def measure(label: str, payloads: list, decoder) -> dict:
+    """解码全部消息并遍历展开后的任务"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = 0
+    for payload in payloads:
+        content = decode_payload(payload, decoder)
+        if isinstance(content, dict):
+            count += 1
+        else:
+            count += sum(1 for task in content if task.error is None)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"label": label, "messages": len(payloads), "bytes": sum(len(p) for p in payloads), "tasks": count,
+            "tasks_per_s": count / elapsed, "peak_kib": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=5000, help='任务数')
+    parser.add_argument('--text-size', type=int, default=100, help='模板之后的固定文本长度（字符）')
+    args = parser.parse_args()
+
+    decoder = create_json_decoder(DECODER_JSON)
+    text = TEMPLATE + "详情" * (args.text_size // 2)
+    tasks = make_tasks(args.tasks)
+    defaults = {"messages": [text], "imageUrls": ["http://example.com/banner.jpg"]}
+
+    # 生产者自行展开后逐条发布
+    singles = []
+    for i, task in enumerate(tasks):
+        message = text.replace("${name}", task["vars"]["name"]).replace("${order}", task["vars"]["order"])
+        singles.append(json.dumps({"method": "sendWechatMessage", "chatNames": task["chatNames"],
+                                   "messages": [message], "imageUrls": defaults["imageUrls"],
+                                   "taskId": f"b1-{i + 1}"}, ensure_ascii=False).encode('utf-8'))
+    results = [measure('single', singles, decoder)]
+    for compression in (None, 'zlib', 'gzip'):
+        payload = encode_batch(tasks, defaults, batch_id='b1', compression=compression)
+        results.append(measure(f"batch+{compression or 'plain'}", [payload], decoder))
+
+    # 对照：所有任务放在一个 JSON 对象中，整体解码
+    array = json.dumps({"defaults": defaults, "tasks": tasks}, ensure_ascii=False).encode('utf-8')
+    tracemalloc.start()
+    decoder(array)
+    array_peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    print(f"tasks={args.tasks}")
+    for result in results:
+        print(f"{result['label']:<12} messages={result['messages']:<6} bytes={result['bytes']:>10}  "
+              f"decode={result['tasks_per_s']:>9.0f} tasks/s  peak={result['peak_kib']:>9.0f} KiB")
+    print(f"{'json-array':<12} messages=1      bytes={len(array):>10}  peak={array_peak:>9.0f} KiB（整体解码）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+多节点分摊测试：本地启动 MQTT 服务器替身，每个节点在单独的进程中运行 WxMqtt 和使用假界面操作的 WeChatService，
+生产者向任务主题发布一批任务（其中一部分用 node 字段指定节点），从结果主题收集各节点发布的结果。对比两种订阅方式：
+
+    plain   普通订阅，每个节点都收到全部任务，未指定节点的任务被重复发送
+    shared  $share 共享订阅，同组节点分摊任务
+
+输出从发布到所有任务都有结果的耗时、各节点发送的任务数、重复发送的任务数、
+指定节点的任务是否都由该节点发送，以及各节点报告的最大排队数
+
+用法:
+    python -m benchmarks.cluster_benchmark
+    python -m benchmarks.cluster_benchmark --nodes 1 2 4 --tasks 120 --ui-time 0.05 --pinned 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.fake_broker import FakeBroker
+from benchmarks.prefetch_benchmark import FakeWxOperation
+from service.reconnect import create_client
+
+TOPIC = 'wx/bench/tasks'
+SHARE_GROUP = 'wechat'
+
+
+def run_node(port: int, node_id: str, share_group: str, ui_time: float, stop) -> None:
+    """节点进程：与 mqtt_main 相同地运行一个 WxMqtt，界面操作换成固定耗时的假操作"""
+    from config import Mqtt
+    from core.wx_operation_service import WeChatService, set_wechat_service
+    from service.mqtt_service import WxMqtt
+    from utils.dedup_utils import DedupCache, set_dedup_cache
+
+    Mqtt.LOAD_INTERVAL = 0.5
+    set_dedup_cache(DedupCache(path=None))
+    service = WeChatService(prefetch_depth=0)
+    wx = FakeWxOperation(ui_time)
+    service._get_wx_instance = lambda: wx
+    set_wechat_service(service)
+
+    node = WxMqtt('127.0.0.1', port, subscribe_topic=TOPIC, client_id=f'bench-{node_id}',
+                  share_group=share_group, node_id=node_id)
+    node.start()
+    stop.wait()
+    node.stop()
+
+
+class Producer:
+    """发布任务并收集结果和负载报告"""
+
+    def __init__(self, port: int):
+        self.results = defaultdict(list)  # taskId -> 发送该任务的节点
+        self.load = defaultdict(int)  # 节点 -> 报告过的最大排队数
+        self.last_result = time.monotonic()
+        self._lock = threading.Lock()
+        self._subscribed = threading.Event()
+        self.client = create_client('bench-producer')
+        self.client.on_connect = self.on_connect
+        self.client.on_subscribe = lambda *args: self._subscribed.set()
+        self.client.on_message = self.on_message
+        self.client.connect('127.0.0.1', port)
+        self.client.loop_start()
+        self._subscribed.wait(10)
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        client.subscribe([(TOPIC + '/result', 1), (TOPIC + '/load/+', 0)])
+
+    def on_message(self, client, userdata, msg):
+        if not msg.payload:
+            return
+        content = json.loads(msg.payload)
+        with self._lock:
+            if content.get("method") == "wechatNodeLoad":
+                self.load[content["node"]] = max(self.load[content["node"]], content["queued"])
+                return
+            for result in content["results"]:
+                self.results[result["taskId"]].append(content["node"])
+            self.last_result = time.monotonic()
+
+    def publish(self, task: dict) -> None:
+        self.client.publish(TOPIC, json.dumps(task, ensure_ascii=False), qos=1)
+
+    def wait(self, tasks: int, idle: float, timeout: float) -> float:
+        """等到所有任务都有结果，且 idle 秒内没有新结果（收齐重复发送的结果）；返回所有任务都有结果的时刻"""
+        deadline, complete_at = time.monotonic() + timeout, None
+        while time.monotonic() < deadline:
+            with self._lock:
+                if complete_at is None and len(self.results) >= tasks:
+                    complete_at = time.monotonic()
+                if complete_at is not None and time.monotonic() - self.last_result >= idle:
+                    break
+            time.sleep(0.05)
+        return complete_at or time.monotonic()
+
+    def close(self) -> None:
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def run(nodes: int, share_group: str, tasks: int, pinned: float, ui_time: float) -> dict:
+    broker = FakeBroker()
+    broker.start()
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    node_ids = [f'node{i}' for i in range(nodes)]
+    processes = [context.Process(target=run_node, args=(broker.port, node_id, share_group, ui_time, stop))
+                 for node_id in node_ids]
+    for process in processes:
+        process.start()
+    for node_id in node_ids:
+        broker.wait_subscribed(f'bench-{node_id}', timeout=60)
+
+    producer = Producer(broker.port)
+    expected_node = {}
+    start = time.monotonic()
+    for i in range(tasks):
+        task = {"method": "sendWechatMessage", "chatNames": [f"chat{i}"], "messages": [f"通知 {i}"],
+                "taskId": f"t{i}"}
+        # 每隔若干个任务指定一个节点，模拟只有该节点的微信账号能联系到的接收方
+        if pinned and i % round(1 / pinned) == 0:
+            task["node"] = expected_node[task["taskId"]] = node_ids[i % nodes]
+        producer.publish(task)
+    complete_at = producer.wait(tasks, idle=max(1.0, ui_time * 10), timeout=tasks * ui_time * 2 + 60)
+    producer.close()
+
+    stop.set()
+    for process in processes:
+        process.join(30)
+    broker.stop()
+
+    sends = Counter(node for senders in producer.results.values() for node in senders)
+    return {
+        "elapsed_s": complete_at - start,
+        "completed": len(producer.results),
+        "sends": dict(sorted(sends.items())),
+        "duplicates": sum(len(senders) - 1 for senders in producer.results.values()),
+        "pinned_ok": sum(producer.results.get(task_id) == [node] for task_id, node in expected_node.items()),
+        "pinned": len(expected_node),
+        "max_queued": dict(sorted(producer.load.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1, 3], help='要比较的节点数')
+    parser.add_argument('--tasks', type=int, default=60, help='任务数')
+    parser.add_argument('--ui-time', type=float, default=0.05, help='每个聊天的界面操作耗时（秒）')
+    parser.add_argument('--pinned', type=float, default=0.2, help='指定节点的任务占比')
+    args = parser.parse_args()
+
+    for nodes in args.nodes:
+        for mode, share_group in (('plain', ''), ('shared', SHARE_GROUP)):
+            if nodes == 1 and mode == 'plain':
+                continue
+            result = run(nodes, share_group, args.tasks, args.pinned, args.ui_time)
+            print(f"nodes={nodes} {mode:<6} total={result['elapsed_s']:>6.2f}s  "
+                  f"completed={result['completed']}/{args.tasks}  duplicates={result['duplicates']:<4} "
+                  f"pinned={result['pinned_ok']}/{result['pinned']}  sends={result['sends']}  "
+                  f"max_queued={result['max_queued']}")
+
+
+if __name__ == '__main__':
+    main()
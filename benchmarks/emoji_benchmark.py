@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+emoji 统计基准测试：对比旧实现（每次调用编译正则并 findall 后逐段求和）与预编译的 count_emoji
+
+用法:
+    python -m benchmarks.emoji_benchmark
+    python -m benchmarks.emoji_benchmark --length 20000 --repeat 200
+"""
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+
+from utils.text_utils import count_emoji
+
+# 中英文、emoji、组合表情与换行混排的素材
+SAMPLES = ['Hello world ', '你好，世界。', '今天的群发通知：', '😀', '👍🏻', '👨‍👩‍👧', '🇨🇳', '❤️', '〰', '\n',
+           'Price: 100$ ', 'ข่าวประจำวัน ', 'Привет ', '★', '⏩', '⌚']
+
+
+def legacy_count_emoji(text: str) -> int:
+    """原 WxOperation.__send_text 中的实现"""
+    emoji_pattern = re.compile("["
+                               "\U0001F600-\U0001F64F"
+                               "\U0001F300-\U0001F5FF"
+                               "\U0001F680-\U0001F6FF"
+                               "\U0001F1E0-\U0001F1FF"
+                               "\U00002500-\U00002BEF"
+                               "\U00002702-\U000027B0"
+                               "\U00002702-\U000027B0"
+                               "\U000024C2-\U0001F251"
+                               "\U0001f926-\U0001f937"
+                               "\U00010000-\U0010ffff"
+                               "♀-♂"
+                               "☀-⭕"
+                               "‍"
+                               "⏏"
+                               "⏩"
+                               "⌚"
+                               "️"
+                               "〰"
+                               "]+", flags=re.UNICODE)
+    return sum(len(emoji_group) for emoji_group in emoji_pattern.findall(text))
+
+
+def make_message(length: int, seed: int) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < length:
+        part = rng.choice(SAMPLES)
+        parts.append(part)
+        size += len(part)
+    return ''.join(parts)
+
+
+def bench(func, messages, repeat: int) -> np.ndarray:
+    timings = []
+    for _ in range(repeat):
+        for message in messages:
+            start = time.perf_counter()
+            func(message)
+            timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--length', type=int, default=5000, help='每条消息的字符数')
+    parser.add_argument('--messages', type=int, default=20, help='消息条数')
+    parser.add_argument('--repeat', type=int, default=50, help='重复次数')
+    args = parser.parse_args()
+
+    messages = [make_message(args.length, seed) for seed in range(args.messages)]
+    for message in messages:
+        assert legacy_count_emoji(message) == count_emoji(message), "新旧实现的统计结果不一致"
+
+    for name, func in (('legacy', legacy_count_emoji), ('precompiled', count_emoji)):
+        timings = bench(func, messages, args.repeat)
+        print(f"{name:<12} p50={np.percentile(timings, 50):>8.3f}ms  p95={np.percentile(timings, 95):>8.3f}ms  "
+              f"mean={timings.mean():>8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试用的最小 MQTT 服务器替身，支持 3.1.1 和 5.0：连接、订阅（含 + / # 通配符和 $share 共享订阅）、心跳、
+QoS 0/1 发布与确认、保留消息。客户端发布的消息按订阅路由，共享订阅组内按轮转投递给其中一个成员；
+测试也可以直接向已订阅的客户端推送消息。每个客户端的投递遵守其声明的 Receive Maximum。
+记录每个 client_id 的连接时间，并记住见过的会话（不保存离线消息）。stop 关闭监听和所有连接以模拟宕机，start 在同一端口恢复
+"""
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# MQTT 5.0 属性标识 -> 定长属性的字节数，其他属性按字符串/二进制处理（不含可变长整数属性）
+_FIXED_PROPERTIES = {0x01: 1, 0x02: 4, 0x11: 4, 0x17: 1, 0x19: 1, 0x21: 2, 0x22: 2, 0x23: 2, 0x24: 1, 0x25: 1,
+                     0x27: 4, 0x28: 1, 0x29: 1, 0x2A: 1}
+_SUBSCRIPTION_IDENTIFIER = 0x0B
+_RECEIVE_MAXIMUM = 0x21
+
+
+def _read_exact(conn: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError
+        data += chunk
+    return data
+
+
+def _read_varint(read) -> int:
+    value, shift = 0, 0
+    while True:
+        byte = read()
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value
+
+
+def _encode_varint(value: int) -> bytes:
+    data = bytearray()
+    while True:
+        byte, value = value & 0x7F, value >> 7
+        data.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(data)
+
+
+def _read_packet(conn: socket.socket):
+    """读取一个 MQTT 报文，返回 (报文类型, 标志, 剩余部分)"""
+    header = _read_exact(conn, 1)[0]
+    length = _read_varint(lambda: _read_exact(conn, 1)[0])
+    return header >> 4, header & 0x0F, _read_exact(conn, length)
+
+
+def _parse_properties(body: bytes, offset: int):
+    """解析 MQTT 5.0 属性，返回 (属性标识 -> 值, 属性部分结束的位置)"""
+    position = [offset]
+
+    def read_byte():
+        position[0] += 1
+        return body[position[0] - 1]
+
+    length = _read_varint(read_byte)
+    end = position[0] + length
+    properties, index = {}, position[0]
+    while index < end:
+        identifier = body[index]
+        index += 1
+        if identifier == _SUBSCRIPTION_IDENTIFIER:
+            while body[index] & 0x80:
+                index += 1
+            index += 1
+            continue
+        size = _FIXED_PROPERTIES.get(identifier)
+        if size is None:
+            size = 2 + struct.unpack('!H', body[index:index + 2])[0]
+            if identifier == 0x26:  # 用户属性是两个字符串
+                size += 2 + struct.unpack('!H', body[index + size:index + size + 2])[0]
+        properties[identifier] = int.from_bytes(body[index:index + size], 'big')
+        index += size
+    return properties, end
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """主题是否匹配订阅过滤器，支持 + 和 #"""
+    filter_levels, topic_levels = topic_filter.split('/'), topic.split('/')
+    for index, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if index >= len(topic_levels) or (level != '+' and level != topic_levels[index]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class _Session:
+    """一个客户端连接，投递的消息经发送线程按 Receive Maximum 限制未确认数"""
+
+    def __init__(self, conn: socket.socket, client_id: str, v5: bool, receive_maximum: int):
+        self.conn = conn
+        self.client_id = client_id
+        self.v5 = v5
+        self.receive_maximum = receive_maximum
+        self.subscribed = threading.Event()
+        self.subscriptions: List[Tuple[str, Optional[str], int]] = []  # (过滤器, 共享组, QoS)
+        self.inflight: Dict[int, float] = {}  # 报文标识 -> 发送时间
+        self.ack_latencies: List[float] = []
+        self.sent = 0
+        self.acked = 0
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self._next_id = 0
+        self._outbox = queue.Queue()
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def send(self, data: bytes) -> None:
+        with self.write_lock:
+            self.conn.sendall(data)
+
+    def deliver(self, topic: str, payload: bytes, qos: int, retain: bool = False) -> None:
+        self._outbox.put((topic, payload, qos, retain))
+
+    def close(self) -> None:
+        self._outbox.put(None)
+        with self.condition:
+            self.condition.notify_all()
+
+    def _send_loop(self) -> None:
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            topic, payload, qos, retain = item
+            topic_bytes = topic.encode()
+            variable = struct.pack('!H', len(topic_bytes)) + topic_bytes
+            if qos:
+                with self.condition:
+                    self.condition.wait_for(lambda: len(self.inflight) < self.receive_maximum)
+                    packet_id = self._allocate_id()
+                    self.inflight[packet_id] = time.perf_counter()
+                variable += struct.pack('!H', packet_id)
+            if self.v5:
+                variable += b'\x00'
+            body = variable + payload
+            try:
+                self.send(bytes([0x30 | (qos << 1) | retain]) + _encode_varint(len(body)) + body)
+            except OSError:
+                return
+            with self.condition:
+                self.sent += 1
+                self.condition.notify_all()
+
+    def _allocate_id(self) -> int:
+        while True:
+            self._next_id = self._next_id % 65535 + 1
+            if self._next_id not in self.inflight:
+                return self._next_id
+
+    def on_puback(self, packet_id: int) -> None:
+        with self.condition:
+            sent_at = self.inflight.pop(packet_id, None)
+            if sent_at is not None:
+                self.ack_latencies.append(time.perf_counter() - sent_at)
+                self.acked += 1
+            self.condition.notify_all()
+
+
+class FakeBroker:
+    """
+    MQTT 服务器替身
+
+    Attributes:
+    ----------
+    port: int
+        监听端口，0 表示自动分配，start 后为实际端口
+    sessions: set
+        见过的 client_id，再次连接时 CONNACK 带 session present
+    connects: list
+        (时间, client_id)，每次连接一条
+    """
+
+    def __init__(self, port: int = 0):
+        self.port = port
+        self.sessions = set()
+        self.connects = []
+        self._server = None
+        self._connections = []
+        self._clients: Dict[str, _Session] = {}
+        self._retained: Dict[str, Tuple[bytes, int]] = {}
+        self._share_cursor: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', self.port))
+        self.port = self._server.getsockname()[1]
+        self._server.listen(256)
+        threading.Thread(target=self._accept, args=(self._server,), daemon=True).start()
+
+    def stop(self) -> None:
+        # 先 shutdown 再 close，阻塞在 accept 中的线程才会立即返回，不再接受连接
+        with self._lock:
+            server, self._server = self._server, None
+        try:
+            server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        server.close()
+        with self._lock:
+            connections, self._connections = self._connections, []
+            clients, self._clients = self._clients, {}
+        for session in clients.values():
+            session.close()
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def wait_subscribed(self, client_id: str, timeout: float = 10) -> bool:
+        """等待客户端连接并订阅"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                session = self._clients.get(client_id)
+            if session and session.subscribed.wait(0.05):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def retained(self, topic_filter: str = '#') -> Dict[str, bytes]:
+        """匹配过滤器的保留消息"""
+        with self._lock:
+            return {topic: payload for topic, (payload, _) in self._retained.items()
+                    if topic_matches(topic_filter, topic)}
+
+    def publish(self, client_id: str, topic: str, payloads: List[bytes], qos: int = 1) -> dict:
+        """
+        直接向客户端推送消息（不经过订阅路由），QoS 1 时最多同时有 Receive Maximum 条未确认，全部确认后返回
+
+        Returns:
+            dict: 耗时（秒）、每秒消息数，以及确认延迟的 p50/p95（毫秒）
+        """
+        with self._lock:
+            session = self._clients[client_id]
+        with session.condition:
+            target = (session.acked if qos else session.sent) + len(payloads)
+        start = time.perf_counter()
+        for payload in payloads:
+            session.deliver(topic, payload, qos)
+        with session.condition:
+            session.condition.wait_for(lambda: (session.acked if qos else session.sent) >= target)
+            latencies, session.ack_latencies = sorted(session.ack_latencies) or [0.0], []
+        elapsed = time.perf_counter() - start
+        return {"elapsed_s": elapsed, "per_s": len(payloads) / elapsed,
+                "ack_p50_ms": latencies[len(latencies) // 2] * 1000,
+                "ack_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000}
+
+    def route(self, topic: str, payload: bytes, qos: int, retain: bool = False) -> int:
+        """
+        把消息投递给所有匹配的订阅：普通订阅每个客户端一份，共享订阅每组轮转选一个成员
+
+        Returns:
+            int: 投递的份数
+        """
+        with self._lock:
+            if retain:
+                if payload:
+                    self._retained[topic] = (payload, qos)
+                else:
+                    self._retained.pop(topic, None)
+            targets: Dict[str, Tuple[_Session, int]] = {}
+            groups: Dict[Tuple[str, str], List[Tuple[_Session, int]]] = {}
+            for session in self._clients.values():
+                for topic_filter, group, sub_qos in session.subscriptions:
+                    if not topic_matches(topic_filter, topic):
+                        continue
+                    if group is None:
+                        granted = max(min(qos, sub_qos), targets.get(session.client_id, (None, 0))[1])
+                        targets[session.client_id] = (session, granted)
+                    else:
+                        groups.setdefault((group, topic_filter), []).append((session, min(qos, sub_qos)))
+            deliveries = list(targets.values())
+            for key, members in groups.items():
+                members.sort(key=lambda member: member[0].client_id)
+                cursor = self._share_cursor.get(key, 0)
+                deliveries.append(members[cursor % len(members)])
+                self._share_cursor[key] = cursor + 1
+        for session, granted in deliveries:
+            session.deliver(topic, payload, granted)
+        return len(deliveries)
+
+    def _accept(self, server: socket.socket) -> None:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with self._lock:
+                if server is not self._server:
+                    conn.close()
+                    return
+                self._connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        session = None
+        try:
+            while True:
+                packet_type, flags, body = _read_packet(conn)
+                if packet_type == 1:  # CONNECT
+                    session = self._connect(conn, body)
+                elif packet_type == 3:  # PUBLISH
+                    self._on_publish(session, flags, body)
+                elif packet_type == 4:  # PUBACK
+                    session.on_puback(struct.unpack('!H', body[:2])[0])
+                elif packet_type == 8:  # SUBSCRIBE
+                    self._subscribe(session, body)
+                elif packet_type == 12:  # PINGREQ
+                    session.send(bytes([0xD0, 0]))
+                elif packet_type == 14:  # DISCONNECT
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+            if session is not None:
+                with self._lock:
+                    if self._clients.get(session.client_id) is session:
+                        del self._clients[session.client_id]
+                session.close()
+
+    def _connect(self, conn: socket.socket, body: bytes) -> _Session:
+        name_length = struct.unpack('!H', body[:2])[0]
+        v5 = body[2 + name_length] == 5
+        offset = 2 + name_length + 4
+        receive_maximum = 65535
+        if v5:
+            properties, offset = _parse_properties(body, offset)
+            receive_maximum = properties.get(_RECEIVE_MAXIMUM, receive_maximum)
+        id_length = struct.unpack('!H', body[offset:offset + 2])[0]
+        client_id = body[offset + 2:offset + 2 + id_length].decode()
+        session = _Session(conn, client_id, v5, receive_maximum)
+        with self._lock:
+            session_present = client_id in self.sessions
+            self.sessions.add(client_id)
+            self.connects.append((time.monotonic(), client_id))
+            previous = self._clients.get(client_id)
+            self._clients[client_id] = session
+        if previous is not None:
+            previous.close()
+        session.send(bytes([0x20, 3, session_present, 0, 0]) if v5 else bytes([0x20, 2, session_present, 0]))
+        return session
+
+    def _on_publish(self, session: _Session, flags: int, body: bytes) -> None:
+        qos, retain = (flags >> 1) & 0x03, bool(flags & 0x01)
+        topic_length = struct.unpack('!H', body[:2])[0]
+        topic = body[2:2 + topic_length].decode()
+        offset = 2 + topic_length
+        packet_id = None
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+        if session.v5:
+            _, offset = _parse_properties(body, offset)
+        self.route(topic, body[offset:], qos, retain)
+        if packet_id is not None:
+            session.send(bytes([0x40, 2]) + packet_id)
+
+    def _subscribe(self, session: _Session, body: bytes) -> None:
+        packet_id, offset = body[:2], 2
+        if session.v5:
+            _, offset = _parse_properties(body, offset)
+        codes, added = b'', []
+        while offset < len(body):
+            length = struct.unpack('!H', body[offset:offset + 2])[0]
+            topic_filter = body[offset + 2:offset + 2 + length].decode()
+            qos = body[offset + 2 + length] & 0x03
+            offset += 3 + length
+            group = None
+            if topic_filter.startswith('$share/'):
+                _, group, topic_filter = topic_filter.split('/', 2)
+            added.append((topic_filter, group, qos))
+            codes += bytes([qos])
+        with self._lock:
+            session.subscriptions = [sub for sub in session.subscriptions
+                                     if (sub[0], sub[1]) not in {(f, g) for f, g, _ in added}] + added
+            retained = [(topic, payload, min(qos, sub_qos)) for topic, (payload, qos) in self._retained.items()
+                        for topic_filter, group, sub_qos in added
+                        if group is None and topic_matches(topic_filter, topic)]
+        variable = packet_id + (b'\x00' if session.v5 else b'') + codes
+        session.send(bytes([0x90]) + _encode_varint(len(variable)) + variable)
+        for topic, payload, qos in retained:
+            session.deliver(topic, payload, qos, retain=True)
+        session.subscribed.set()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+图像匹配基准测试：按匹配方式统计 p50/p95 耗时、峰值内存和命中准确率，结果输出为 JSON 以便跟踪版本间的回归
+
+用法:
+    python -m benchmarks.image_matching                              # 合成截图（多分辨率、多缩放比例）
+    python -m benchmarks.image_matching --screenshots 目录            # 录制的截图，目录格式见 screen_corpus.py
+    python -m benchmarks.image_matching --output new.json --baseline old.json
+
+与基线比较时，p95 耗时变慢超过 --tolerance 或准确率下降的条目会被标记，并以退出码 1 结束。
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks.screen_corpus import Screenshot, load_corpus, synthetic_corpus
+from config import Image
+from utils.capture_utils import ArrayCapture
+from utils.match_utils import locate_templates, reset_display_scales, MODE_EXACT, MODE_PYRAMID
+from utils.template_utils import template_registry
+
+RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160)]
+SCALES = [1.0, 1.25, 1.5]
+# (匹配算法, 搜索范围)
+MODES = [(MODE_EXACT, 'full'), (MODE_EXACT, 'roi'), (MODE_PYRAMID, 'full'), (MODE_PYRAMID, 'roi')]
+# 命中位置与标注位置的最大允许误差（像素）
+POSITION_TOLERANCE = 3
+
+
+def _is_correct(box: Optional[Tuple[int, int, int, int]], expected: Optional[Tuple[int, int]]) -> bool:
+    if expected is None:
+        return box is None
+    return box is not None and abs(box[0] - expected[0]) <= POSITION_TOLERANCE \
+        and abs(box[1] - expected[1]) <= POSITION_TOLERANCE
+
+
+def bench_screenshot(screenshot: Screenshot, match_mode: str, scope: str, image_paths: List[str],
+                     repeat: int) -> dict:
+    """
+    对一张截图执行一种匹配方式
+
+    Returns:
+        dict: 每次耗时（毫秒）、峰值内存（字节）、正确次数与参与统计的次数
+    """
+    templates = [template_registry.get(image_path) for image_path in image_paths]
+    capture = ArrayCapture(screenshot.screen)
+    region = screenshot.region if scope == 'roi' else (0, 0) + capture.screen_size()
+    display_key = screenshot.name
+
+    # 预热一次，确定该“显示器”的缩放比例，与实际运行时的稳态一致
+    reset_display_scales()
+    locate_templates(capture.grab(region), templates, origin=region[:2], mode=match_mode, display_key=display_key)
+
+    timings, peak, correct, judged = [], 0, 0, 0
+    for _ in range(repeat):
+        for template in templates:
+            template.last_hit = None
+        tracemalloc.start()
+        start = time.perf_counter()
+        # copy 模拟真实截图时复制像素的开销
+        hits = locate_templates(capture.grab(region).copy(), templates, origin=region[:2], mode=match_mode,
+                                display_key=display_key)
+        timings.append((time.perf_counter() - start) * 1000)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        if screenshot.anchors is not None:
+            for image_path, box in hits.items():
+                judged += 1
+                correct += _is_correct(box, screenshot.anchors.get(image_path))
+    return {"timings": timings, "peak": peak, "correct": correct, "judged": judged}
+
+
+def run(screenshots: List[Screenshot], image_paths: List[str], repeat: int) -> List[dict]:
+    """按 (匹配算法, 搜索范围, 分辨率) 汇总结果"""
+    grouped: Dict[Tuple[str, str, str], dict] = {}
+    for screenshot in screenshots:
+        for match_mode, scope in MODES:
+            stats = bench_screenshot(screenshot, match_mode, scope, image_paths, repeat)
+            entry = grouped.setdefault((match_mode, scope, screenshot.resolution),
+                                       {"timings": [], "peak": 0, "correct": 0, "judged": 0})
+            entry["timings"].extend(stats["timings"])
+            entry["peak"] = max(entry["peak"], stats["peak"])
+            entry["correct"] += stats["correct"]
+            entry["judged"] += stats["judged"]
+
+    results = []
+    for (match_mode, scope, resolution), entry in grouped.items():
+        results.append({
+            "match_mode": match_mode,
+            "scope": scope,
+            "resolution": resolution,
+            "samples": len(entry["timings"]),
+            "p50_ms": round(float(np.percentile(entry["timings"], 50)), 3),
+            "p95_ms": round(float(np.percentile(entry["timings"], 95)), 3),
+            "peak_memory_kb": round(entry["peak"] / 1024, 1),
+            "accuracy": round(entry["correct"] / entry["judged"], 4) if entry["judged"] else None,
+        })
+    return results
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """
+    与基线结果比较
+
+    Returns:
+        List[str]: 出现回归的条目描述
+    """
+    regressions = []
+    baseline_map = {(r["match_mode"], r["scope"], r["resolution"]): r for r in baseline}
+    for result in results:
+        key = (result["match_mode"], result["scope"], result["resolution"])
+        old = baseline_map.get(key)
+        if old is None:
+            continue
+        if old["p95_ms"] and result["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{'/'.join(key)} p95 {old['p95_ms']}ms -> {result['p95_ms']}ms")
+        if old["accuracy"] is not None and result["accuracy"] is not None and result["accuracy"] < old["accuracy"]:
+            regressions.append(f"{'/'.join(key)} accuracy {old['accuracy']} -> {result['accuracy']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--screenshots', help='录制截图所在目录，不指定时使用合成截图')
+    parser.add_argument('--repeat', type=int, default=10, help='每张截图每种方式的重复次数')
+    parser.add_argument('--output', help='将结果写入指定 JSON 文件')
+    parser.add_argument('--baseline', help='用于比较的历史结果 JSON 文件')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的 p95 耗时增幅，默认 20%%')
+    args = parser.parse_args()
+
+    image_paths = [Image.GROUP_IMAGE, Image.EMOJI_IMAGE]
+    if args.screenshots:
+        screenshots = list(load_corpus(args.screenshots))
+    else:
+        screenshots = list(synthetic_corpus(RESOLUTIONS, SCALES))
+
+    results = run(screenshots, image_paths, args.repeat)
+    for r in results:
+        accuracy = '-' if r["accuracy"] is None else f"{r['accuracy']:.2%}"
+        print(f"{r['match_mode']:<8} {r['scope']:<5} {r['resolution']:<10} p50={r['p50_ms']:>9.2f}ms "
+              f"p95={r['p95_ms']:>9.2f}ms  peak={r['peak_memory_kb']:>9.1f}KB  accuracy={accuracy}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "screenshots": len(screenshots),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"回归: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+任务日志入队吞吐基准测试：多个线程同时入队（模拟多个 MQTT 连接突发推送），
+对比 TaskJournal 的合并提交与每个任务单独提交的吞吐和延迟
+
+用法:
+    python -m benchmarks.journal_benchmark
+    python -m benchmarks.journal_benchmark --threads 8 --tasks 500 --synchronous FULL
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from utils.journal_utils import SCHEMA, QUEUED, TaskJournal
+
+
+class CommitPerTask:
+    """对照组：每个任务一个事务，连接由锁保护"""
+
+    def __init__(self, path: str, synchronous: str):
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(f'PRAGMA synchronous={synchronous}')
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add(self, source, chat_names, messages, image_urls, priority=0, deadline=None):
+        payload = json.dumps({"chat_names": chat_names, "messages": messages, "image_urls": image_urls},
+                             ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            return self._connection.execute(
+                'INSERT INTO tasks (source, payload, priority, deadline, state, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', (source, payload, priority, deadline, QUEUED, now, now)).lastrowid
+
+    def close(self):
+        self._connection.close()
+
+
+def run(journal, threads: int, tasks: int) -> dict:
+    latencies = [[] for _ in range(threads)]
+
+    def producer(index: int):
+        for i in range(tasks):
+            start = time.perf_counter()
+            journal.add(f'source{index}', [f'群聊{i % 10}'], [f'第 {i} 条通知 🎉'], None, priority=i % 3)
+            latencies[index].append((time.perf_counter() - start) * 1000)
+
+    workers = [threading.Thread(target=producer, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    samples = np.concatenate([np.array(latency) for latency in latencies])
+    return {
+        "tasks_per_s": round(threads * tasks / elapsed),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=4, help='并发入队的线程数')
+    parser.add_argument('--tasks', type=int, default=500, help='每个线程入队的任务数')
+    parser.add_argument('--synchronous', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'], help='SQLite 同步级别')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='journal_bench_')
+    for name, factory in (('commit_per_task', lambda path: CommitPerTask(path, args.synchronous)),
+                          ('group_commit', lambda path: TaskJournal(path, synchronous=args.synchronous))):
+        journal = factory(os.path.join(directory, f'{name}.db'))
+        try:
+            result = run(journal, args.threads, args.tasks)
+            extra = ''
+            if isinstance(journal, TaskJournal):
+                stats = journal.get_stats()
+                extra = f"  writes/commit={stats['writes'] / max(stats['commits'], 1):.1f}"
+            print(f"{name:<16} {result['tasks_per_s']:>8} tasks/s  p50={result['p50_ms']:>7.3f}ms  "
+                  f"p95={result['p95_ms']:>7.3f}ms{extra}")
+        finally:
+            journal.close()
+
+
+if __name__ == '__main__':
+    main()
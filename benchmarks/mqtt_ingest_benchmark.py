@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT 接收吞吐基准测试：测量 on_message（paho 网络线程）每秒能处理的消息数。
+对比原来在网络线程中解码并打印完整消息的做法，与只放入 MessageInbox、由接收线程解码处理的做法，
+并给出接收线程使用各个 JSON 解码器时清空队列的吞吐
+
+用法:
+    python -m benchmarks.mqtt_ingest_benchmark
+    python -m benchmarks.mqtt_ingest_benchmark --messages 20000 --chats 50 --text-size 2000
+    python -m benchmarks.mqtt_ingest_benchmark --console    # 日志输出到控制台而不是丢弃
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from service.ingest import MessageInbox, abbreviate
+from utils.json_utils import DECODER_JSON, DECODER_ORJSON, create_json_decoder
+
+
+def make_payload(chats: int, text_size: int) -> bytes:
+    content = {
+        "method": "sendWechatMessage",
+        "chatNames": [f"群聊{i}" for i in range(chats)],
+        "messages": ["通知" * (text_size // 2)],
+        "imageUrls": ["http://example.com/image.jpg"],
+    }
+    return json.dumps(content, ensure_ascii=False).encode('utf-8')
+
+
+def inline_on_message(msg) -> None:
+    """原来的 on_message：在网络线程中解码并打印完整内容"""
+    content = json.loads(msg.payload.decode('utf-8'))
+    method = content.get("method", None)
+    print(f"接收mqtt消息，topic：{msg.topic}  method: {method}  message: {content}")
+    print(f"已提交微信消息发送任务: {content}")
+
+
+def handle(topic, content) -> None:
+    """接收线程中的处理：打印截断后的内容"""
+    print(f"接收mqtt消息，topic：{topic}  method: {content.get('method')}  message: {abbreviate(content)}")
+
+
+def measure_inline(msg, messages: int) -> float:
+    start = time.perf_counter()
+    for _ in range(messages):
+        inline_on_message(msg)
+    return messages / (time.perf_counter() - start)
+
+
+def measure_inbox(msg, messages: int, decoder) -> dict:
+    inbox = MessageInbox(handle, maxsize=messages, decoder=decoder)
+    start = time.perf_counter()
+    for _ in range(messages):
+        inbox.submit(msg.topic, msg.payload)
+    submitted = time.perf_counter()
+    inbox.join()
+    drained = time.perf_counter()
+    inbox.close()
+    return {"on_message_per_s": messages / (submitted - start), "drain_per_s": messages / (drained - start),
+            "dropped": inbox.get_stats()["dropped"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000, help='消息数')
+    parser.add_argument('--chats', type=int, default=20, help='每条消息的聊天对象数')
+    parser.add_argument('--text-size', type=int, default=500, help='每条消息的文本长度（字符）')
+    parser.add_argument('--console', action='store_true', help='日志输出到控制台（默认丢弃，只测量格式化开销）')
+    args = parser.parse_args()
+
+    payload = make_payload(args.chats, args.text_size)
+    msg = SimpleNamespace(topic='wx/test/message', payload=payload)
+    decoders = [('json', create_json_decoder(DECODER_JSON))]
+    try:
+        decoders.append(('orjson', create_json_decoder(DECODER_ORJSON)))
+    except ValueError:
+        print("未安装 orjson，跳过")
+
+    results = []
+    with open(os.devnull, 'w', encoding='utf-8') as sink:
+        with contextlib.redirect_stdout(sys.stdout if args.console else sink):
+            results.append(('inline', {"on_message_per_s": measure_inline(msg, args.messages)}))
+            for name, decoder in decoders:
+                results.append((f'inbox+{name}', measure_inbox(msg, args.messages, decoder)))
+
+    print(f"payload={len(payload)} bytes  messages={args.messages}")
+    for name, result in results:
+        line = f"{name:<14} on_message={result['on_message_per_s']:>10.0f} msg/s"
+        if "drain_per_s" in result:
+            line += f"  drain={result['drain_per_s']:>9.0f} msg/s  dropped={result['dropped']}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
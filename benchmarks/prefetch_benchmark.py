@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+预取流水线基准测试：本地 HTTP 服务模拟有延迟的图床，用固定耗时的假界面操作代替 WxOperation，
+对比不预取（下载完再发送）与预取若干任务时整批任务的总耗时
+
+用法:
+    python -m benchmarks.prefetch_benchmark
+    python -m benchmarks.prefetch_benchmark --tasks 20 --latency 0.3 --ui-time 0.5 --depth 0 2 4
+"""
+import argparse
+import http.server
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from core.wx_operation_service import WeChatService
+from utils.cache_utils import AttachmentCache, set_attachment_cache
+
+
+class SlowImageHandler(http.server.BaseHTTPRequestHandler):
+    """每个请求延迟 latency 秒后返回 size 字节的内容，路径不同内容也不同，避免被缓存去重"""
+    latency = 0.2
+    size = 256 * 1024
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = self.path.encode().ljust(self.size, b'\0')
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeWxOperation:
+    """只模拟界面操作耗时的 WxOperation"""
+
+    def __init__(self, ui_time: float):
+        self.ui_time = ui_time
+        self.current_chat = None
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def send_prepared(self, name, broadcast, **kwargs):
+        time.sleep(self.ui_time)
+        self.current_chat = name
+
+
+def run(base_url: str, tasks: int, images: int, ui_time: float, depth: int, run_id: int) -> float:
+    """返回从提交第一个任务到最后一个任务回调的耗时（秒）"""
+    set_attachment_cache(AttachmentCache(tempfile.mkdtemp(prefix='prefetch_bench_')))
+    service = WeChatService(group_by_recipient=False, prefetch_depth=depth)
+    wx = FakeWxOperation(ui_time)
+    service._get_wx_instance = lambda: wx
+
+    done = threading.Semaphore(0)
+    start = time.perf_counter()
+    for i in range(tasks):
+        urls = [f'{base_url}/{run_id}/{i}/{j}.png' for j in range(images)]
+        service.send_message_to_chats([f'chat{i}'], [f'message {i}'], urls, callback=lambda result: done.release())
+    for _ in range(tasks):
+        done.acquire()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=10, help='任务数')
+    parser.add_argument('--images', type=int, default=2, help='每个任务的图片数')
+    parser.add_argument('--latency', type=float, default=0.3, help='每个图片请求的延迟（秒）')
+    parser.add_argument('--ui-time', type=float, default=0.3, help='每个任务的界面操作耗时（秒）')
+    parser.add_argument('--depth', type=int, nargs='+', default=[0, 1, 4], help='要比较的预取深度')
+    args = parser.parse_args()
+
+    SlowImageHandler.latency = args.latency
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SlowImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    try:
+        for run_id, depth in enumerate(args.depth):
+            elapsed = run(base_url, args.tasks, args.images, args.ui_time, depth, run_id)
+            print(f"depth={depth:<3} total={elapsed:>7.2f}s  per_task={elapsed / args.tasks * 1000:>8.1f}ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
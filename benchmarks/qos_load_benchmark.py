@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT QoS 负载测试：本地启动 MQTT 服务器替身，向一个与 WxMqtt 设置相同的客户端连续推送发送请求，
+接收线程把每条请求写入任务日志（与加入发送队列时相同），对比三种接收方式：
+
+    qos0         不确认，接收队列已满时丢弃
+    qos1-auto    QoS 1，paho 在 on_message 返回（消息刚放入接收队列）后立即确认
+    qos1-manual  QoS 1，任务写入日志后才确认（WxMqtt 的做法）
+
+输出每秒写入日志的消息数、确认延迟、丢失的消息数，以及服务器收齐确认时仍未写入日志的消息数（at_risk，进程此时退出这些消息就会丢失）
+
+用法:
+    python -m benchmarks.qos_load_benchmark
+    python -m benchmarks.qos_load_benchmark --messages 20000 --receive-maximum 50 --inbox-size 200
+"""
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_broker import FakeBroker
+from service.ingest import MessageInbox
+from service.reconnect import ReconnectBackoff, create_client, start_client
+from utils.journal_utils import TaskJournal
+
+TOPIC = 'wx/bench/message'
+MODES = ('qos0', 'qos1-auto', 'qos1-manual')
+
+
+def make_payloads(messages: int, chats: int) -> list:
+    return [json.dumps({"method": "sendWechatMessage", "chatNames": [f"群聊{i}" for i in range(chats)],
+                        "messages": [f"通知 {n}"]}, ensure_ascii=False).encode('utf-8') for n in range(messages)]
+
+
+def run(mode: str, payloads: list, receive_maximum: int, inbox_size: int) -> dict:
+    qos = 0 if mode == 'qos0' else 1
+    manual_ack = mode == 'qos1-manual'
+    with tempfile.TemporaryDirectory() as directory:
+        journal = TaskJournal(os.path.join(directory, 'journal.db'))
+        inbox = MessageInbox(lambda topic, content: journal.add(topic, content["chatNames"], content["messages"], None),
+                             maxsize=inbox_size)
+        broker = FakeBroker()
+        broker.start()
+        subscribed = threading.Event()
+        client = create_client(f'bench-{mode}', manual_ack=manual_ack)
+
+        def on_connect(client, userdata, flags, reason_code, properties):
+            client.subscribe(TOPIC, qos=qos)
+            subscribed.set()
+
+        def on_message(client, userdata, msg):
+            ack = (lambda: client.ack(msg.mid, msg.qos)) if manual_ack and msg.qos > 0 else None
+            inbox.submit(msg.topic, msg.payload, ack)
+
+        client.on_connect = on_connect
+        client.on_message = on_message
+        start_client(client, '127.0.0.1', broker.port, ReconnectBackoff(), receive_maximum=receive_maximum)
+        subscribed.wait(10)
+        broker.wait_subscribed(f'bench-{mode}')
+
+        start = time.perf_counter()
+        result = broker.publish(f'bench-{mode}', TOPIC, payloads, qos=qos)
+        at_risk = len(payloads) - inbox.get_stats()["processed"] if qos else 0
+        if not qos:
+            # QoS 0 没有确认，等客户端收完：接收队列处理完且网络线程不再放入新消息
+            previous = None
+            while previous != inbox.get_stats()["received"]:
+                previous = inbox.get_stats()["received"]
+                inbox.join()
+                threading.Event().wait(0.2)
+        inbox.join()
+        elapsed = time.perf_counter() - start
+        stats = inbox.get_stats()
+        client.disconnect()
+        client.loop_stop()
+        broker.stop()
+        inbox.close()
+        journaled = sum(journal.counts().values())
+        journal.close()
+    return dict(result, per_s=journaled / elapsed, lost=len(payloads) - journaled, at_risk=at_risk,
+                dropped=stats["dropped"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000, help='消息数')
+    parser.add_argument('--chats', type=int, default=10, help='每条消息的聊天对象数')
+    parser.add_argument('--receive-maximum', type=int, default=100, help='服务器同时推送的未确认消息数')
+    parser.add_argument('--inbox-size', type=int, default=200, help='接收队列容量')
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.messages, args.chats)
+    print(f"messages={args.messages}  receive_maximum={args.receive_maximum}  inbox_size={args.inbox_size}")
+    results = []
+    with open(os.devnull, 'w', encoding='utf-8') as sink, contextlib.redirect_stdout(sink):
+        for mode in MODES:
+            results.append((mode, run(mode, payloads, args.receive_maximum, args.inbox_size)))
+    for mode, result in results:
+        ack = f"ack p50={result['ack_p50_ms']:.2f}ms p95={result['ack_p95_ms']:.2f}ms" if mode != 'qos0' else 'ack -'
+        print(f"{mode:<12} {result['per_s']:>7.0f} msg/s  {ack:<30} lost={result['lost']}  at_risk={result['at_risk']}")
+
+
+if __name__ == '__main__':
+    main()
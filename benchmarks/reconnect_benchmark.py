@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT 重连基准测试：本地启动一个最小的 MQTT 服务器替身，连接若干客户端后模拟服务器宕机一段时间再恢复，
+测量每个客户端从断线到重新连上的耗时，以及恢复后同一时间窗口内最多有多少个客户端同时重连（是否步调一致）。
+客户端使用与 WxMqtt 相同的持久会话和退避重连设置
+
+用法:
+    python -m benchmarks.reconnect_benchmark
+    python -m benchmarks.reconnect_benchmark --clients 50 --outage 3 --min-delay 0.2 --max-delay 5
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+
+from benchmarks.fake_broker import FakeBroker
+from service.reconnect import ReconnectBackoff, ReconnectStats, create_client, schedule_reconnect, start_client
+
+
+class Client:
+    """与 WxMqtt 相同的连接设置，只记录连接状态"""
+
+    def __init__(self, index: int, port: int, backoff: ReconnectBackoff):
+        self.backoff = backoff
+        self.stats = ReconnectStats()
+        self.connected = threading.Event()
+        self.client = create_client(f'bench-{index}')
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_connect_fail = self.on_disconnect
+        start_client(self.client, '127.0.0.1', port, backoff)
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        self.stats.connected()
+        self.backoff.reset()
+        client.subscribe('wx/bench', qos=1)
+        self.connected.set()
+
+    def on_disconnect(self, client, *args):
+        self.connected.clear()
+        self.stats.disconnected()
+        schedule_reconnect(client, self.backoff)
+
+    def close(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def run(clients: int, outage: float, min_delay: float, max_delay: float, jitter: bool) -> dict:
+    broker = FakeBroker()
+    broker.start()
+    pool = [Client(i, broker.port, ReconnectBackoff(min_delay, max_delay, jitter=jitter)) for i in range(clients)]
+    for client in pool:
+        client.connected.wait(10)
+
+    broker.stop()
+    time.sleep(outage)
+    restarted = time.monotonic()
+    broker.start()
+    for client in pool:
+        client.connected.wait(outage + max_delay * 2 + 10)
+
+    reconnects = [t for t, _ in broker.connects if t >= restarted]
+    durations = sorted(client.stats.summary()["last_s"] for client in pool if client.stats.summary()["reconnects"])
+    for client in pool:
+        client.close()
+    broker.stop()
+
+    # 恢复后每 100 毫秒内到达的连接数，最大值越接近客户端数越说明步调一致
+    buckets = Counter(int((t - restarted) * 10) for t in reconnects)
+    return {
+        "reconnected": len({client_id for t, client_id in broker.connects if t >= restarted}),
+        "p50_s": round(statistics.median(durations), 2) if durations else None,
+        "p95_s": durations[int(len(durations) * 0.95)] if durations else None,
+        "max_s": durations[-1] if durations else None,
+        "peak_per_100ms": max(buckets.values()) if buckets else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=20, help='客户端数')
+    parser.add_argument('--outage', type=float, default=2.0, help='服务器宕机时长（秒）')
+    parser.add_argument('--min-delay', type=float, default=0.2, help='重连初始等待（秒）')
+    parser.add_argument('--max-delay', type=float, default=4.0, help='重连等待上限（秒）')
+    args = parser.parse_args()
+
+    for jitter in (False, True):
+        result = run(args.clients, args.outage, args.min_delay, args.max_delay, jitter)
+        print(f"jitter={str(jitter):<5}  reconnected={result['reconnected']}/{args.clients}  "
+              f"p50={result['p50_s']}s  p95={result['p95_s']}s  max={result['max_s']}s  "
+              f"peak/100ms={result['peak_per_100ms']}")
+
+
+if __name__ == '__main__':
+    main()
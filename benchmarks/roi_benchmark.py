@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+全屏匹配与窗口区域(ROI)匹配的耗时对比
+
+用法:
+    python -m benchmarks.roi_benchmark                       # 使用合成的 4K 截图
+    python -m benchmarks.roi_benchmark --screenshots 目录     # 使用录制的截图
+
+录制截图的目录格式见 benchmarks/screen_corpus.py。
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from benchmarks.screen_corpus import load_corpus, make_synthetic_screenshot
+from config import Image
+from utils.capture_utils import ArrayCapture
+from utils.match_utils import locate_template, MODE_EXACT, MODE_PYRAMID
+from utils.template_utils import template_registry
+
+
+def run_mode(screen, region, image_path, mode: str, repeat: int, match_mode: str = Image.MATCH_MODE):
+    """
+    执行一种匹配方式并返回每次耗时（毫秒）
+
+    Args:
+        mode: full 全屏匹配; roi 仅窗口区域; roi_memory 窗口区域并保留上次命中位置
+        match_mode: 匹配算法，MODE_EXACT 或 MODE_PYRAMID
+    """
+    template = template_registry.get(image_path)
+    template.last_hit = None
+    capture = ArrayCapture(screen)
+    full_region = (0, 0) + capture.screen_size()
+    timings = []
+    for _ in range(repeat):
+        if mode != 'roi_memory':
+            template.last_hit = None
+        start = time.perf_counter()
+        # copy 模拟真实截图时复制像素的开销
+        if mode == 'full':
+            locate_template(capture.grab(full_region).copy(), template, origin=(0, 0), mode=match_mode)
+        else:
+            locate_template(capture.grab(region).copy(), template, origin=region[:2], mode=match_mode)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--screenshots', help='录制截图所在目录')
+    parser.add_argument('--repeat', type=int, default=20, help='每种方式的重复次数')
+    parser.add_argument('--match-mode', choices=(MODE_EXACT, MODE_PYRAMID), default=Image.MATCH_MODE,
+                        help='匹配算法')
+    parser.add_argument('--json', help='将结果写入指定 JSON 文件')
+    args = parser.parse_args()
+
+    if args.screenshots:
+        screenshots = list(load_corpus(args.screenshots))
+    else:
+        screenshots = [make_synthetic_screenshot(3840, 2160)]
+
+    results = []
+    for screenshot in screenshots:
+        name, screen, region = screenshot.name, screenshot.screen, screenshot.region
+        for image_path in (Image.GROUP_IMAGE, Image.EMOJI_IMAGE):
+            for mode in ('full', 'roi', 'roi_memory'):
+                timings = run_mode(screen, region, image_path, mode, args.repeat, args.match_mode)
+                result = {"screenshot": name, "template": image_path, "mode": mode, "match_mode": args.match_mode,
+                          "mean_ms": round(statistics.mean(timings), 3),
+                          "median_ms": round(statistics.median(timings), 3)}
+                results.append(result)
+                print(f"{name:<24} {os.path.basename(image_path):<10} {mode:<11} "
+                      f"mean={result['mean_ms']:>9.2f}ms  median={result['median_ms']:>9.2f}ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试使用的截图语料：录制的截图目录或合成截图
+
+录制截图目录中的每个 PNG 可附带同名 .json 文件：
+    {
+        "region": [left, top, width, height],          # 截图时微信窗口的矩形
+        "anchors": {"assets/images/group.png": [x, y]}  # 模板左上角的真实位置，用于统计命中准确率
+    }
+没有 region 时使用截图中央 1200x900 的区域；没有 anchors 时不统计该截图的准确率。
+"""
+import glob
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Image
+from utils.template_utils import template_registry
+
+DEFAULT_REGION_SIZE = (1200, 900)
+
+
+class Screenshot:
+    """
+    一张基准截图
+
+    Attributes:
+    ----------
+    name: str
+        截图名称
+    screen: np.ndarray
+        BGR 截图
+    region: Tuple[int, int, int, int]
+        微信窗口区域
+    anchors: Optional[Dict[str, Tuple[int, int]]]
+        模板路径 -> 真实位置，截图中不存在的模板不出现在字典中；为 None 表示未标注
+    """
+
+    def __init__(self, name: str, screen: np.ndarray, region: Tuple[int, int, int, int],
+                 anchors: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.name = name
+        self.screen = screen
+        self.region = region
+        self.anchors = anchors
+
+    @property
+    def resolution(self) -> str:
+        height, width = self.screen.shape[:2]
+        return f"{width}x{height}"
+
+
+def make_synthetic_screenshot(width: int, height: int, scale: float = 1.0, seed: int = 0,
+                              image_paths: Tuple[str, ...] = (Image.GROUP_IMAGE, Image.EMOJI_IMAGE)) -> Screenshot:
+    """
+    生成合成截图：噪声桌面上放置一个窗口，窗口内贴入按 scale 缩放的锚点模板
+
+    Args:
+        width: 截图宽度
+        height: 截图高度
+        scale: 模拟的系统显示缩放比例
+        seed: 随机种子
+        image_paths: 贴入窗口的模板
+
+    Returns:
+        Screenshot 对象
+    """
+    rng = np.random.default_rng(seed)
+    screen = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    region_w = min(width, int(DEFAULT_REGION_SIZE[0] * scale))
+    region_h = min(height, int(DEFAULT_REGION_SIZE[1] * scale))
+    left, top = (width - region_w) // 3, (height - region_h) // 3
+    screen[top:top + region_h, left:left + region_w] = 245
+
+    anchors = {}
+    for i, image_path in enumerate(image_paths):
+        template = template_registry.get(image_path)
+        image = template.get_variant(scale)[0]
+        x = left + int((60 + i * 400) * scale)
+        y = top + int((120 + i * 500) * scale)
+        screen[y:y + image.shape[0], x:x + image.shape[1]] = image
+        anchors[image_path] = (x, y)
+    name = f"synthetic_{width}x{height}@{scale:g}"
+    return Screenshot(name, screen, (left, top, region_w, region_h), anchors)
+
+
+def synthetic_corpus(resolutions: List[Tuple[int, int]], scales: List[float]) -> Iterator[Screenshot]:
+    """按分辨率和缩放比例组合生成合成截图"""
+    for seed, (width, height) in enumerate(resolutions):
+        for scale in scales:
+            yield make_synthetic_screenshot(width, height, scale, seed=seed)
+
+
+def load_corpus(directory: str) -> Iterator[Screenshot]:
+    """读取录制的截图及其标注"""
+    for path in sorted(glob.glob(os.path.join(directory, '*.png'))):
+        screen = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if screen is None:
+            continue
+        height, width = screen.shape[:2]
+        region_w, region_h = min(width, DEFAULT_REGION_SIZE[0]), min(height, DEFAULT_REGION_SIZE[1])
+        region = ((width - region_w) // 2, (height - region_h) // 2, region_w, region_h)
+        anchors = None
+        meta_path = os.path.splitext(path)[0] + '.json'
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            region = tuple(meta.get('region', region))
+            if 'anchors' in meta:
+                anchors = {image_path: tuple(pos) for image_path, pos in meta['anchors'].items()}
+        yield Screenshot(os.path.basename(path), screen, region, anchors)
@@ -1,2 +1,5 @@
 from config.config import (ViewConfig, DarkConfig, LightConfig, AnimateConfig as Animate, WeChatConfig as WeChat,
-                           IntervalConfig as Interval)
+                           IntervalConfig as Interval, ImageConfig as Image, CacheConfig as Cache,
+                           DownloadConfig as Download, PipelineConfig as Pipeline, JournalConfig as Journal,
+                           MqttConfig as Mqtt, BatchConfig as Batch, RateLimitConfig as RateLimit, DedupConfig as Dedup,
+                           StatusConfig as Status)
@@ -93,3 +93,113 @@ class IntervalConfig:
     SEND_FILE_INTERVAL = 0.25  # 发送文件间隔（秒）
     MAX_SEARCH_SECOND = 0.1
     MAX_SEARCH_INTERVAL = 0.05
+    POLL_INTERVAL = 0.02  # 条件等待的轮询间隔（秒）
+    WAIT_TIMEOUT = 1.0  # 条件等待的默认超时（秒）
+    SEARCH_TIMEOUT = 1.5  # 等待搜索结果出现的超时（秒）
+    WINDOW_TIMEOUT = 3.0  # 等待微信窗口出现的超时（秒）
+    REGION_CHANGE_PIXELS = 80  # 区域内至少多少像素变化才视为界面已更新（忽略光标闪烁）
+
+
+class ImageConfig:
+    GROUP_IMAGE = 'assets/images/group.png'  # 搜索结果中"群聊"分组标题
+    EMOJI_IMAGE = 'assets/images/emoji.png'  # 聊天输入框上方的表情按钮
+    CONFIDENCE = 0.8  # 图像匹配度阈值
+    CLICK_OFFSET_Y = 50  # 点击位置相对图像底部的偏移（像素）
+    DOWNSCALE_FACTORS = (0.5, 0.25)  # 模板预计算的缩小比例
+    LAST_HIT_PADDING = 40  # 优先搜索上次命中位置周围多少像素的范围
+    MATCH_MODE = 'pyramid'  # 匹配方式：exact 单尺度全分辨率匹配；pyramid 先粗匹配再精修
+    COARSE_FACTOR = 0.5  # pyramid 模式粗匹配时的缩小比例
+    # 依次尝试的模板缩放比例（相对 assets/images 截图时的系统缩放），命中后按显示器缓存
+    SCALE_FACTORS = (1.0, 1.25, 1.5, 1.75, 2.0, 0.8)
+    MATCH_WORKERS = 4  # 多模板并行匹配的线程数
+    INPUT_REGION_SIZE = (500, 100)  # 表情按钮下方用于判断输入框内容变化的区域大小（宽, 高）
+
+
+class CacheConfig:
+    DIRECTORY = 'WeChatMassTool/attachments'  # 附件缓存目录（位于系统临时目录下）
+    MAX_BYTES = 512 * 1024 * 1024  # 附件缓存的容量上限（字节），超出后按最近最少使用淘汰
+    REVALIDATE_AFTER = 600  # 缓存条目在多少秒内直接使用，超过后向服务器发条件请求校验（ETag/Last-Modified）
+    SAVE_INTERVAL = 30  # 最多每隔多少秒写一次缓存索引，退出时写入剩余的修改
+
+
+class DownloadConfig:
+    WORKERS = 8  # 下载线程池大小，所有任务共用
+    CONNECTIONS_PER_HOST = 4  # 每个主机同时使用的连接数上限，空闲连接保留复用
+    IDLE_TIMEOUT = 30  # 空闲连接保留的时长（秒）
+    CONNECT_TIMEOUT = 5  # 建立连接的超时（秒）
+    READ_TIMEOUT = 15  # 两次读取之间的超时（秒）
+    TOTAL_TIMEOUT = 60  # 单个文件下载的总时长上限（秒）
+    MAX_BYTES = 25 * 1024 * 1024  # 单个文件的大小上限（字节）
+    CHUNK_SIZE = 256 * 1024  # 流式写入磁盘的块大小（字节）
+    MAX_REDIRECTS = 5  # 最多跟随的重定向次数
+
+
+class PipelineConfig:
+    PREFETCH_DEPTH = 4  # 最多提前准备（下载附件）多少个任务，0 表示不预取
+    PREFETCH_MAX_BYTES = 256 * 1024 * 1024  # 已预取但尚未发送的附件总大小上限（字节）
+    SOURCE_QUEUE_DEPTH = 200  # 每个来源（MQTT 连接）最多排队的任务数，超出后拒绝新任务
+    QUEUE_CAPACITY = 500  # 所有来源合计最多排队的任务数，超出后拒绝新任务
+
+
+class JournalConfig:
+    ENABLED = True  # 是否将排队的任务写入磁盘，重启后恢复
+    PATH = 'data/tasks.db'  # 任务日志文件（相对于工作目录）
+    SYNCHRONOUS = 'NORMAL'  # SQLite 同步级别：NORMAL 可承受进程崩溃，FULL 还可承受断电但提交更慢
+    MAX_BATCH = 512  # 一次提交最多合并的写操作数
+    WRITE_TIMEOUT = 30  # 等待写操作提交的上限（秒），超时抛出 TimeoutError
+    RESEND_INTERRUPTED = False  # 是否重发上次运行时发送到一半被中断的任务（可能重复发送）
+    RETENTION_DAYS = 7  # 已完成或失败的任务保留天数
+
+
+class MqttConfig:
+    RESULT_TOPIC_SUFFIX = '/result'  # 未指定结果主题时，在订阅主题后加上该后缀作为结果主题
+    RESULT_BATCH_SIZE = 50  # 攒够多少条发送结果发布一次
+    RESULT_FLUSH_INTERVAL = 0.5  # 第一条结果最多等待多久（秒）就发布
+    RESULT_QOS = 1  # 发布结果的 QoS，1 表示断线期间的结果在重连后补发
+    SUBSCRIBE_QOS = 1  # 订阅任务主题的 QoS：1 在任务加入发送队列后才确认，未确认的消息重连后由服务器重发；0 不确认
+    RECEIVE_MAXIMUM = 100  # 最多同时有多少条收到但未确认的 QoS 1 消息（MQTT 5.0），应小于 INBOX_SIZE
+    MAX_INFLIGHT = 20  # 发布时最多同时有多少条未被服务器确认的 QoS 1 消息
+    MAX_QUEUED = 10000  # 发布时最多缓存多少条等待发送的消息（包括断线期间），0 表示不限制
+    INBOX_SIZE = 1000  # 收到但尚未解码处理的消息最多缓存多少条，已满时 QoS 0 消息被丢弃，QoS 1 消息不确认、重连后由服务器重发
+    JSON_DECODER = 'auto'  # JSON 解码器：auto 已安装 orjson 时使用 orjson；orjson；json 标准库
+    LOG_PAYLOAD_CHARS = 300  # 日志中消息内容最多打印的字符数
+    PROTOCOL = 5  # MQTT 协议版本：5 为 MQTT 5.0，4 为 3.1.1（用于不支持 5.0 的服务器）
+    KEEPALIVE = 60  # 心跳间隔（秒）
+    SESSION_EXPIRY = 24 * 3600  # 断线后服务器保留会话（订阅和未送达的 QoS 1 消息）的时长（秒）
+    RECONNECT_MIN_DELAY = 1  # 重连的初始等待（秒）
+    RECONNECT_MAX_DELAY = 120  # 重连等待的上限（秒），每次失败等待加倍，并在 [初始等待, 当前上限] 内随机
+    SHARE_GROUP = ''  # 共享订阅组名，非空时以 $share/{组名}/{订阅主题} 订阅，同组的多个节点分摊任务；为空时每个节点收到全部任务
+    NODE_TOPIC_SUFFIX = '/node/'  # 指定节点的任务发布到 {订阅主题}/node/{节点名}，只有该节点收到
+    LOAD_TOPIC_SUFFIX = '/load/'  # 各节点的队列深度发布到 {订阅主题}/load/{节点名}（保留消息）
+    LOAD_INTERVAL = 5  # 发布队列深度的间隔（秒）
+    STATUS_TOPIC_SUFFIX = '/status/'  # 节点状态发布到 {订阅主题}/status/{节点名}（保留消息，异常断线时由服务器发布遗嘱 offline）
+    STOP_TIMEOUT = 5  # 停止时最多等待多久（秒）服务器确认 offline 状态后断开
+
+
+class BatchConfig:
+    MAX_BYTES = 64 * 1024 * 1024  # 批量请求（解压后）的大小上限（字节），超出后剩余任务不再处理
+    MAX_LINE_BYTES = 1024 * 1024  # 单个任务行的大小上限（字节）
+    CHUNK_SIZE = 64 * 1024  # 每次解压的输出大小（字节）
+    ENQUEUE_TIMEOUT = 600  # 发送队列已满时，一个批次最多等待多久（秒）腾出位置，之后剩余任务的结果为 queue_full
+
+
+class StatusConfig:
+    RATE_WINDOW = 60  # 计算发送速率的时间窗口（秒）
+    LATENCY_SAMPLES = 200  # 计算发送耗时分位数时保留的最近发送次数
+    STUCK_AFTER = 300  # 界面线程在一次发送中停留超过多少秒视为卡住，状态报告为 degraded
+
+
+class RateLimitConfig:
+    ENABLED = False  # 是否启用发送限速，不启用时发送间隔只由 IntervalConfig 决定
+    GLOBAL_PER_MINUTE = 60  # 所有聊天合计每分钟最多发送次数（向一个聊天发送一次任务内容计一次），0 表示不限速
+    GLOBAL_BURST = 10  # 所有聊天合计最多连续发送的次数
+    CHAT_PER_MINUTE = 12  # 每个聊天每分钟最多发送次数，0 表示不限速
+    CHAT_BURST = 3  # 每个聊天最多连续发送的次数
+
+
+class DedupConfig:
+    ID_WINDOW = 3600  # 相同 taskId 的消息在多少秒内视为重复
+    CONTENT_WINDOW = 60  # 未指定 taskId 时，内容相同的消息在多少秒内视为重复
+    MAX_ENTRIES = 10000  # 最多记录的消息数，超出后淘汰最久未出现的
+    PATH = 'data/dedup.json'  # 记录持久化的文件，为空时只保存在内存中
+    SAVE_INTERVAL = 5  # 最多每隔多少秒写一次文件
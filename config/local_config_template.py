@@ -11,7 +11,13 @@ MQTT_CONFIGS = [
         "port": 1883,                          # MQTT端口
         "username": "your-username",           # 用户名
         "password": "your-password",           # 密码
-        "subscribe_topic": "wx/your/topic"     # 订阅主题
+        "subscribe_topic": "wx/your/topic",    # 订阅主题
+        "result_topic": "wx/your/topic/result", # 发送结果主题（可选，默认为订阅主题加 /result）
+        "client_id": "WeChatMassTool-office",   # 客户端标识（可选），服务器按它保留会话，重启后需保持不变
+        "subscribe_qos": 1,                     # 订阅主题的 QoS（可选，默认 1）
+        "result_qos": 1,                        # 发送结果主题的 QoS（可选，默认 1）
+        "share_group": "",                      # 共享订阅组名（可选），多台主机填相同的组名即可分摊任务
+        "node_id": "office-pc-1"                # 节点名（可选，默认为主机名），指定节点的任务发到 {订阅主题}/node/{节点名}
     },
     # 可以添加更多MQTT客户端配置
     # {
@@ -23,5 +29,5 @@ MQTT_CONFIGS = [
     # }
 ]
 
-# 健康检查间隔时间（秒）
+# 发布节点状态（{订阅主题}/status/{节点名}）的间隔时间（秒）
 HEALTH_CHECK_INTERVAL = 30
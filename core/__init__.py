@@ -1,2 +1,7 @@
+from core.wx_session import WxSession
+from core.wx_broadcast import PreparedBroadcast
 from core.wx_operation import WxOperation
-from core.wx_operation_service import WeChatService
\ No newline at end of file
+from core.task_queue import FairQueue
+from core.rate_limit import (SendRateLimiter, TokenBucket, VirtualClock)
+from core.send_metrics import SendMetrics
+from core.wx_operation_service import (WeChatService, get_wechat_service, set_wechat_service)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+发送限速：全局和每个聊天各有一个令牌桶，允许短时突发，长期速率不超过设定值。
+限速器只回答"还要等多久才能发送"，由调用方决定是等待还是先发送其他已允许的聊天。
+时钟和等待函数可以替换，测试时用 VirtualClock 代替真实时间
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config import RateLimit
+
+
+class VirtualClock:
+    """手动推进的时钟，sleep 立即返回并把时间向前推进"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(seconds, 0.0)
+
+
+class TokenBucket:
+    """
+    令牌桶，每秒补充 rate 个令牌，最多积攒 burst 个
+
+    Attributes:
+    ----------
+    rate: float
+        每秒补充的令牌数，0 表示不限速
+    burst: float
+        桶容量，即最多可以连续发送的次数
+    """
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = now
+
+    def delay(self, now: float, cost: float = 1.0) -> float:
+        """距离可以取出 cost 个令牌还需等待的秒数，0 表示现在就可以"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(cost, self.burst) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def consume(self, now: float, cost: float = 1.0) -> None:
+        """取出 cost 个令牌，令牌不足时记为欠账，之后补充的令牌先用于还账"""
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= min(cost, self.burst)
+
+    def is_full(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        return self.tokens >= self.burst
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class SendRateLimiter:
+    """
+    全局和按聊天的发送限速，两个令牌桶都有令牌时才允许发送
+
+    Attributes:
+    ----------
+    global_rate / global_burst: float
+        所有聊天合计每秒发送次数和突发次数
+    chat_rate / chat_burst: float
+        每个聊天每秒发送次数和突发次数
+    clock: Callable[[], float]
+        单调时钟，默认 time.monotonic
+    sleep: Callable[[float], None]
+        等待函数，默认 time.sleep
+    """
+
+    # 按聊天的令牌桶超过该数量时，清理已经补满（即近期没有发送）的桶
+    MAX_IDLE_BUCKETS = 1000
+
+    def __init__(self, global_rate: float = RateLimit.GLOBAL_PER_MINUTE / 60,
+                 global_burst: float = RateLimit.GLOBAL_BURST,
+                 chat_rate: float = RateLimit.CHAT_PER_MINUTE / 60, chat_burst: float = RateLimit.CHAT_BURST,
+                 clock: Callable[[], float] = time.monotonic, sleep: Optional[Callable[[float], None]] = None):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.clock = clock
+        self.sleep = sleep or (clock.sleep if isinstance(clock, VirtualClock) else time.sleep)
+        self._global = TokenBucket(global_rate, global_burst, clock())
+        self._chats: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._sends = 0
+        self._waits = 0
+        self._waited = 0.0
+
+    def delay(self, chat_name: str) -> float:
+        """距离可以向该聊天发送还需等待的秒数，0 表示现在就可以"""
+        with self._lock:
+            now = self.clock()
+            chat = self._chats.get(chat_name)
+            return max(self._global.delay(now), chat.delay(now) if chat else 0.0)
+
+    def acquire(self, chat_name: str) -> None:
+        """记录一次向该聊天的发送，应在 delay 为 0 时调用"""
+        with self._lock:
+            now = self.clock()
+            self._global.consume(now)
+            self._chat_bucket(chat_name, now).consume(now)
+            self._sends += 1
+
+    def wait(self, seconds: float) -> None:
+        """等待限速，计入统计"""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._waits += 1
+            self._waited += seconds
+        self.sleep(seconds)
+
+    def get_stats(self) -> dict:
+        """发送次数、因限速等待的次数和总时长（秒）"""
+        with self._lock:
+            return {"sends": self._sends, "waits": self._waits, "waited": round(self._waited, 3),
+                    "chats": len(self._chats)}
+
+    def _chat_bucket(self, chat_name: str, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_name)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_IDLE_BUCKETS:
+                # 补满的桶与新建的桶等价，可以直接丢弃
+                self._chats = {name: chat for name, chat in self._chats.items() if not chat.is_full(now)}
+            bucket = self._chats[chat_name] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
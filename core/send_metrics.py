@@ -0,0 +1,81 @@
+"""
+发送统计：由界面线程在每次向一个聊天发送前后记录，供状态报告读取。
+包括累计成功和失败次数、最近一段时间的发送速率、最近一次成功的时间、最近若干次发送耗时的分位数，
+以及当前这次发送已进行的时长（界面线程卡在某次发送中时持续增长）
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from config import Status
+
+
+class SendMetrics:
+    """
+    向单个聊天发送的统计
+
+    Attributes:
+    ----------
+    window: float
+        计算发送速率的时间窗口（秒）
+    latency_samples: int
+        计算耗时分位数时保留的最近发送次数
+    """
+
+    def __init__(self, window: float = Status.RATE_WINDOW, latency_samples: int = Status.LATENCY_SAMPLES,
+                 clock: Callable[[], float] = time.time):
+        self.window = window
+        self.latency_samples = latency_samples
+        self.clock = clock
+        self._sends = deque()  # 最近 window 秒内每次发送完成的时间
+        self._latencies = deque(maxlen=latency_samples)
+        self._succeeded = 0
+        self._failed = 0
+        self._last_success: Optional[float] = None
+        self._busy_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def started(self) -> None:
+        """开始向一个聊天发送"""
+        with self._lock:
+            self._busy_since = self.clock()
+
+    def finished(self, success: bool, elapsed: float) -> None:
+        """
+        向一个聊天发送结束
+
+        Args:
+            success: 是否发送成功
+            elapsed: 耗时（秒）
+        """
+        with self._lock:
+            now = self.clock()
+            self._busy_since = None
+            self._sends.append(now)
+            self._latencies.append(elapsed)
+            if success:
+                self._succeeded += 1
+                self._last_success = now
+            else:
+                self._failed += 1
+
+    def snapshot(self) -> dict:
+        """累计成功/失败次数、每分钟发送次数、最近一次成功的时间戳、耗时的 p50/p95（毫秒）和当前发送已进行的秒数"""
+        with self._lock:
+            now = self.clock()
+            while self._sends and self._sends[0] < now - self.window:
+                self._sends.popleft()
+            latencies = sorted(self._latencies)
+            busy = now - self._busy_since if self._busy_since is not None else 0.0
+            return {
+                "succeeded": self._succeeded,
+                "failed": self._failed,
+                "sendsPerMinute": round(len(self._sends) * 60 / self.window, 1),
+                "lastSuccessAt": round(self._last_success, 3) if self._last_success is not None else None,
+                "latencyP50Ms": round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+                "latencyP95Ms": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000)
+                if latencies else None,
+                "busyS": round(busy, 1),
+            }
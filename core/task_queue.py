@@ -0,0 +1,170 @@
+"""
+按来源公平调度的优先级任务队列：每个来源（如每个 MQTT 连接）单独排队并限制深度。出队时取优先级最高的任务，
+优先级相同时在来源之间轮流取；超过截止时间的任务不再出队，交给 on_expired 处理
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SOURCE = 'default'
+
+# (负优先级, 序号, 截止时间, 任务)，序号保证同优先级先进先出
+_Entry = Tuple[int, int, Optional[float], Any]
+
+
+class FairQueue:
+    """
+    多来源优先级队列，接口与 queue.Queue 相近。某个来源积压大量任务时，其他来源的任务不必排在其后。
+
+    Attributes:
+    ----------
+    max_per_source: int
+        每个来源最多排队的任务数，0 表示不限制
+    capacity: int
+        所有来源合计最多排队的任务数，0 表示不限制
+    on_expired: Callable[[Any], None]
+        任务过期被丢弃时调用，在锁外执行
+    """
+
+    def __init__(self, max_per_source: int = 0, capacity: int = 0,
+                 on_expired: Optional[Callable[[Any], None]] = None):
+        self.max_per_source = max_per_source
+        self.capacity = capacity
+        self.on_expired = on_expired
+        # 来源 -> 任务堆，按轮转顺序排列，下一个轮到的来源在最前
+        self._sources: "OrderedDict[str, List[_Entry]]" = OrderedDict()
+        self._size = 0
+        self._counter = itertools.count()
+        self._unfinished = 0
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._all_done = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+
+    def put(self, item: Any, source: str = DEFAULT_SOURCE, priority: int = 0,
+            deadline: Optional[float] = None, timeout: float = 0) -> bool:
+        """
+        加入任务
+
+        Args:
+            item: 任务
+            source: 任务来源
+            priority: 优先级，越大越先发送
+            deadline: 截止时间（time.time() 时间戳），过期后不再出队
+            timeout: 已满时最多等待多久（秒）腾出位置，0 表示不等待
+
+        Returns:
+            bool: 该来源或整个队列已满（等待超时）时返回 False，任务不会加入
+        """
+        with self._mutex:
+            expired = self._full(source) and self._purge_expired()
+            if timeout > 0 and self._full(source):
+                self._not_full.wait_for(lambda: not self._full(source), timeout)
+            if not self._full(source):
+                heapq.heappush(self._sources.setdefault(source, []), (-priority, next(self._counter), deadline, item))
+                self._size += 1
+                self._unfinished += 1
+                self._not_empty.notify()
+                accepted = True
+            else:
+                accepted = False
+        self._report_expired(expired or [])
+        return accepted
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """
+        取出优先级最高的任务，优先级相同时按来源轮流
+
+        Raises:
+            queue.Empty: 非阻塞或超时时队列为空
+        """
+        while True:
+            with self._not_empty:
+                if not self._not_empty.wait_for(lambda: self._size, timeout=timeout if block else 0):
+                    raise queue.Empty
+                entry = self._pop()
+            if entry[2] is None or entry[2] > time.time():
+                return entry[3]
+            # 过期任务立即报告，不等到取到下一个有效任务
+            self._report_expired([entry[3]])
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def task_done(self) -> None:
+        with self._mutex:
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._all_done.notify_all()
+
+    def join(self) -> None:
+        """等待所有任务处理完毕"""
+        with self._all_done:
+            self._all_done.wait_for(lambda: self._unfinished <= 0)
+
+    def qsize(self, source: Optional[str] = None) -> int:
+        """排队中的任务数，指定来源时只统计该来源"""
+        with self._mutex:
+            if source is not None:
+                return len(self._sources.get(source, ()))
+            return self._size
+
+    def depths(self) -> Dict[str, int]:
+        """各来源排队中的任务数"""
+        with self._mutex:
+            return {source: len(entries) for source, entries in self._sources.items()}
+
+    # ---------------------------------------------------------------- 内部实现，调用方需持有锁
+
+    def _full(self, source: str) -> bool:
+        if self.capacity and self._size >= self.capacity:
+            return True
+        return bool(self.max_per_source) and len(self._sources.get(source, ())) >= self.max_per_source
+
+    def _pop(self) -> _Entry:
+        # 各来源堆顶中优先级最高的；相同时取轮转顺序靠前的来源
+        source = min(self._sources, key=lambda s: self._sources[s][0][0])
+        entries = self._sources[source]
+        entry = heapq.heappop(entries)
+        self._size -= 1
+        self._not_full.notify_all()
+        # 取过的来源排到最后，轮到其他来源
+        self._sources.move_to_end(source)
+        if not entries:
+            del self._sources[source]
+        return entry
+
+    def _purge_expired(self) -> List[Any]:
+        """队列已满时移除所有已过期的任务，腾出位置"""
+        now, expired = time.time(), []
+        for source in list(self._sources):
+            entries = self._sources[source]
+            kept = [entry for entry in entries if entry[2] is None or entry[2] > now]
+            if len(kept) == len(entries):
+                continue
+            expired += [entry[3] for entry in entries if entry[2] is not None and entry[2] <= now]
+            self._size -= len(entries) - len(kept)
+            if kept:
+                heapq.heapify(kept)
+                self._sources[source] = kept
+            else:
+                del self._sources[source]
+        if expired:
+            self._not_full.notify_all()
+        return expired
+
+    # ---------------------------------------------------------------- 内部实现，在锁外调用
+
+    def _report_expired(self, items: List[Any]) -> None:
+        for item in items:
+            if self.on_expired:
+                try:
+                    self.on_expired(item)
+                except Exception as e:
+                    print(f"处理过期任务时出错: {e}")
+            self.task_done()
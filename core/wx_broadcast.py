@@ -0,0 +1,54 @@
+"""群发消息的预处理，同一条消息发给多个聊天时只需处理一次"""
+
+import os
+from typing import Iterable, Optional
+
+from utils import (build_file_drop_buffer, insert_zwsp_after_emoji, normalize_text)
+
+
+class PreparedBroadcast:
+    """
+    预处理后的群发内容。文本已统一换行并填充防吞字的零宽空格，文件路径已解析为绝对路径，
+    文件的剪切板数据也已构造好，WxOperation 对每个接收方直接重放即可。
+
+    Attributes:
+    ----------
+    texts: tuple
+        预处理后的文本
+    file_paths: tuple
+        文件的绝对路径
+    file_buffer: Optional[ctypes.Array]
+        文件的 CF_HDROP 剪切板数据
+    """
+
+    def __init__(self, msgs: Optional[Iterable[str]] = None, file_paths: Optional[Iterable[str]] = None):
+        """
+        Args:
+            msgs(Iterable[str], Optional): 文本消息
+            file_paths(Iterable[str], Optional): 文件路径
+
+        Raises:
+            ValueError: 如果发送的消息和文件同时为空、存在空文本或文件不存在时抛出异常
+            TypeError: 如果发送的文本消息或文件路径类型不是可迭代对象时抛出异常
+        """
+        if not any([msgs, file_paths]):
+            raise ValueError("发送的消息和文件不可同时为空")
+
+        if msgs and not isinstance(msgs, Iterable):
+            raise TypeError("发送的文本消息必须是可迭代的")
+
+        if file_paths and not isinstance(file_paths, Iterable):
+            raise TypeError("发送的文件路径必须是可迭代的")
+
+        texts = []
+        for msg in msgs or ():
+            if not msg:
+                raise ValueError("发送的文本内容为空")
+            texts.append(insert_zwsp_after_emoji(normalize_text(msg)))
+        self.texts = tuple(texts)
+
+        self.file_paths = tuple(os.path.abspath(os.path.normpath(path)) for path in file_paths or ())
+        for path in self.file_paths:
+            if not os.path.exists(path):
+                raise ValueError(f"文件不存在: {path}")
+        self.file_buffer = build_file_drop_buffer(self.file_paths) if self.file_paths else None
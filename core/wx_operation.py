@@ -1,13 +1,15 @@
 """微信群发消息"""
 
-import re
-import time
-from typing import Iterable
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
 
 import uiautomation as auto
 
-from config import (WeChat, Interval)
-from utils import (copy_files_to_clipboard, wake_up_window, click_below_image)
+from config import (Interval, Image)
+from core.wx_broadcast import PreparedBroadcast
+from core.wx_session import WxSession
+from utils import (copy_files_to_clipboard, get_clipboard_sequence, clipboard_changed, find_image_on_screen,
+                   find_images_on_screen, click_below, template_registry, wait_until, region_changed)
 
 
 class WxOperation:
@@ -18,9 +20,15 @@ class WxOperation:
     ----------
     wx_window: auto.WindowControl
         微信控制窗口
+    session: WxSession
+        微信会话，缓存窗口句柄并管理置顶状态
+    current_chat: Optional[str]
+        最近一次成功发送的聊天名称
 
     Methods:
     -------
+    __match_nickname(name):
+        当前打开的聊天是否为指定好友
     __goto_chat_box(name):
         跳转到 指定好友窗口
     __send_text(*msgs):
@@ -30,27 +38,102 @@ class WxOperation:
     send_msg(name, msgs, file_paths=None, add_remark_name=False, at_everyone=False,
             text_interval=0.05, file_interval=0.5) -> None:
         向指定的好友或群聊发送消息和文件。支持同时发送文本和文件。
+    send_prepared(name, broadcast, text_interval=0.05, file_interval=0.5) -> None:
+        向指定的好友或群聊重放预处理过的群发内容。
     """
 
     def __init__(self):
         self.wx_window = None
         self.wx_window: auto.WindowControl
         auto.SetGlobalSearchTimeout(Interval.BASE_INTERVAL)
-        self.visible_flag: bool = False
+        self.session = WxSession()
+        # 输入框所在的屏幕区域，用于判断粘贴/发送是否已生效
+        self.input_region: Optional[Tuple[int, int, int, int]] = None
+        self.current_chat: Optional[str] = None
+        # 预加载界面锚点模板，发送时无需再从磁盘读取
+        template_registry.preload(Image.GROUP_IMAGE, Image.EMOJI_IMAGE)
 
     def locate_wechat_window(self):
-        if not self.visible_flag:
-            wake_up_window(process_name=WeChat.WeChat_PROCESS_NAME)
-            time.sleep(0.5)
-            self.wx_window = auto.WindowControl(Name=WeChat.WINDOW_NAME, ClassName=WeChat.WINDOW_CLASSNAME)
-            if not self.wx_window.Exists(Interval.MAX_SEARCH_SECOND,
-                                         searchIntervalSeconds=Interval.MAX_SEARCH_INTERVAL):
-                raise Exception('微信似乎并没有登录!')
-            self.visible_flag = bool(self.visible_flag)
-        # 微信窗口置顶
-        self.wx_window.SetTopmost(isTopmost=True)
-
-    def __goto_chat_box(self, name: str) -> bool:
+        """定位微信窗口，窗口仍然存活时直接使用缓存，不会重新启动微信"""
+        self.wx_window = self.session.ensure_window()
+
+    @contextmanager
+    def batch(self):
+        """
+        批量发送的上下文，期间微信窗口保持置顶，整批消息只切换一次置顶状态。
+
+        Examples:
+            >>> with wx.batch():
+            ...     for name in names:
+            ...         wx.send_msg(name, msgs=['hello'])
+        """
+        with self.session.topmost() as window:
+            self.wx_window = window
+            yield self
+
+    def __window_region(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        获取微信窗口的屏幕区域，图像识别只在该区域内进行。
+
+        Returns:
+            (left, top, width, height)，窗口矩形无效时返回 None（即搜索整个屏幕）
+        """
+        rect = self.wx_window.BoundingRectangle
+        if rect.width() <= 0 or rect.height() <= 0:
+            return None
+        return rect.left, rect.top, rect.width(), rect.height()
+
+    def __input_changed(self):
+        """
+        创建“输入框内容已变化”条件，调用时截取输入框作为基准。输入框位置未知时条件永不满足，等待退化为固定超时。
+        """
+        if self.input_region is None:
+            return lambda: False
+        return region_changed(self.input_region)
+
+    def __match_nickname(self, name: str) -> bool:
+        """
+        当前打开的聊天是否就是 name。只有上一次发送的聊天与 name 相同时才检查，
+        并通过 UIA 确认聊天输入框（EditControl 的 Name 即聊天名称）仍然存在，避免用户手动切换聊天后误判。
+
+        Args:
+            name(str): 必选参数，好友名称
+
+        Returns:
+            bool: 当前聊天为 name 时返回 True
+        """
+        if name != self.current_chat or self.input_region is None:
+            return False
+        try:
+            return bool(self.wx_window.EditControl(Name=name).Exists(0, 0))
+        except Exception:
+            return False
+
+    @staticmethod
+    def __focused_runtime_id() -> Optional[Tuple[int, ...]]:
+        """当前获得焦点的控件的 RuntimeId，获取失败时返回 None"""
+        try:
+            return tuple(auto.GetFocusedControl().GetRuntimeId())
+        except Exception:
+            return None
+
+    @staticmethod
+    def __search_focused(previous: Optional[Tuple[int, ...]]) -> bool:
+        """
+        焦点是否已从 previous 移到另一个 EditControl（搜索框）上
+
+        Args:
+            previous: Ctrl+F 之前获得焦点的控件的 RuntimeId
+
+        Returns:
+            bool: 搜索框已获得焦点时返回 True
+        """
+        control = auto.GetFocusedControl()
+        if control.ControlTypeName != 'EditControl':
+            return False
+        return previous is None or tuple(control.GetRuntimeId()) != previous
+
+    def __goto_chat_box(self, name: str) -> Optional[Dict[str, Optional[Tuple[int, int, int, int]]]]:
         """
         跳转到指定 name好友的聊天窗口。
 
@@ -58,31 +141,42 @@ class WxOperation:
             name(str): 必选参数，好友名称
 
         Returns:
-            None
+            跳转成功时返回搜索结果同一帧中识别到的界面锚点（图片路径 -> 坐标），失败返回 None
         """
         assert name, "无法跳转到名字为空的聊天窗口"
-        self.wx_window.SendKeys(text='{Ctrl}F', waitTime=Interval.BASE_INTERVAL)
-        self.wx_window.SendKeys(text='{Ctrl}A', waitTime=Interval.BASE_INTERVAL)
-        self.wx_window.SendKey(key=auto.SpecialKeyNames['DELETE'])
+        # 聊天输入框同样是 EditControl，须等焦点离开 Ctrl+F 之前的控件、落到新的输入框上才算搜索框已获得焦点
+        focused = self.__focused_runtime_id()
+        self.wx_window.SendKeys(text='{Ctrl}F', waitTime=0)
+        # 搜索框获得焦点后再输入，最多等待原来的固定间隔
+        wait_until(lambda: self.__search_focused(focused), timeout=Interval.BASE_INTERVAL, name='search_focus')
+        self.wx_window.SendKeys(text='{Ctrl}A', waitTime=0)
+        self.wx_window.SendKey(key=auto.SpecialKeyNames['DELETE'], waitTime=0)
         auto.SetClipboardText(text=name)
-        time.sleep(Interval.BASE_INTERVAL)
-        self.wx_window.SendKeys(text='{Ctrl}V', waitTime=Interval.BASE_INTERVAL)
+        self.wx_window.SendKeys(text='{Ctrl}V', waitTime=0)
+
+        # 轮询直到出现搜索结果，每次截图同时识别搜索结果和输入框上方的表情按钮
+        region = self.__window_region()
+        anchors = {}
 
-        image_path = 'assets/images/group.png'
-        if click_below_image(image_path=image_path, offset_y=50):
-            return True
+        def search_ready() -> bool:
+            anchors.update(find_images_on_screen([Image.GROUP_IMAGE, Image.EMOJI_IMAGE], region=region,
+                                                 log_miss=False))
+            return anchors[Image.GROUP_IMAGE] is not None
+
+        wait_until(search_ready, timeout=Interval.SEARCH_TIMEOUT, name='search_result')
+        if click_below(anchors.get(Image.GROUP_IMAGE), offset_y=Image.CLICK_OFFSET_Y):
+            return anchors
 
         # 无匹配用户, 取消搜索框
         self.wx_window.SendKeys(text='{Esc}', waitTime=Interval.BASE_INTERVAL)
-        return False
+        return None
 
     def __send_text(self, *msgs, wait_time, send_shortcut) -> None:
         """
         发送文本.
 
         Args:
-            input_name(str): 必选参数, 为输入框
-            *msgs(str): 必选参数，为发送的文本
+            *msgs(str): 必选参数，为已经过 PreparedBroadcast 预处理的文本
             wait_time(float): 必选参数，为动态等待时间
             send_shortcut(str): 必选参数，为发送快捷键
 
@@ -90,62 +184,33 @@ class WxOperation:
             None
         """
 
-        def insert_zwsp_after_emoji(text: str) -> str:
-            """
-            统计文本中emoji的数量，在整个字符串末尾添加相应数量的零宽空格 \u200b，
-            避免微信吞字问题。
-            """
-            # 检测emoji表情符号的正则表达式
-            emoji_pattern = re.compile("["
-                                       "\U0001F600-\U0001F64F"  # emoticons
-                                       "\U0001F300-\U0001F5FF"  # symbols & pictographs
-                                       "\U0001F680-\U0001F6FF"  # transport & map symbols
-                                       "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                                       "\U00002500-\U00002BEF"  # chinese char
-                                       "\U00002702-\U000027B0"
-                                       "\U00002702-\U000027B0"
-                                       "\U000024C2-\U0001F251"
-                                       "\U0001f926-\U0001f937"
-                                       "\U00010000-\U0010ffff"
-                                       "\u2640-\u2642"
-                                       "\u2600-\u2B55"
-                                       "\u200d"
-                                       "\u23cf"
-                                       "\u23e9"
-                                       "\u231a"
-                                       "\ufe0f"  # dingbats
-                                       "\u3030"
-                                       "]+", flags=re.UNICODE)
-
-            # 查找所有匹配的emoji
-            emojis_found = emoji_pattern.findall(text)
-
-            # 计算emoji总数量
-            emoji_count = sum(len(emoji_group) for emoji_group in emojis_found)
-
-            # 在文本末尾添加相应数量的零宽空格
-            return text + ('\u200b' * emoji_count)
-
         for msg in msgs:
-            assert msg, "发送的文本内容为空"
-            self.wx_window.SendKeys(text='{Ctrl}a', waitTime=wait_time)
-            self.wx_window.SendKey(key=auto.SpecialKeyNames['DELETE'], waitTime=wait_time)
+            self.wx_window.SendKeys(text='{Ctrl}a', waitTime=0)
+            self.wx_window.SendKey(key=auto.SpecialKeyNames['DELETE'], waitTime=0)
 
             # 设置到剪切板再黏贴到输入框
-            msg = insert_zwsp_after_emoji(msg)
+            sequence = get_clipboard_sequence()
             auto.SetClipboardText(text=msg)
-            time.sleep(wait_time * 2.5)
-            self.wx_window.SendKeys(text='{Ctrl}v', waitTime=wait_time * 2)
+            wait_until(clipboard_changed(sequence), timeout=wait_time * 2.5, name='clipboard_text')
+
+            # 以下等待的超时与原来的固定间隔相同，界面先更新则提前返回；
+            # 粘贴生效前不能发送，否则下一条消息写入剪切板后会被粘贴两次
+            pasted = self.__input_changed()
+            self.wx_window.SendKeys(text='{Ctrl}v', waitTime=0)
+            wait_until(pasted, timeout=wait_time * 2, name='paste_text')
 
-            # 发送消息
-            self.wx_window.SendKeys(text=f'{send_shortcut}', waitTime=wait_time * 2)
+            # 发送消息，输入框被清空即视为已发送
+            sent = self.__input_changed()
+            self.wx_window.SendKeys(text=f'{send_shortcut}', waitTime=0)
+            wait_until(sent, timeout=wait_time * 2, name='send_text')
 
-    def __send_file(self, *file_paths, wait_time, send_shortcut) -> None:
+    def __send_file(self, *file_paths, file_buffer=None, wait_time, send_shortcut) -> None:
         """
         发送文件.
 
         Args:
             *file_paths(str): 必选参数，为文件的路径
+            file_buffer(ctypes.Array): 可选参数，为预先构造的剪切板数据
             wait_time(float): 必选参数，为动态等待时间
             send_shortcut(str): 必选参数，为发送快捷键
 
@@ -153,13 +218,15 @@ class WxOperation:
             None
         """
         # 复制文件到剪切板
-        if copy_files_to_clipboard(file_paths=file_paths):
+        if copy_files_to_clipboard(file_paths=file_paths, buf=file_buffer):
             # 粘贴到输入框
-            self.wx_window.SendKeys(text='{Ctrl}V', waitTime=wait_time)
-            # 按下回车键
-            self.wx_window.SendKeys(text=f'{send_shortcut}', waitTime=wait_time / 2)
-
-            time.sleep(wait_time)  # 等待发送动作完成
+            pasted = self.__input_changed()
+            self.wx_window.SendKeys(text='{Ctrl}V', waitTime=0)
+            wait_until(pasted, timeout=wait_time, name='paste_file')
+            # 按下回车键，等待发送动作完成（输入框被清空）
+            sent = self.__input_changed()
+            self.wx_window.SendKeys(text=f'{send_shortcut}', waitTime=0)
+            wait_until(sent, timeout=wait_time * 1.5, name='send_file')
 
     def send_msg(self, name, msgs=None, file_paths=None, text_interval=Interval.SEND_TEXT_INTERVAL,
                  file_interval=Interval.SEND_FILE_INTERVAL, send_shortcut='{Enter}') -> None:
@@ -178,36 +245,57 @@ class WxOperation:
             ValueError: 如果用户名为空或发送的消息和文件同时为空时抛出异常
             TypeError: 如果发送的文本消息或文件路径类型不是列表或元组时抛出异常
         """
-
-        # 定位到微信窗口
-        self.locate_wechat_window()
-
         if not name:
             raise ValueError("用户名不能为空")
 
-        if not any([msgs, file_paths]):
-            raise ValueError("发送的消息和文件不可同时为空")
+        self.send_prepared(name, PreparedBroadcast(msgs, file_paths), text_interval=text_interval,
+                           file_interval=file_interval, send_shortcut=send_shortcut)
 
-        if msgs and not isinstance(msgs, Iterable):
-            raise TypeError("发送的文本消息必须是可迭代的")
-
-        if file_paths and not isinstance(file_paths, Iterable):
-            raise TypeError("发送的文件路径必须是可迭代的")
-
-        # 如果当前面板已经是需发送好友, 则无需再次搜索跳转
-        # if not self.__match_nickname(name=name):
-        if not self.__goto_chat_box(name=name):
-            raise NameError('搜索失败')
+    def send_prepared(self, name, broadcast: PreparedBroadcast, text_interval=Interval.SEND_TEXT_INTERVAL,
+                      file_interval=Interval.SEND_FILE_INTERVAL, send_shortcut='{Enter}') -> None:
+        """
+        向指定好友发送预处理过的群发内容，同一个 PreparedBroadcast 可以重放给多个接收方
 
-        # 设置输入框为当前焦点
-        image_path = 'assets/images/emoji.png'
-        if not click_below_image(image_path=image_path, offset_y=50):
-            raise NameError('群聊不存在')
+        Args:
+            name(str):必选参数，接收消息的好友名称
+            broadcast(PreparedBroadcast): 必选参数，预处理后的文本和文件
+            text_interval(float): 可选参数，默认为0.05
+            file_interval(float): 可选参数，默认为0.5
+            send_shortcut(str): 可选参数，默认为 Enter
 
-        if msgs:
-            self.__send_text(*msgs, wait_time=text_interval, send_shortcut=send_shortcut)
-        if file_paths:
-            self.__send_file(*file_paths, wait_time=file_interval, send_shortcut=send_shortcut)
+        Raises:
+            ValueError: 如果用户名为空时抛出异常
+        """
+        if not name:
+            raise ValueError("用户名不能为空")
 
-        # 取消微信窗口置顶
-        self.wx_window.SetTopmost(isTopmost=False)
+        # 定位到微信窗口并在发送期间保持置顶，处于 batch() 中时不会重复切换
+        with self.batch():
+            region = self.__window_region()
+            # 如果当前面板已经是需发送好友, 则无需再次搜索跳转
+            if self.__match_nickname(name=name):
+                anchors = {Image.EMOJI_IMAGE: None}
+            else:
+                self.current_chat = None
+                anchors = self.__goto_chat_box(name=name)
+                if anchors is None:
+                    raise NameError('搜索失败')
+
+                # 等待搜索结果列表关闭，即聊天已切换
+                wait_until(lambda: find_image_on_screen(Image.GROUP_IMAGE, region=region, log_miss=False) is None,
+                           timeout=Interval.BASE_INTERVAL, name='chat_open')
+
+            # 设置输入框为当前焦点，表情按钮的位置不随聊天切换而变化，搜索时已识别到则无需再次截图
+            emoji_coords = anchors[Image.EMOJI_IMAGE] or find_image_on_screen(Image.EMOJI_IMAGE, region=region)
+            if not click_below(emoji_coords, offset_y=Image.CLICK_OFFSET_Y):
+                raise NameError('群聊不存在')
+            left, top, width, height = emoji_coords
+            self.input_region = (left, top + height) + Image.INPUT_REGION_SIZE
+
+            if broadcast.texts:
+                self.__send_text(*broadcast.texts, wait_time=text_interval, send_shortcut=send_shortcut)
+            if broadcast.file_paths:
+                self.__send_file(*broadcast.file_paths, file_buffer=broadcast.file_buffer, wait_time=file_interval,
+                                 send_shortcut=send_shortcut)
+
+            self.current_chat = name
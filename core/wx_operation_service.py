@@ -3,84 +3,208 @@
 微信服务层，处理微信消息发送的核心业务逻辑
 """
 
-import concurrent.futures
+import itertools
 import os
 import queue
-import tempfile
 import threading
-import urllib.request
-from typing import List, Optional
+import time
+import uuid
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import pythoncom
 
-from core import WxOperation
+from config import (Journal, Pipeline, RateLimit, Status)
+from core import (FairQueue, PreparedBroadcast, SendMetrics, SendRateLimiter, WxOperation)
+from core.task_queue import DEFAULT_SOURCE
+from utils import (get_attachment_cache, get_downloader, TaskJournal)
+from utils.journal_utils import (SENDING, DONE, FAILED)
 
 
-def _get_file_extension(url: str) -> str:
-    """从URL获取文件扩展名"""
-    extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-    url_lower = url.lower()
-    for ext in extensions:
-        if ext in url_lower:
-            return ext
-    return '.jpg'  # 默认扩展名
-
-
-def _download_images_concurrently(image_urls: List[str], temp_files_list: List[str], max_workers: int = 5):
+def _download_images_concurrently(image_urls: List[str], fetched_files: List[str]):
     """
-    并发下载图片
+    在全局下载线程池中并发下载图片，已缓存且未过期的图片直接使用本地文件
 
     Args:
         image_urls: 图片URL列表
-        temp_files_list: 用于存储临时文件路径的列表
-        max_workers: 最大并发数
+        fetched_files: 用于记录取得的缓存文件，发送完毕后需交给 AttachmentCache.release
 
     Returns:
-        list: 下载后的临时文件路径列表
+        list: 下载成功的图片的本地文件路径列表，顺序与 image_urls 一致
     """
-    file_paths = []
+    cache = get_attachment_cache()
+    futures = [get_downloader().submit(cache.fetch, url) for url in image_urls]
+    file_paths = [future.result() for future in futures]
+    fetched_files.extend(file_path for file_path in file_paths if file_path)
+    return [file_path for file_path in file_paths if file_path]
 
-    def download_single_image(url):
-        try:
-            # 创建临时文件
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=_get_file_extension(url))
-            temp_file.close()
 
-            # 下载文件
-            urllib.request.urlretrieve(url, temp_file.name)
+def _group_sends_by_recipient(tasks: List["_PreparedTask"], current_chat: Optional[str] = None) -> List[Tuple[int, str]]:
+    """
+    将多个任务的发送拆分为 (任务序号, 聊天名称)，并把发往同一聊天的发送排在一起，减少重复跳转。
+    同一聊天内保持任务的原始顺序；当前已打开的聊天排在最前面，其余按首次出现的顺序。
+
+    Args:
+        tasks: 任务列表
+        current_chat: 当前已打开的聊天名称
 
-            # 添加到临时文件列表中，以便后续清理
-            temp_files_list.append(temp_file.name)
-            return temp_file.name
-        except Exception as e:
-            print(f"下载图片失败 {url}: {e}")
-            return None
+    Returns:
+        List[Tuple[int, str]]: 排序后的发送单元
+    """
+    groups = {}
+    if current_chat is not None:
+        groups[current_chat] = []
+    for index, task in enumerate(tasks):
+        for chat_name in task.chat_names:
+            groups.setdefault(chat_name, []).append(index)
+    return [(index, chat_name) for chat_name, indexes in groups.items() for index in indexes]
+
+
+class TaskExpiredError(Exception):
+    """任务在发送前已超过截止时间"""
+    reason = 'expired'
+
+
+class QueueFullError(Exception):
+    """发送队列已满，任务未加入队列"""
+    reason = 'queue_full'
+
+
+class TaskInterruptedError(Exception):
+    """上次运行时任务发送到一半被中断，为避免重复发送不再重发"""
+    reason = 'interrupted'
+
+
+class _QueuedTask(NamedTuple):
+    """排队中的任务"""
+    task_id: str  # 任务编号，由生产者指定或自动生成，用于对应发送结果
+    chat_names: List[str]
+    messages: Optional[List[str]]
+    image_urls: Optional[List[str]]
+    callback: Optional[Callable[[dict], None]]
+    priority: int
+    deadline: Optional[float]  # time.time() 时间戳，None 表示不过期
+    journal_id: Optional[int] = None  # 任务日志中的编号，未启用任务日志时为 None
+
+
+class _PreparedTask(NamedTuple):
+    """预取阶段处理完毕、等待界面阶段发送的任务"""
+    task_id: str
+    chat_names: List[str]
+    broadcast: Optional[PreparedBroadcast]
+    files: List[str]  # 从附件缓存取得的文件，发送完毕后释放
+    size: int  # 附件总大小（字节）
+    error: Optional[Exception]
+    callback: Optional[Callable[[dict], None]]
+    priority: int
+    deadline: Optional[float]
+    journal_id: Optional[int] = None
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, TaskExpiredError):
+        return f"任务已过期，未发送：{error}"
+    if isinstance(error, TaskInterruptedError):
+        return f"任务发送中断，未重发：{error}"
+    return f"发送消息失败：{error}"
+
+
+def _make_chat_result(chat_name: str, error: Optional[Exception], elapsed: float = 0.0) -> dict:
+    """单个聊天的发送结果，elapsedMs 为该聊天的界面操作耗时"""
+    result = {"chatName": chat_name, "success": error is None, "elapsedMs": round(elapsed * 1000)}
+    if error is not None:
+        result["message"] = _error_message(error)
+        if getattr(error, 'reason', None):
+            result["reason"] = error.reason
+    return result
+
+
+def _make_result(task_id: str, chat_names: List[str], error: Optional[Exception] = None,
+                 chats: Optional[Dict[str, dict]] = None) -> dict:
+    """
+    任务执行结果，包含每个聊天的发送结果，failedChats 列出发送失败的聊天，生产者只需重发这些聊天
 
-    # 使用线程池并发下载
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_url = {executor.submit(download_single_image, url): url for url in image_urls}
-        for future in concurrent.futures.as_completed(future_to_url):
-            file_path = future.result()
-            if file_path:
-                file_paths.append(file_path)
+    Args:
+        task_id: 任务编号
+        chat_names: 任务的聊天对象
+        error: 整个任务的错误（预处理失败、过期、被拒绝等），未发送的聊天均记为该错误
+        chats: 已尝试发送的聊天的结果，聊天名称 -> _make_chat_result 的返回值
 
-    return file_paths
+    Returns:
+        dict: 执行结果；任务过期、被拒绝或上次运行中断时带有 reason（expired、queue_full 或 interrupted）
+    """
+    chats = chats or {}
+    chat_results = [chats.get(chat_name) or _make_chat_result(chat_name, error) for chat_name in chat_names]
+    failed = [chat["chatName"] for chat in chat_results if not chat["success"]]
+    success = error is None and not failed
+    if success:
+        message = "消息发送成功"
+    elif len(failed) < len(chat_results):
+        message = f"部分聊天发送失败：{'、'.join(failed)}"
+    else:
+        message = _error_message(error) if error is not None else chat_results[0]["message"]
+    result = {"taskId": task_id, "success": success, "message": message}
+    if len(failed) == len(chat_results) and getattr(error, 'reason', None):
+        result["reason"] = error.reason
+    result.update(chats=chat_results, failedChats=failed)
+    return result
 
 
 class WeChatService:
-    """微信服务类，封装微信消息发送相关业务逻辑"""
+    """
+    微信服务类，封装微信消息发送相关业务逻辑。
+
+    任务分两个阶段处理：预取线程依次为排队的任务下载附件并预处理内容，最多提前 prefetch_depth 个任务，
+    且已预取未发送的附件总大小不超过 prefetch_max_bytes；唯一的界面线程只发送已准备好的任务，
+    因此下载时间与界面操作时间相互重叠。
+
+    同一进程内只应有一个实例操作微信窗口，通过 get_wechat_service 获取。多个 MQTT 连接作为不同来源提交任务，
+    按来源轮流调度，每个来源最多排队 max_per_source 个任务，合计最多 capacity 个。
+    优先级高的任务先发送；超过截止时间仍未发送的任务会被丢弃，并通过回调告知原因。
 
-    def __init__(self):
+    指定 journal 时，任务先写入任务日志再排队，并随发送进度更新状态；启动时重新排队上次运行未完成的任务。
+
+    某个聊天发送失败时继续发送任务的其余聊天，回调收到的结果包含每个聊天的成败和耗时。
+
+    指定 rate_limiter 时按全局和每个聊天的速率发送：某个聊天需要等待时，先发送同一批中其他已允许的聊天。
+    """
+
+    def __init__(self, group_by_recipient: bool = True, prefetch_depth: int = Pipeline.PREFETCH_DEPTH,
+                 prefetch_max_bytes: int = Pipeline.PREFETCH_MAX_BYTES,
+                 max_per_source: int = Pipeline.SOURCE_QUEUE_DEPTH, capacity: int = Pipeline.QUEUE_CAPACITY,
+                 journal: Optional[TaskJournal] = None, rate_limiter: Optional[SendRateLimiter] = None):
+        # 是否将队列中积压的任务按接收方重新排序
+        self.group_by_recipient = group_by_recipient
+        self.prefetch_depth = prefetch_depth
+        self.prefetch_max_bytes = prefetch_max_bytes
+        self.journal = journal
+        self.rate_limiter = rate_limiter
+        # 界面线程每次向一个聊天发送的统计，用于状态报告
+        self.metrics = SendMetrics()
+        # 来源 -> 结果处理函数，用于从任务日志恢复的任务（其原始回调已随上次运行丢失）
+        self._result_handlers: Dict[str, Callable[[dict], None]] = {}
+        # 来源 -> 注册处理函数之前已产生的恢复任务结果，注册时补交
+        self._unhandled_results: Dict[str, List[dict]] = {}
+        self._handlers_lock = threading.Lock()
         self.wx_instance = None
         self.com_initialized = False
-        # 创建消息队列
-        self.message_queue = queue.Queue()
+        # 创建消息队列，按优先级和来源调度
+        self.message_queue = FairQueue(max_per_source=max_per_source, capacity=capacity,
+                                       on_expired=self._on_task_expired)
+        # 已准备好的任务，队列容量即预取深度
+        self.ready_queue = queue.Queue(maxsize=prefetch_depth)
+        self._prefetched_bytes = 0
+        self._prefetch_budget = threading.Condition()
+        if journal:
+            self._recover_tasks()
         # 启动处理线程
+        if prefetch_depth > 0:
+            self.prefetch_thread = threading.Thread(target=self._prefetch_queue, daemon=True)
+            self.prefetch_thread.start()
         self.processing_thread = threading.Thread(target=self._process_queue, daemon=True)
         self.processing_thread.start()
 
     def _get_wx_instance(self):
-        """获取全局WxOperation实例，避免重复初始化COM库"""
+        """获取WxOperation实例，只在界面线程中调用，该线程是唯一初始化COM库并操作微信窗口的线程"""
         if not self.com_initialized:
             pythoncom.CoInitialize()
             self.com_initialized = True
@@ -88,31 +212,127 @@ class WeChatService:
 
         return self.wx_instance
 
-    def _process_queue(self):
-        """处理消息队列中的任务"""
+    def set_result_handler(self, source: str, handler: Callable[[dict], None]) -> None:
+        """指定来源的结果处理函数，从任务日志恢复的该来源任务完成后调用，注册前已完成的任务结果在注册时补交"""
+        with self._handlers_lock:
+            self._result_handlers[source] = handler
+            results = self._unhandled_results.pop(source, [])
+        for result in results:
+            handler(result)
+
+    def _recovered_callback(self, source: str) -> Callable[[dict], None]:
+        def callback(result: dict) -> None:
+            with self._handlers_lock:
+                handler = self._result_handlers.get(source)
+                if not handler:
+                    # 恢复在构造时进行，此时来源可能还未注册处理函数
+                    self._unhandled_results.setdefault(source, []).append(result)
+                    return
+            handler(result)
+
+        return callback
+
+    def _recover_tasks(self, resend_interrupted: bool = Journal.RESEND_INTERRUPTED) -> None:
+        """重新排队上次运行未完成的任务，不重发的中断任务和无法排队的任务直接产生失败结果"""
+        recovered = self.journal.recover(resend_interrupted)
+        for task in recovered:
+            task_id = task.payload.get("task_id") or uuid.uuid4().hex
+            chat_names = task.payload["chat_names"]
+            callback = self._recovered_callback(task.source)
+            if task.state == SENDING and not resend_interrupted:
+                callback(_make_result(task_id, chat_names, TaskInterruptedError("上次运行时发送到一半被中断")))
+                continue
+            queued = _QueuedTask(task_id, chat_names, task.payload["messages"], task.payload["image_urls"],
+                                 callback, task.priority, task.deadline, task.task_id)
+            if not self.message_queue.put(queued, source=task.source, priority=task.priority, deadline=task.deadline):
+                self._mark_journal([task.task_id], FAILED, 'queue_full')
+                error = QueueFullError(f"发送队列已满（{task.source}），恢复的任务未排队")
+                callback(_make_result(task_id, chat_names, error))
+        if recovered:
+            print(f"已从任务日志恢复 {len(recovered)} 个未完成的任务")
+
+    def _prefetch_queue(self):
+        """预取阶段：按顺序为排队的任务下载附件，准备好后交给界面阶段"""
         while True:
+            task = self.message_queue.get()
+            if task is None:
+                self.ready_queue.put(None)
+                break
             try:
-                # 从队列获取任务
-                task = self.message_queue.get()
-                if task is None:
-                    break
+                # 已预取的附件超出上限时，等界面阶段发送并释放后再继续
+                with self._prefetch_budget:
+                    self._prefetch_budget.wait_for(lambda: self._prefetched_bytes < self.prefetch_max_bytes)
+                prepared = self._prepare_task(task)
+                with self._prefetch_budget:
+                    self._prefetched_bytes += prepared.size
+                # 预取深度已满时阻塞
+                self.ready_queue.put(prepared)
+            except Exception as e:
+                print(f"预取任务时出错: {e}")
+                self.ready_queue.put(_PreparedTask(task.task_id, task.chat_names, None, [], 0, e, task.callback,
+                                                   task.priority, task.deadline, task.journal_id))
+
+    def _next_ready(self, block: bool = True) -> Optional[_PreparedTask]:
+        """取出下一个已准备好的任务；未启用预取时在当前线程准备。无任务时抛出 queue.Empty"""
+        if self.prefetch_depth > 0:
+            return self.ready_queue.get(block)
+        task = self.message_queue.get(block)
+        return None if task is None else self._prepare_task(task)
+
+    def _drain_ready(self) -> List[Optional[_PreparedTask]]:
+        """
+        取出预取阶段已准备好的所有任务。未启用预取时没有已准备好的任务，
+        不在界面线程中提前准备（下载）后续任务，以免推迟第一个任务的发送
+        """
+        tasks = []
+        if self.prefetch_depth <= 0:
+            return tasks
+        while True:
+            try:
+                tasks.append(self.ready_queue.get_nowait())
+            except queue.Empty:
+                return tasks
 
-                chat_names, messages, image_urls, callback = task
+    def _process_queue(self):
+        """界面阶段：发送已准备好的任务"""
+        while True:
+            tasks, stop = [], False
+            try:
+                # 获取任务，并一并取出已准备好的任务以便按接收方合并
+                tasks = [self._next_ready()]
+                if self.group_by_recipient:
+                    tasks += self._drain_ready()
+                stop = None in tasks
+                tasks = [task for task in tasks if task is not None]
 
                 # 执行发送任务
-                result = self._send_message_internal(chat_names, messages, image_urls)
-
-                # 执行回调通知结果
-                if callback:
-                    callback(result)
-
-                self.message_queue.task_done()
+                try:
+                    results = self._send_prepared_tasks(tasks) if tasks else []
+                finally:
+                    self._release_tasks(tasks)
+
+                # 执行回调通知结果，某个回调出错不影响其他任务的回调
+                for task, result in zip(tasks, results):
+                    if task.callback:
+                        try:
+                            task.callback(result)
+                        except Exception as e:
+                            print(f"任务 {task.task_id} 的回调出错: {e}")
 
             except Exception as e:
                 print(f"处理队列任务时出错: {e}")
+            finally:
+                # 出错时也要标记完成，否则 message_queue.join() 永远等待
+                for _ in range(len(tasks) + stop):
+                    self.message_queue.task_done()
+            if stop:
+                break
 
     def send_message_to_chats(self, chat_names: List[str], messages: Optional[List[str]] = None,
-                              image_urls: Optional[List[str]] = None, callback=None) -> dict:
+                              image_urls: Optional[List[str]] = None, callback=None,
+                              source: str = DEFAULT_SOURCE, priority: int = 0, ttl: Optional[float] = None,
+                              deadline: Optional[float] = None, task_id: Optional[str] = None,
+                              timeout: float = 0) -> dict:
         """
         发送消息到多个聊天对象
         
@@ -121,50 +341,212 @@ class WeChatService:
             messages: 消息文本列表
             image_urls: 图片URL列表
             callback: 回调函数，用于异步通知结果
+            source: 任务来源，不同来源之间轮流发送
+            priority: 优先级，越大越先发送
+            ttl: 有效期（秒），超过后未发送的任务会被丢弃
+            deadline: 截止时间（Unix 时间戳，秒），与 ttl 同时指定时取较早者
+            task_id: 任务编号，用于对应发送结果，不指定时自动生成
+            timeout: 队列已满时最多等待多久（秒）腾出位置，0 表示立即返回 queue_full
             
         Returns:
-            dict: 执行结果
+            dict: 执行结果，包含 taskId；队列已满或任务已过期时 success 为 False，reason 为 queue_full 或 expired，
+            格式与回调收到的结果相同
+        """
+        task_id = task_id or uuid.uuid4().hex
+        if ttl is not None:
+            deadline = min(deadline or float('inf'), time.time() + ttl)
+        if deadline is not None and deadline <= time.time():
+            return _make_result(task_id, chat_names, TaskExpiredError("未加入发送队列"))
+
+        # 先写入任务日志再加入队列，入队后进程崩溃也能恢复
+        journal_id = None
+        if self.journal:
+            journal_id = self.journal.add(source, chat_names, messages, image_urls, priority, deadline, task_id)
+        task = _QueuedTask(task_id, chat_names, messages, image_urls, callback, priority, deadline, journal_id)
+        if not self.message_queue.put(task, source=source, priority=priority, deadline=deadline, timeout=timeout):
+            if self.journal:
+                self.journal.mark([journal_id], FAILED, 'queue_full')
+            return _make_result(task_id, chat_names, QueueFullError(f"发送队列已满（{source}），请稍后重试"))
+
+        return {"taskId": task_id, "success": True, "message": "消息已加入发送队列"}
+
+    def get_load(self) -> dict:
+        """排队中和已准备好等待发送的任务数，以及队列容量，用于向生产者报告负载"""
+        return {"queued": self.message_queue.qsize(), "prepared": self.ready_queue.qsize(),
+                "capacity": self.message_queue.capacity, "sourceCapacity": self.message_queue.max_per_source}
+
+    def get_status(self) -> dict:
+        """
+        负载、发送统计和处理线程的存活情况。界面线程或预取线程已退出，或在一次发送中停留超过 Status.STUCK_AFTER 秒时，
+        healthy 为 False
         """
-        # 将任务加入队列
-        self.message_queue.put((chat_names, messages, image_urls, callback))
+        status = dict(self.get_load(), **self.metrics.snapshot())
+        status["uiThreadAlive"] = self.processing_thread.is_alive()
+        status["prefetchThreadAlive"] = self.prefetch_thread.is_alive() if self.prefetch_depth > 0 else None
+        status["healthy"] = status["uiThreadAlive"] and status["prefetchThreadAlive"] is not False \
+            and status["busyS"] < Status.STUCK_AFTER
+        return status
+
+    def _on_task_expired(self, task: _QueuedTask) -> None:
+        """排队中的任务过期被丢弃"""
+        print(f"任务已过期，丢弃: {task.chat_names}")
+        if self.journal:
+            self.journal.mark([task.journal_id], FAILED, 'expired')
+        if task.callback:
+            task.callback(_make_result(task.task_id, task.chat_names, TaskExpiredError("排队超过截止时间")))
+
+    @staticmethod
+    def _prepare_task(task: _QueuedTask) -> _PreparedTask:
+        """
+        下载任务的图片并预处理内容，每个任务只处理一次，发送给各个聊天时直接重放
 
-        return {"success": True, "message": "消息已加入发送队列"}
+        Args:
+            task: 排队中的任务
 
-    def _send_message_internal(self, chat_names: List[str], messages: Optional[List[str]] = None,
-                               image_urls: Optional[List[str]] = None) -> dict:
+        Returns:
+            _PreparedTask: 准备好的任务，预处理失败时 error 不为空
         """
-        实际执行消息发送的内部方法
-        
+        task_id, chat_names, messages, image_urls, callback, priority, deadline, journal_id = task
+        files, broadcast, error = [], None, None
+        try:
+            file_paths = _download_images_concurrently(image_urls, files) if image_urls else []
+            broadcast = PreparedBroadcast(messages, file_paths)
+        except Exception as e:
+            error = e
+        size = sum(os.path.getsize(file) for file in files if os.path.exists(file))
+        return _PreparedTask(task_id, chat_names, broadcast, files, size, error, callback, priority, deadline,
+                             journal_id)
+
+    def _release_tasks(self, tasks: List[_PreparedTask]) -> None:
+        """释放任务占用的缓存文件，之后才允许被淘汰，并归还预取额度"""
+        get_attachment_cache().release(file for task in tasks for file in task.files)
+        if self.prefetch_depth <= 0:
+            return
+        with self._prefetch_budget:
+            self._prefetched_bytes -= sum(task.size for task in tasks)
+            self._prefetch_budget.notify_all()
+
+    def _next_allowed_send(self, sends: List[Tuple[int, str]]) -> Tuple[Optional[int], float]:
+        """
+        按顺序找到第一个限速允许的发送单元并记录这次发送
+
+        Returns:
+            Tuple[Optional[int], float]: (在 sends 中的位置, 0)；都需要等待时为 (None, 最短等待秒数)
+        """
+        if self.rate_limiter is None:
+            return 0, 0.0
+        shortest = float('inf')
+        for position, (_, chat_name) in enumerate(sends):
+            delay = self.rate_limiter.delay(chat_name)
+            if delay <= 0:
+                self.rate_limiter.acquire(chat_name)
+                return position, 0.0
+            shortest = min(shortest, delay)
+        return None, shortest
+
+    def _send_prepared_tasks(self, tasks: List[_PreparedTask]) -> List[dict]:
+        """
+        发送一批任务，按接收方合并后依次发送。某个聊天发送失败时继续发送其余聊天；任务过期时跳过该任务剩余的聊天
+
         Args:
-            chat_names: 聊天对象名称列表
-            messages: 消息文本列表
-            image_urls: 图片URL列表
-            
+            tasks: 已准备好的任务列表
+
         Returns:
-            dict: 执行结果
+            List[dict]: 与任务一一对应的执行结果
         """
-        temp_files = []
+        # 整个任务的错误，以及每个聊天的发送结果
+        errors: List[Optional[Exception]] = [task.error for task in tasks]
+        chats: List[Dict[str, dict]] = [{} for _ in tasks]
+        self._mark_journal([task.journal_id for task in tasks], SENDING)
         try:
             wx = self._get_wx_instance()
 
-            # 并发下载所有图片URL到临时文件
-            file_paths = []
-            if image_urls:
-                file_paths = _download_images_concurrently(image_urls, temp_files)
+            if self.group_by_recipient:
+                # 只在相同优先级的任务之间按接收方合并，不让低优先级任务排到高优先级任务前面
+                sends, current_chat = [], wx.current_chat
+                for _, run in itertools.groupby(range(len(tasks)), key=lambda i: tasks[i].priority):
+                    run = list(run)
+                    sends += [(run[0] + index, chat_name) for index, chat_name
+                              in _group_sends_by_recipient(tasks[run[0]:run[-1] + 1], current_chat)]
+                    current_chat = sends[-1][1] if sends else current_chat
+            else:
+                sends = [(index, chat_name) for index, task in enumerate(tasks) for chat_name in task.chat_names]
+
+            # 遍历所有聊天对象发送消息，整批只切换一次窗口置顶
+            while True:
+                delay = 0.0
+                with wx.batch():
+                    while True:
+                        now = time.time()
+                        for index, _ in sends:
+                            if errors[index] is None and tasks[index].deadline is not None \
+                                    and tasks[index].deadline <= now:
+                                errors[index] = TaskExpiredError("发送前已超过截止时间")
+                        sends = [send for send in sends if errors[send[0]] is None]
+                        if not sends:
+                            break
+                        position, delay = self._next_allowed_send(sends)
+                        if position is None:
+                            break
+                        index, chat_name = sends.pop(position)
+                        start, error = time.perf_counter(), None
+                        self.metrics.started()
+                        try:
+                            wx.send_prepared(name=chat_name, broadcast=tasks[index].broadcast)
+                        except Exception as e:
+                            error = e
+                        elapsed = time.perf_counter() - start
+                        self.metrics.finished(error is None, elapsed)
+                        chats[index][chat_name] = _make_chat_result(chat_name, error, elapsed)
+                if not sends:
+                    break
+                # 所有聊天都被限速：取消置顶后再等待，等到最早允许的聊天后重新检查截止时间
+                self.rate_limiter.wait(delay)
 
-            # 遍历所有聊天对象发送消息
-            for chat_name in chat_names:
-                wx.send_msg(name=chat_name, msgs=messages, file_paths=file_paths if file_paths else None)
+        except Exception as e:
+            # 只影响还有聊天未发送的任务
+            errors = [error or (e if set(task.chat_names) - set(task_chats) else None)
+                      for task, error, task_chats in zip(tasks, errors, chats)]
+
+        results = [_make_result(task.task_id, task.chat_names, error, task_chats)
+                   for task, error, task_chats in zip(tasks, errors, chats)]
+        self._mark_journal([task.journal_id for task, result in zip(tasks, results) if result["success"]], DONE)
+        for task, result in zip(tasks, results):
+            if not result["success"]:
+                self._mark_journal([task.journal_id], FAILED, result.get("reason") or result["message"])
+        return results
+
+    def _mark_journal(self, journal_ids: List[Optional[int]], state: str, error: Optional[str] = None) -> None:
+        """更新任务日志中的状态，日志出错只打印，不影响发送和结果回调"""
+        if not self.journal:
+            return
+        try:
+            self.journal.mark(journal_ids, state, error)
+        except Exception as e:
+            print(f"更新任务日志失败（{state}）: {e}")
 
-            return {"success": True, "message": "消息发送成功"}
 
-        except Exception as e:
-            return {"success": False, "message": f"发送消息失败：{e}"}
+# 全局微信服务，进程内所有 MQTT 连接共用
+_wechat_service: Optional[WeChatService] = None
+_wechat_service_lock = threading.Lock()
 
-        finally:
-            # 清理临时文件
-            for temp_file in temp_files:
-                try:
-                    os.unlink(temp_file)
-                except Exception as e:
-                    print(f"删除临时文件失败 {temp_file}: {e}")
+
+def get_wechat_service() -> WeChatService:
+    """获取全局微信服务，首次调用时创建"""
+    global _wechat_service
+    with _wechat_service_lock:
+        if _wechat_service is None:
+            journal = None
+            if Journal.ENABLED:
+                journal = TaskJournal()
+                journal.purge()
+            rate_limiter = SendRateLimiter() if RateLimit.ENABLED else None
+            _wechat_service = WeChatService(journal=journal, rate_limiter=rate_limiter)
+        return _wechat_service
+
+
+def set_wechat_service(service: WeChatService) -> None:
+    """替换全局微信服务，需在创建 MQTT 连接前调用"""
+    global _wechat_service
+    with _wechat_service_lock:
+        _wechat_service = service
@@ -0,0 +1,90 @@
+"""微信会话，缓存窗口句柄与安装路径，只在窗口真正消失时才重新启动或查找"""
+
+import threading
+from contextlib import contextmanager
+
+import uiautomation as auto
+
+from config import (WeChat, Interval)
+from utils import (get_wechat_exe_path, wake_up_window, is_window_alive, wait_until)
+
+
+class WxSession:
+    """
+    微信会话。
+
+    Attributes:
+    ----------
+    window: auto.WindowControl
+        微信主窗口控件
+    hwnd: int
+        微信主窗口句柄
+    exe_path: str
+        微信可执行文件路径，首次启动时解析并缓存
+    """
+
+    def __init__(self):
+        self.window = None
+        self.window: auto.WindowControl
+        self.hwnd: int = 0
+        self.exe_path: str = ''
+        self._topmost_depth = 0
+        self._lock = threading.RLock()
+
+    def is_alive(self) -> bool:
+        """窗口句柄仍有效且窗口可见"""
+        return is_window_alive(self.hwnd)
+
+    def ensure_window(self) -> auto.WindowControl:
+        """
+        获取微信主窗口。缓存的窗口仍然存活时直接返回，否则先查找已打开的窗口，找不到再启动微信。
+
+        Returns:
+            auto.WindowControl: 微信主窗口
+
+        Raises:
+            Exception: 微信未登录或窗口未能出现
+        """
+        with self._lock:
+            if self.is_alive():
+                return self.window
+
+            self.window = auto.WindowControl(Name=WeChat.WINDOW_NAME, ClassName=WeChat.WINDOW_CLASSNAME)
+            if not self.__window_visible():
+                # 窗口不存在或已隐藏到托盘，启动微信会唤起主窗口
+                if not self.exe_path:
+                    self.exe_path = get_wechat_exe_path(process_name=WeChat.WeChat_PROCESS_NAME)
+                wake_up_window(process_name=WeChat.WeChat_PROCESS_NAME, exe_path=self.exe_path)
+                # 窗口出现后立即继续，而不是固定等待
+                if not wait_until(self.__window_visible, timeout=Interval.WINDOW_TIMEOUT,
+                                  interval=Interval.MAX_SEARCH_INTERVAL, name='window'):
+                    self.hwnd = 0
+                    raise Exception('微信似乎并没有登录!')
+
+            self.hwnd = self.window.NativeWindowHandle
+            # 重新找到窗口后，之前的置顶状态已失效
+            if self._topmost_depth:
+                self.window.SetTopmost(isTopmost=True)
+            return self.window
+
+    def __window_visible(self) -> bool:
+        return self.window.Exists(0, 0) and is_window_alive(self.window.NativeWindowHandle)
+
+    @contextmanager
+    def topmost(self):
+        """
+        在上下文内保持微信窗口置顶。可以嵌套，只有最外层进入和退出时才切换置顶状态，
+        因此一批消息只需切换一次。
+        """
+        with self._lock:
+            window = self.ensure_window()
+            self._topmost_depth += 1
+            if self._topmost_depth == 1:
+                window.SetTopmost(isTopmost=True)
+        try:
+            yield window
+        finally:
+            with self._lock:
+                self._topmost_depth -= 1
+                if self._topmost_depth == 0 and self.is_alive():
+                    self.window.SetTopmost(isTopmost=False)
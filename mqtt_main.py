@@ -3,7 +3,6 @@
 MQTT服务主入口文件
 用于打包成独立的可执行文件
 """
-import json
 import time
 
 try:
@@ -14,7 +13,9 @@ except ImportError:
         "subscribe_topic": "wx/test/message"}]
     HEALTH_CHECK_INTERVAL = 30
 
+from config import Mqtt
 from service.mqtt_service import WxMqtt
+from utils import (get_attachment_cache, get_dedup_cache)
 
 
 def main():
@@ -24,7 +25,9 @@ def main():
     mqtt_clients = []
     for i, config in enumerate(MQTT_CONFIGS):
         mqtt_client = WxMqtt(config["server"], config["port"], config["username"], config["password"],
-            config["subscribe_topic"])
+            config["subscribe_topic"], config.get("result_topic"), config.get("client_id"),
+            config.get("subscribe_qos", Mqtt.SUBSCRIBE_QOS), config.get("result_qos", Mqtt.RESULT_QOS),
+            config.get("share_group", Mqtt.SHARE_GROUP), config.get("node_id"))
         mqtt_client.start()
         mqtt_clients.append(mqtt_client)
         print(f"MQTT客户端 {i + 1} 已启动: {config['server']}:{config['port']}")
@@ -35,17 +38,23 @@ def main():
     try:
         # 保持主线程运行
         while True:
-            # 向所有客户端发布健康检查消息
-            for i, (mqtt_client, config) in enumerate(zip(mqtt_clients, MQTT_CONFIGS)):
-                message = {f"{config['server']} healthStatus": "OK"}
-                mqtt_client.publish(config["subscribe_topic"], json.dumps(message))
-                print(f"已向客户端 {i + 1} 发送健康检查: {config['server']}")
+            # 各客户端向各自的状态主题发布节点状态，不再发到任务主题
+            for i, mqtt_client in enumerate(mqtt_clients):
+                if not mqtt_client.is_connected():
+                    print(f"客户端 {i + 1} 未连接，跳过状态发布: {mqtt_client.server}")
+                    continue
+                status = mqtt_client.publish_status()
+                print(f"客户端 {i + 1} 已发布状态: {status['status']}  排队 {status['queued']}  "
+                      f"每分钟 {status['sendsPerMinute']} 次  p95 {status['latencyP95Ms']}ms")
 
             time.sleep(HEALTH_CHECK_INTERVAL)
     except KeyboardInterrupt:
         print("\n正在停止MQTT服务...")
         for i, mqtt_client in enumerate(mqtt_clients):
             print(f"正在停止客户端 {i + 1}...")
+            mqtt_client.stop()
+        get_dedup_cache().flush()
+        get_attachment_cache().flush()
         print("MQTT服务已停止")
 
 
@@ -24,7 +24,16 @@ a = Analysis(
         'paho.mqtt.client',
         'core.wx_operation_service',
         'core.wx_operation',
+        'core.wx_session',
+        'core.wx_broadcast',
+        'core.task_queue',
+        'core.rate_limit',
+        'core.send_metrics',
         'service.mqtt_service',
+        'service.result_publisher',
+        'service.ingest',
+        'service.reconnect',
+        'service.batch',
         'utils.config_utils',
         'utils.window_utils',
         'utils.process_utils',
@@ -32,6 +41,16 @@ a = Analysis(
         'utils.file_io_utils',
         'utils.hash_utils',
         'utils.image_clicker',
+        'utils.template_utils',
+        'utils.match_utils',
+        'utils.capture_utils',
+        'utils.wait_utils',
+        'utils.text_utils',
+        'utils.cache_utils',
+        'utils.download_utils',
+        'utils.journal_utils',
+        'utils.dedup_utils',
+        'utils.json_utils',
         'utils',
         'config',
         'config.config',
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+批量发送请求：一条 MQTT 消息携带多个任务，格式为按行分隔的 JSON，第一行为批次头，之后每行一个任务，
+整条消息可以用 zlib 或 gzip 压缩。任务逐块解压、逐行解码并展开模板变量，大批次不会一次性占用大量内存
+
+    {"method": "sendWechatBatch", "version": 1, "batchId": "b1", "defaults": {"messages": ["${name}，您好"]}}
+    {"chatNames": ["张三"], "vars": {"name": "张三"}}
+    {"chatNames": ["李四"], "vars": {"name": "李四"}, "imageUrls": ["http://example.com/a.jpg"]}
+"""
+
+import json
+import zlib
+from string import Template
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from config import Batch
+from utils.json_utils import JsonDecoder, get_json_decoder
+
+BATCH_METHOD = 'sendWechatBatch'
+BATCH_VERSION = 1
+
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_GZIP = 'gzip'
+_WBITS = {COMPRESSION_ZLIB: zlib.MAX_WBITS, COMPRESSION_GZIP: 16 + zlib.MAX_WBITS}
+
+# 批次头 defaults 和任务行中可以指定的字段，任务行中的值优先
+_TASK_FIELDS = ("messages", "imageUrls", "priority", "ttl", "deadline", "node")
+# 展开模板变量的字段
+_TEMPLATE_FIELDS = ("messages", "imageUrls")
+
+
+class BatchTask(NamedTuple):
+    """批次中的一个任务"""
+    index: int  # 任务在批次中的序号，从 1 开始
+    task_id: Optional[str]  # 任务编号：任务行中的 taskId，未指定时为 {batchId}-{序号}，批次也没有 batchId 时为 None
+    content: Optional[dict]  # 展开后的 sendWechatMessage 请求，格式不正确时为 None
+    error: Optional[str]  # 任务行格式不正确的原因
+
+
+def detect_compression(payload: bytes) -> Optional[str]:
+    """根据消息开头判断压缩格式，JSON 文本不会以这两种头部开始"""
+    if payload[:2] == b'\x1f\x8b':
+        return COMPRESSION_GZIP
+    if len(payload) >= 2 and payload[0] == 0x78 and (payload[0] << 8 | payload[1]) % 31 == 0:
+        return COMPRESSION_ZLIB
+    return None
+
+
+def encode_batch(tasks: List[dict], defaults: Optional[dict] = None, batch_id: Optional[str] = None,
+                 compression: Optional[str] = None) -> bytes:
+    """
+    生成批量发送请求，供生产者和测试使用
+
+    Args:
+        tasks: 任务行，每个至少包含 chatNames
+        defaults: 各任务共用的字段和模板变量
+        batch_id: 批次编号
+        compression: None、zlib 或 gzip
+
+    Returns:
+        bytes: MQTT 消息内容
+    """
+    header = {"method": BATCH_METHOD, "version": BATCH_VERSION}
+    if batch_id is not None:
+        header["batchId"] = batch_id
+    if defaults:
+        header["defaults"] = defaults
+    lines = [json.dumps(line, ensure_ascii=False, separators=(',', ':')) for line in [header] + tasks]
+    data = '\n'.join(lines).encode('utf-8')
+    if compression is None:
+        return data
+    compressor = zlib.compressobj(wbits=_WBITS[compression])
+    return compressor.compress(data) + compressor.flush()
+
+
+def decode_payload(payload: bytes, decoder: Optional[JsonDecoder] = None) -> Any:
+    """
+    解码 MQTT 消息：单个请求返回解码后的内容；批量请求返回 BatchReader，任务在遍历时才解压和解码
+
+    Raises:
+        ValueError: 不是有效的 JSON，或批次头格式不正确
+    """
+    decoder = decoder or get_json_decoder()
+    if detect_compression(payload):
+        return BatchReader(payload, decoder)
+    # 先只解码第一行，是批次头时不再整体解码；格式化成多行的单个请求第一行不是完整的 JSON
+    newline = payload.find(b'\n')
+    if newline >= 0 and BATCH_METHOD.encode() in payload[:newline]:
+        try:
+            header = decoder(payload[:newline])
+        except ValueError:
+            header = None
+        if isinstance(header, dict) and header.get("method") == BATCH_METHOD:
+            return BatchReader(payload, decoder)
+    content = decoder(payload)
+    if isinstance(content, dict) and content.get("method") == BATCH_METHOD:
+        return BatchReader(payload, decoder)  # 只有批次头、没有任务行
+    return content
+
+
+class BatchReader:
+    """
+    批量请求的逐行读取器，创建时只解码批次头，遍历时逐个产生 BatchTask。
+    单个任务行格式不正确只影响该任务；解压失败或超出大小限制时遍历抛出 ValueError，剩余任务不再处理
+
+    Attributes:
+    ----------
+    batch_id: Optional[str]
+        批次编号
+    compression: Optional[str]
+        压缩格式，未压缩时为 None
+    defaults: dict
+        各任务共用的字段和模板变量
+    """
+
+    def __init__(self, payload: bytes, decoder: Optional[JsonDecoder] = None, max_bytes: int = Batch.MAX_BYTES,
+                 max_line_bytes: int = Batch.MAX_LINE_BYTES, chunk_size: int = Batch.CHUNK_SIZE):
+        self.decoder = decoder or get_json_decoder()
+        self.compression = detect_compression(payload)
+        self.max_bytes = max_bytes
+        self.max_line_bytes = max_line_bytes
+        self.chunk_size = chunk_size
+        self._lines = self._iter_lines(payload)
+        header = self.decoder(next(self._lines, b'{}'))
+        if not isinstance(header, dict) or header.get("method") != BATCH_METHOD:
+            raise ValueError("第一行不是批次头")
+        if header.get("version") != BATCH_VERSION:
+            raise ValueError(f"不支持的批量请求版本: {header.get('version')}")
+        batch_id = header.get("batchId")
+        self.batch_id = str(batch_id) if batch_id is not None else None
+        self.defaults = header.get("defaults") or {}
+        if not isinstance(self.defaults, dict) or not isinstance(self.defaults.get("vars", {}), dict):
+            raise ValueError("defaults 和 defaults.vars 必须是对象")
+        # 各任务共用的模板只解析一次
+        self._templates: Dict[str, Template] = {
+            text: Template(text) for field in _TEMPLATE_FIELDS
+            for text in (self.defaults.get(field) if isinstance(self.defaults.get(field), list) else [])
+            if isinstance(text, str)}
+
+    def __iter__(self) -> Iterator[BatchTask]:
+        index = 0
+        for line in self._lines:
+            if not line.strip():
+                continue
+            index += 1
+            task_id = f"{self.batch_id}-{index}" if self.batch_id is not None else None
+            try:
+                task = self.decoder(line)
+                if not isinstance(task, dict):
+                    raise ValueError("任务行必须是对象")
+                if task.get("taskId") is not None:
+                    task_id = str(task["taskId"])
+                yield BatchTask(index, task_id, self._expand(task, task_id), None)
+            except ValueError as e:
+                yield BatchTask(index, task_id, None, str(e))
+
+    def _expand(self, task: dict, task_id: Optional[str]) -> dict:
+        """合并 defaults 并展开模板变量，得到单个 sendWechatMessage 请求"""
+        content = {"method": "sendWechatMessage", "chatNames": task.get("chatNames", [])}
+        for field in _TASK_FIELDS:
+            value = task.get(field, self.defaults.get(field))
+            if value is not None:
+                content[field] = value
+        if task_id is not None:
+            content["taskId"] = task_id
+
+        task_vars = task.get("vars", {})
+        if not isinstance(task_vars, dict):
+            raise ValueError("vars 必须是对象")
+        # 任务和 defaults 都没有变量时不展开，文本中的 $ 原样发送
+        variables = {**self.defaults.get("vars", {}), **task_vars}
+        if variables:
+            variables = {key: str(value) for key, value in variables.items()}
+            for field in _TEMPLATE_FIELDS:
+                values = content.get(field)
+                if isinstance(values, list):
+                    content[field] = [self._substitute(value, variables) for value in values]
+        return content
+
+    def _substitute(self, text: Any, variables: dict) -> Any:
+        """
+        展开文本中的变量。${变量} 未定义时任务无效；其余不构成变量的 $（如“价格 $5”）和未定义的 $变量 原样保留
+        """
+        if not isinstance(text, str):
+            return text  # 类型错误留给请求校验报告
+        template = self._templates.get(text) or Template(text)
+        for match in template.pattern.finditer(text):
+            name = match.group('braced')
+            if name is not None and name not in variables:
+                raise ValueError(f"缺少模板变量 '{name}'")
+        return template.safe_substitute(variables)
+
+    def _iter_lines(self, payload: bytes) -> Iterator[bytes]:
+        """逐行产生任务数据，压缩的消息每次只解压 chunk_size 字节"""
+        if self.compression is None:
+            if len(payload) > self.max_bytes:
+                raise ValueError(f"批量请求超过 {self.max_bytes} 字节")
+            start = 0
+            while start < len(payload):
+                end = payload.find(b'\n', start)
+                end = len(payload) if end < 0 else end
+                if end - start > self.max_line_bytes:
+                    raise ValueError(f"任务行超过 {self.max_line_bytes} 字节")
+                yield payload[start:end]
+                start = end + 1
+            return
+
+        decompressor = zlib.decompressobj(wbits=_WBITS[self.compression])
+        data, buffer, total = payload, b'', 0
+        while not decompressor.eof:
+            try:
+                chunk = decompressor.decompress(data, self.chunk_size)
+            except zlib.error as e:
+                raise ValueError(f"解压失败: {e}")
+            data = decompressor.unconsumed_tail
+            if not chunk and not data:
+                break
+            total += len(chunk)
+            if total > self.max_bytes:
+                raise ValueError(f"批量请求解压后超过 {self.max_bytes} 字节")
+            lines = (buffer + chunk).split(b'\n')
+            buffer = lines.pop()
+            if len(buffer) > self.max_line_bytes:
+                raise ValueError(f"任务行超过 {self.max_line_bytes} 字节")
+            yield from lines
+        if not decompressor.eof:
+            raise ValueError("压缩数据不完整")
+        if buffer:
+            yield buffer
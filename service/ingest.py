@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT 消息接收阶段：paho 网络线程只把原始字节放入有界队列，解码、校验、打印日志和提交任务都在单独的工作线程中进行，
+大消息或缓慢的控制台输出不会拖慢心跳和后续消息的接收。
+
+需要确认的消息（QoS 1）在处理完毕、任务已加入发送队列后才确认，进程在此之前退出时服务器会在重连后重发
+"""
+
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Optional
+
+from config import Mqtt
+from utils.json_utils import JsonDecoder, get_json_decoder
+
+
+def abbreviate(value: Any, limit: int = Mqtt.LOG_PAYLOAD_CHARS) -> str:
+    """日志中使用的截断文本"""
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else f"{text[:limit]}...（共 {len(text)} 字符）"
+
+
+class MessageInbox:
+    """
+    收到的消息的有界缓冲区和处理线程。放入时从不等待，以免阻塞网络线程：队列已满时，不需要确认的消息被丢弃；
+    需要确认的消息不确认，由服务器在重连后重发。服务器同时推送的未确认消息数（Receive Maximum）小于队列容量时不会发生
+
+    Attributes:
+    ----------
+    handler: Callable[[str, Any], None]
+        处理解码后的消息，参数为 (主题, 内容)，在工作线程中调用
+    maxsize: int
+        最多缓存的消息数
+    decoder: JsonDecoder
+        JSON 解码器，默认使用全局解码器
+    """
+
+    def __init__(self, handler: Callable[[str, Any], None], maxsize: int = Mqtt.INBOX_SIZE,
+                 decoder: Optional[JsonDecoder] = None, name: str = 'mqtt-inbox'):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.decoder = decoder or get_json_decoder()
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stats = {"received": 0, "dropped": 0, "unacked": 0, "processed": 0, "invalid": 0, "errors": 0,
+                       "acked": 0}
+        self._reported_drops = 0
+        self._reported_unacked = 0
+        self._thread = threading.Thread(target=self._work, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, topic: str, payload: bytes, ack: Optional[Callable[[], None]] = None) -> bool:
+        """
+        放入一条原始消息，可在网络线程中调用，不解码、不打印
+
+        Args:
+            topic: 主题
+            payload: 原始内容
+            ack: 处理完毕后调用的确认函数，队列已满时不调用，消息由服务器重发
+
+        Returns:
+            bool: 队列已满、消息未放入时返回 False
+        """
+        try:
+            self._queue.put_nowait((topic, payload, ack))
+            accepted = True
+        except queue.Full:
+            accepted = False
+        with self._lock:
+            self._stats["received"] += 1
+            if not accepted:
+                self._stats["dropped" if ack is None else "unacked"] += 1
+        return accepted
+
+    def get_stats(self) -> dict:
+        """收到、因队列已满丢弃、因队列已满未确认（等待重发）、处理完毕、无法解码、处理出错、已确认的消息数，以及当前排队数"""
+        with self._lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+    def join(self) -> None:
+        """等待已放入的消息处理完毕"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """处理完已放入的消息后停止工作线程"""
+        self._queue.put((None, None, None))
+        self._thread.join()
+
+    def _work(self) -> None:
+        while True:
+            topic, payload, ack = self._queue.get()
+            try:
+                if topic is None:
+                    return
+                self._report_drops()
+                try:
+                    content = self.decoder(payload)
+                except ValueError as e:
+                    self._count("invalid")
+                    print(f"mqtt消息不是有效的JSON，topic：{topic}  错误：{e}  message: {abbreviate(payload)}")
+                    continue
+                try:
+                    self.handler(topic, content)
+                    self._count("processed")
+                except Exception as e:
+                    self._count("errors")
+                    print(f"异常-mqtt处理失败: {e}")
+                    traceback.print_exc()
+            finally:
+                # 无法解码或处理出错的消息也确认，服务器重发同样会失败
+                if ack is not None:
+                    self._ack(ack)
+                self._queue.task_done()
+
+    def _ack(self, ack: Callable[[], None]) -> None:
+        try:
+            ack()
+            self._count("acked")
+        except Exception as e:
+            print(f"确认mqtt消息失败: {e}")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _report_drops(self) -> None:
+        """在工作线程中报告网络线程丢弃和未确认的消息数"""
+        with self._lock:
+            dropped = self._stats["dropped"] - self._reported_drops
+            unacked = self._stats["unacked"] - self._reported_unacked
+            self._reported_drops = self._stats["dropped"]
+            self._reported_unacked = self._stats["unacked"]
+        if dropped:
+            print(f"mqtt接收队列已满，丢弃了 {dropped} 条消息")
+        if unacked:
+            print(f"mqtt接收队列已满，{unacked} 条消息未确认，将由服务器在重连后重发")
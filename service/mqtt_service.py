@@ -1,106 +1,317 @@
 import json
+import socket
 import threading
 import time
 import traceback
+from typing import Tuple
 
-import paho.mqtt.client as paho_mqtt
+from config import (Batch, Dedup, Mqtt, WeChat)
+from core.wx_operation_service import get_wechat_service
+from service.batch import (BatchReader, decode_payload)
+from service.ingest import (MessageInbox, abbreviate)
+from service.reconnect import (ReconnectBackoff, ReconnectStats, create_client, schedule_reconnect, start_client)
+from service.result_publisher import ResultPublisher
+from utils import (get_dedup_cache, get_json_sha256)
 
-# 添加WeChatService导入
-from core.wx_operation_service import WeChatService
+
+def _dedup_key(content: dict) -> Tuple[str, float]:
+    """
+    消息的去重键及其有效期：有 taskId 时按 taskId，否则按聊天对象和消息内容的哈希
+
+    Returns:
+        Tuple[str, float]: (去重键, 有效期秒数)
+    """
+    task_id = content.get("taskId")
+    if task_id is not None:
+        return f"id:{task_id}", Dedup.ID_WINDOW
+    body = [content.get("chatNames", []), content.get("messages", []), content.get("imageUrls", [])]
+    return f"sha256:{get_json_sha256(body)}", Dedup.CONTENT_WINDOW
+
+
+def _validate_send_request(content: dict) -> None:
+    """
+    校验 sendWechatMessage 消息的字段类型
+
+    Raises:
+        ValueError: 字段缺失或类型不正确
+    """
+    for field in ("chatNames", "messages", "imageUrls"):
+        value = content.get(field, [])
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{field} 必须是字符串列表")
+    if not content.get("chatNames"):
+        raise ValueError("chatNames 不能为空")
+    for field in ("priority", "ttl", "deadline"):
+        value = content.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise ValueError(f"{field} 必须是数字")
+    node = content.get("node")
+    if node is not None and (not isinstance(node, str) or not node or '/' in node or '+' in node or '#' in node):
+        raise ValueError("node 必须是不含 /、+、# 的非空字符串")
 
 
 class WxMqtt:
     def __init__(self, mqtt_server, mqtt_port=1883, mqtt_username=None, mqtt_password=None,
-                 subscribe_topic="wx/test/message"):
+                 subscribe_topic="wx/test/message", result_topic=None, client_id=None,
+                 subscribe_qos=Mqtt.SUBSCRIBE_QOS, result_qos=Mqtt.RESULT_QOS, share_group=Mqtt.SHARE_GROUP,
+                 node_id=None):
         self.client = None
-        self.send_message_thread = None
-        self.thread = None
-        self.is_connected = False
+        self.connected = False
         self.server = mqtt_server
         self.port = mqtt_port
         self.username = mqtt_username
         self.password = mqtt_password
         self.subscribe_topic = subscribe_topic
-        # 初始化WeChatService实例
-        self.wechat_service = WeChatService()
+        self.subscribe_qos = subscribe_qos
+        # 发送结果发布到的主题，默认在订阅主题后加上 /result
+        self.result_topic = result_topic or subscribe_topic + Mqtt.RESULT_TOPIC_SUFFIX
+        self.result_qos = result_qos
+        # 多个节点以同一共享订阅组订阅时，每条任务只投递给其中一个节点；节点名默认为主机名
+        self.share_group = share_group
+        self.node_id = node_id or socket.gethostname()
+        self.node_topic = self.get_node_topic(self.node_id)
+        self.load_topic = subscribe_topic + Mqtt.LOAD_TOPIC_SUFFIX + self.node_id
+        # 节点状态（保留消息），异常断线时由服务器发布遗嘱 offline
+        self.status_topic = subscribe_topic + Mqtt.STATUS_TOPIC_SUFFIX + self.node_id
+        self.results = ResultPublisher(self.publish_results, node=self.node_id)
+        # 所有连接共用同一个微信服务，由其唯一的界面线程按来源轮流发送
+        self.wechat_service = get_wechat_service()
+        # 所有连接共用同一份去重记录，多个连接订阅同一主题时同一条消息只发送一次
+        self.dedup_cache = get_dedup_cache()
+        self.source = f"{mqtt_server}:{mqtt_port}/{subscribe_topic}"
+        # 持久会话按 client_id 识别，默认由主机名和连接配置生成，重启后保持不变
+        self.client_id = client_id or f"{WeChat.APP_NAME}-{socket.gethostname()}-{get_json_sha256(self.source)[:8]}"
+        self.backoff = ReconnectBackoff()
+        self.reconnect_stats = ReconnectStats()
+        self._stopped = threading.Event()
+        self._load_thread = threading.Thread(target=self._report_load, name='mqtt-load', daemon=True)
+        # 网络线程只把原始消息放入接收队列，由接收线程解码和处理；批量请求在处理时才逐行解压和解码
+        self.inbox = MessageInbox(self.handle_message, decoder=decode_payload)
+        if Mqtt.PROTOCOL == 5 and Mqtt.RECEIVE_MAXIMUM >= self.inbox.maxsize:
+            # 否则接收队列已满时未确认的消息要等到重连才会重发
+            raise ValueError(f"MqttConfig.RECEIVE_MAXIMUM（{Mqtt.RECEIVE_MAXIMUM}）应小于 INBOX_SIZE（{self.inbox.maxsize}）")
 
     def start(self) -> None:
-        self.client = paho_mqtt.Client(paho_mqtt.CallbackAPIVersion.VERSION2)  # type: ignore
+        """在 paho 的网络线程中连接，断线后自动重连，立即返回"""
+        # 收到的 QoS 1 消息在任务加入发送队列后才确认
+        self.client = create_client(self.client_id, manual_ack=True)
         self.client.on_connect = self.on_connect
+        self.client.on_connect_fail = self.on_connect_fail
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
         self.client.username_pw_set(self.username, self.password)
-        self.thread = threading.Thread(target=self.connect, daemon=True)
-        self.thread.start()
+        self.client.will_set(self.status_topic, payload=json.dumps(self._status_message("offline")), qos=1,
+                             retain=True)
+        # 上次运行未完成、从任务日志恢复的本连接任务，结果也发布到结果主题
+        self.wechat_service.set_result_handler(self.source, self.results.add)
+        start_client(self.client, self.server, self.port, self.backoff)
+        self._load_thread.start()
 
-    def connect(self) -> None:
-        # 循环尝试连接，直到连接成功
-        while not self.is_connected:
-            try:
-                self.client.connect(self.server, self.port)
-                self.client.loop_forever()
-                print("mqtt loop_forever.......")
-            except Exception as e:
-                print(f"mqtt连接失败: {e}, 等待2秒后重试连接...")
-                traceback.print_exc()
-            time.sleep(2)
+    def stop(self) -> None:
+        """发布剩余的结果并清除本节点的负载报告后断开连接"""
+        self._stopped.set()
+        self.inbox.close()
+        self.results.close()
+        if self.client:
+            if self.connected:
+                self.client.publish(self.load_topic, payload=None, qos=0, retain=True)
+                # 正常断开时服务器不发布遗嘱，主动发布 offline
+                info = self.client.publish(self.status_topic, payload=json.dumps(self._status_message("offline")),
+                                           qos=1, retain=True)
+                # 等待服务器确认后再断开，否则 offline 可能随断开一起丢失
+                try:
+                    info.wait_for_publish(timeout=Mqtt.STOP_TIMEOUT)
+                except (RuntimeError, ValueError):
+                    pass
+            self.client.disconnect()
+            self.client.loop_stop()
 
     def on_disconnect(self, client, userdata, disconnect_flags, reason, properties):
-        self.is_connected = False
-        print("mqtt连接断开...")
+        self.connected = False
+        if self._stopped.is_set():
+            return
+        self.reconnect_stats.disconnected()
+        delay = schedule_reconnect(client, self.backoff)
+        print(f"mqtt连接断开（{reason}），{delay:.1f}秒后重连...")
+
+    def on_connect_fail(self, client, userdata):
+        self.reconnect_stats.disconnected()
+        delay = schedule_reconnect(client, self.backoff)
+        print(f"mqtt连接失败，{delay:.1f}秒后重连...")
 
     def is_connected(self):
-        return self.is_connected
+        return self.connected
 
     # 连接的回调函数
     def on_connect(self, client, userdata, flags, reason_code, properties):
         if reason_code == 0:
-            print("mqtt服务端连接成功")
-            self.is_connected = True  # 更新连接状态为成功
-            self.subscribe()  # 成功连接后订阅主题
+            elapsed = self.reconnect_stats.connected()
+            self.backoff.reset()
+            self.connected = True  # 更新连接状态为成功
+            print("mqtt服务端连接成功" + (f"，重连耗时 {elapsed:.1f} 秒" if elapsed is not None else "")
+                  + ("，已恢复会话" if flags.session_present else ""))
+            self.subscribe()  # 成功连接后订阅主题，会话已恢复时服务器会忽略重复订阅
+            self.publish_load()
+            self.publish_status()
         else:
             print(f"mqtt连接失败，返回码：{reason_code}")
-            self.is_connected = False  # 更新连接状态为失败
+            self.connected = False  # 更新连接状态为失败
 
-    # 收到消息的回调函数
+    # 收到消息的回调函数，在 paho 网络线程中执行，只做入队
     def on_message(self, client, userdata, msg):
-        try:
-            content = json.loads(msg.payload.decode('utf-8'))
-            if content is None:
-                print("-------------------------------------++++++++++++++++++mqtt消息格式不正确")
-            method = content.get("method", None)
-            print(f"接收mqtt消息，topic：{msg.topic}  method: {method}  message: {content}")
+        ack = (lambda: client.ack(msg.mid, msg.qos)) if msg.qos > 0 else None
+        self.inbox.submit(msg.topic, msg.payload, ack)
 
-            # 处理控制微信的消息
-            if method == "sendWechatMessage":
-                self.handle_wechat_message(content)
+    def handle_message(self, topic, content):
+        """处理解码后的消息，在接收线程中执行"""
+        if isinstance(content, BatchReader):
+            self.handle_wechat_batch(topic, content)
+            return
+        if not isinstance(content, dict):
+            print(f"mqtt消息格式不正确，topic：{topic}  message: {abbreviate(content)}")
+            return
+        method = content.get("method", None)
+        print(f"接收mqtt消息，topic：{topic}  method: {method}  message: {abbreviate(content)}")
 
-        except Exception as e:
-            print(f"异常-mqtt处理失败: {e}")
-            traceback.print_exc()
+        # 处理控制微信的消息
+        if method == "sendWechatMessage":
+            self.handle_wechat_message(content)
+
+    def handle_wechat_batch(self, topic, batch: BatchReader):
+        """
+        处理批量发送请求：逐个任务校验、去重并加入发送队列。队列已满时等待腾出位置，
+        整个批次最多等待 Batch.ENQUEUE_TIMEOUT 秒，之后剩余任务的结果为 queue_full
+        """
+        print(f"接收批量发送请求，topic：{topic}  batchId: {batch.batch_id}  压缩: {batch.compression or '无'}")
+        deadline = time.monotonic() + Batch.ENQUEUE_TIMEOUT
+        count = 0
+        try:
+            for task in batch:
+                count += 1
+                if task.error is not None:
+                    print(f"批量请求中的第 {task.index} 个任务格式不正确: {task.error}")
+                    self.results.add({"taskId": task.task_id, "success": False,
+                                      "message": f"请求格式不正确：{task.error}", "reason": "invalid"})
+                    continue
+                self.handle_wechat_message(task.content, timeout=max(0.0, deadline - time.monotonic()))
+        except ValueError as e:
+            print(f"批量发送请求在第 {count} 个任务后中断: {e}")
+            self.results.add({"taskId": None, "batchId": batch.batch_id, "success": False,
+                              "message": f"批量请求格式不正确，第 {count} 个任务之后的任务未处理：{e}",
+                              "reason": "invalid"})
+        print(f"批量发送请求处理完毕，batchId: {batch.batch_id}  任务数: {count}")
 
-    def handle_wechat_message(self, content):
+    def handle_wechat_message(self, content, timeout=0.0):
         """
-        处理微信消息发送请求
+        处理微信消息发送请求，timeout 为发送队列已满时最多等待的秒数
         """
+        dedup_key = None
         try:
+            try:
+                _validate_send_request(content)
+            except ValueError as e:
+                print(f"微信消息发送请求格式不正确: {e}")
+                self.results.add({"taskId": content.get("taskId"), "success": False,
+                                  "message": f"请求格式不正确：{e}", "reason": "invalid"})
+                return
+
+            # 指定了其他节点的任务转发给该节点，由能联系到接收方的微信账号发送
+            node = content.get("node")
+            if node is not None and node != self.node_id:
+                self.forward(node, content)
+                return
+
+            # 丢弃重复投递或生产者重试的消息；入队成功后才记录
+            dedup_key, dedup_window = _dedup_key(content)
+            if self.dedup_cache.check(dedup_key):
+                print(f"丢弃重复的微信消息发送请求: {dedup_key}")
+                return
+
             # 解析消息内容
             chat_names = content.get("chatNames", [])
             messages = content.get("messages", [])
             image_urls = content.get("imageUrls", [])
+            priority = int(content.get("priority", 0))
+            ttl = content.get("ttl")
+            deadline = content.get("deadline")
+            task_id = content.get("taskId")
 
             # 异步发送消息
             result = self.wechat_service.send_message_to_chats(chat_names=chat_names, messages=messages,
-                                                               image_urls=image_urls)
-            print(f"已提交微信消息发送任务: {content}")
-            print(f"任务结果: {result}")
+                                                               image_urls=image_urls, callback=self.results.add,
+                                                               source=self.source, priority=priority,
+                                                               ttl=float(ttl) if ttl is not None else None,
+                                                               deadline=float(deadline) if deadline is not None
+                                                               else None,
+                                                               task_id=str(task_id) if task_id is not None else None,
+                                                               timeout=timeout)
+            print(f"已提交微信消息发送任务: {abbreviate(content)}")
+            print(f"任务结果: {abbreviate(result)}")
+            # 未加入队列的任务不会再有回调，直接发布结果，并允许生产者重试
+            if result["success"]:
+                self.dedup_cache.record(dedup_key, dedup_window)
+            else:
+                self.dedup_cache.discard(dedup_key)
+                self.results.add(result)
+            dedup_key = None
         except Exception as e:
             print(f"处理微信消息失败: {e}")
             traceback.print_exc()
+            if dedup_key is not None:
+                self.dedup_cache.discard(dedup_key)
 
-    def publish(self, topic, message):
-        self.client.publish(topic, payload=message, qos=0, retain=False)
+    def publish(self, topic, message, qos=0):
+        self.client.publish(topic, payload=message, qos=qos, retain=False)
         print("发送mqtt消息, topic: " + topic + "  message: " + message)
 
+    def publish_results(self, message):
+        """发布一批发送结果，断线期间发布的结果由 paho 在重连后补发"""
+        self.client.publish(self.result_topic, payload=message, qos=self.result_qos, retain=False)
+        print(f"发布发送结果, topic: {self.result_topic}  message: {message}")
+
     def subscribe(self):
-        self.client.subscribe(self.subscribe_topic)
+        # 任务主题在共享订阅组内分摊，节点主题只有本节点订阅
+        topic = f"$share/{self.share_group}/{self.subscribe_topic}" if self.share_group else self.subscribe_topic
+        self.client.subscribe([(topic, self.subscribe_qos), (self.node_topic, self.subscribe_qos)])
+
+    def get_node_topic(self, node_id):
+        """发给指定节点的任务主题"""
+        return self.subscribe_topic + Mqtt.NODE_TOPIC_SUFFIX + node_id
+
+    def forward(self, node_id, content):
+        """把任务转发到指定节点的主题，结果由该节点发布"""
+        topic = self.get_node_topic(node_id)
+        self.client.publish(topic, payload=json.dumps(content, ensure_ascii=False), qos=self.subscribe_qos)
+        print(f"任务指定由节点 {node_id} 发送，已转发到 {topic}: {abbreviate(content)}")
+
+    def publish_load(self):
+        """发布本节点的队列深度（保留消息），生产者订阅 {订阅主题}/load/+ 即可选择较空闲的节点"""
+        load = dict(self.wechat_service.get_load(), method="wechatNodeLoad", node=self.node_id,
+                    timestamp=round(time.time(), 3))
+        self.client.publish(self.load_topic, payload=json.dumps(load), qos=0, retain=True)
+
+    def publish_status(self):
+        """
+        发布本节点的状态（保留消息）：队列深度、发送速率、最近一次成功的时间、发送耗时分位数、处理线程是否存活，
+        以及本连接的接收和重连统计。处理线程异常时 status 为 degraded
+
+        Returns:
+            dict: 发布的状态
+        """
+        service = self.wechat_service.get_status()
+        status = self._status_message("online" if service.pop("healthy") else "degraded")
+        status.update(service, timestamp=round(time.time(), 3), inbox=self.inbox.get_stats(),
+                      reconnects=self.reconnect_stats.summary())
+        self.client.publish(self.status_topic, payload=json.dumps(status), qos=1, retain=True)
+        return status
+
+    def _status_message(self, status):
+        return {"method": "wechatNodeStatus", "node": self.node_id, "status": status}
+
+    def _report_load(self):
+        while not self._stopped.wait(Mqtt.LOAD_INTERVAL):
+            if self.connected:
+                try:
+                    self.publish_load()
+                except Exception as e:
+                    print(f"发布节点负载失败: {e}")
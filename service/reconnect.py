@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT 连接管理：持久会话、带随机抖动的指数退避重连，以及重连耗时统计。
+重连由 paho 的网络线程（loop_start）负责，这里只在每次断线或连接失败时设定下一次等待的时长，
+避免服务器恢复后所有客户端在同一时刻重连
+"""
+
+import random
+import threading
+import time
+from typing import Optional
+
+import paho.mqtt.client as paho_mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from config import Mqtt
+
+
+class ReconnectBackoff:
+    """
+    指数退避：第 n 次连续失败后的等待上限为 min_delay * 2^n（不超过 max_delay），启用抖动时在 [min_delay, 上限] 内均匀随机
+
+    Attributes:
+    ----------
+    min_delay: float
+        初始等待（秒）
+    max_delay: float
+        等待上限（秒）
+    jitter: bool
+        是否加入随机抖动，关闭时所有客户端的等待完全相同
+    """
+
+    def __init__(self, min_delay: float = Mqtt.RECONNECT_MIN_DELAY, max_delay: float = Mqtt.RECONNECT_MAX_DELAY,
+                 jitter: bool = True, rng: Optional[random.Random] = None):
+        self.min_delay = min_delay
+        self.max_delay = max(max_delay, min_delay)
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        """下一次重连前的等待（秒），并记一次失败"""
+        ceiling = min(self.max_delay, self.min_delay * 2 ** min(self.attempts, 32))
+        self.attempts += 1
+        return self.rng.uniform(self.min_delay, ceiling) if self.jitter else ceiling
+
+    def reset(self) -> None:
+        """连接成功后调用，下次断线从初始等待开始"""
+        self.attempts = 0
+
+
+class ReconnectStats:
+    """记录从断线到重新连上的耗时"""
+
+    def __init__(self):
+        self._disconnected_at: Optional[float] = None
+        self._durations = []
+        self._lock = threading.Lock()
+
+    def disconnected(self) -> None:
+        with self._lock:
+            if self._disconnected_at is None:
+                self._disconnected_at = time.monotonic()
+
+    def connected(self) -> Optional[float]:
+        """
+        记录连接成功
+
+        Returns:
+            Optional[float]: 本次重连耗时（秒），首次连接时为 None
+        """
+        with self._lock:
+            if self._disconnected_at is None:
+                return None
+            elapsed = time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+            self._durations.append(elapsed)
+            return elapsed
+
+    def summary(self) -> dict:
+        """重连次数，以及最近一次、平均和最长的重连耗时（秒）"""
+        with self._lock:
+            durations = list(self._durations)
+        if not durations:
+            return {"reconnects": 0}
+        return {"reconnects": len(durations), "last_s": round(durations[-1], 3),
+                "mean_s": round(sum(durations) / len(durations), 3), "max_s": round(max(durations), 3)}
+
+
+def create_client(client_id: str, protocol: int = Mqtt.PROTOCOL, manual_ack: bool = False,
+                  max_inflight: int = Mqtt.MAX_INFLIGHT, max_queued: int = Mqtt.MAX_QUEUED) -> paho_mqtt.Client:
+    """
+    创建使用持久会话的客户端，client_id 需要在重启后保持不变，服务器才能找回之前的会话
+
+    Args:
+        client_id: 客户端标识
+        protocol: 5 为 MQTT 5.0，4 为 MQTT 3.1.1
+        manual_ack: 收到的 QoS 1 消息是否由调用方通过 client.ack 确认，而不是 on_message 返回后自动确认
+        max_inflight: 发布时最多同时未被确认的 QoS 1 消息数
+        max_queued: 发布时最多缓存的消息数，0 表示不限制
+    """
+    if protocol == 5:
+        client = paho_mqtt.Client(paho_mqtt.CallbackAPIVersion.VERSION2, client_id=client_id,  # type: ignore
+                                  protocol=paho_mqtt.MQTTv5, manual_ack=manual_ack)
+    else:
+        client = paho_mqtt.Client(paho_mqtt.CallbackAPIVersion.VERSION2, client_id=client_id,  # type: ignore
+                                  clean_session=False, protocol=paho_mqtt.MQTTv311, manual_ack=manual_ack)
+    client.max_inflight_messages_set(max_inflight)
+    client.max_queued_messages_set(max_queued)
+    return client
+
+
+def start_client(client: paho_mqtt.Client, host: str, port: int, backoff: ReconnectBackoff,
+                 keepalive: int = Mqtt.KEEPALIVE, session_expiry: int = Mqtt.SESSION_EXPIRY,
+                 receive_maximum: int = Mqtt.RECEIVE_MAXIMUM) -> None:
+    """
+    在 paho 的网络线程中连接并保持连接，断线后按 backoff 自动重连，不阻塞调用方。
+    MQTT 5.0 下通过 receive_maximum 限制服务器同时推送的未确认 QoS 1 消息数
+
+    调用方需在 on_disconnect 和 on_connect_fail 中调用 schedule_reconnect，在连接成功时调用 backoff.reset()
+    """
+    schedule_reconnect(client, backoff)
+    if client.protocol == paho_mqtt.MQTTv5:
+        properties = Properties(PacketTypes.CONNECT)
+        properties.SessionExpiryInterval = session_expiry
+        properties.ReceiveMaximum = receive_maximum
+        client.connect_async(host, port, keepalive=keepalive, clean_start=False, properties=properties)
+    else:
+        client.connect_async(host, port, keepalive=keepalive)
+    client.loop_start()
+
+
+def schedule_reconnect(client: paho_mqtt.Client, backoff: ReconnectBackoff) -> float:
+    """
+    设定 paho 下一次重连前的等待
+
+    Returns:
+        float: 等待秒数
+    """
+    delay = backoff.next_delay()
+    # 上下限相同，paho 不再自行加倍，等待时长完全由 backoff 决定
+    client.reconnect_delay_set(min_delay=delay, max_delay=delay)
+    return delay
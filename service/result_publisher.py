@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+发送结果的批量发布：结果先进入缓冲区，攒够一批或等待超时后合并为一条 MQTT 消息发布，
+避免群发大量任务时每个结果单独发布一条消息
+"""
+
+import json
+import threading
+import time
+import traceback
+from typing import Callable, List, Optional
+
+from config import Mqtt
+
+RESULT_METHOD = 'wechatMessageResult'
+
+
+class ResultPublisher:
+    """
+    把任务结果攒批后交给 publish 发布，消息格式为 {"method": "wechatMessageResult", "results": [...]}
+
+    Attributes:
+    ----------
+    publish: Callable[[str], None]
+        发布一条消息（已序列化的 JSON）
+    batch_size: int
+        攒够多少条结果立即发布
+    flush_interval: float
+        第一条结果进入缓冲区后最多等待多久（秒）就发布
+    node: Optional[str]
+        节点名，指定时写入消息的 node 字段，多个节点共用结果主题时生产者据此区分
+    """
+
+    def __init__(self, publish: Callable[[str], None], batch_size: int = Mqtt.RESULT_BATCH_SIZE,
+                 flush_interval: float = Mqtt.RESULT_FLUSH_INTERVAL, node: Optional[str] = None):
+        self.publish = publish
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.node = node
+        self._results: List[dict] = []
+        self._first_at = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._publish_loop, name='result-publisher', daemon=True)
+        self._thread.start()
+
+    def add(self, result: dict) -> None:
+        """加入一条任务结果，不等待发布，可在界面线程的回调中调用"""
+        with self._condition:
+            if not self._results:
+                self._first_at = time.monotonic()
+            self._results.append(result)
+            if len(self._results) >= self.batch_size:
+                self._condition.notify()
+
+    def close(self) -> None:
+        """发布缓冲区中剩余的结果后停止"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _due(self) -> bool:
+        if self._closed or len(self._results) >= self.batch_size:
+            return True
+        return bool(self._results) and time.monotonic() - self._first_at >= self.flush_interval
+
+    def _publish_loop(self) -> None:
+        while True:
+            with self._condition:
+                # 缓冲区非空时定期醒来检查是否到期
+                self._condition.wait_for(self._due, timeout=self.flush_interval)
+                batch = []
+                if self._due():
+                    batch, self._results = self._results[:self.batch_size], self._results[self.batch_size:]
+                    self._first_at = time.monotonic()
+                stop = self._closed and not self._results
+
+            if batch:
+                try:
+                    message = {"method": RESULT_METHOD, "results": batch}
+                    if self.node:
+                        message["node"] = self.node
+                    self.publish(json.dumps(message, ensure_ascii=False))
+                except Exception as e:
+                    print(f"发布发送结果失败: {e}")
+                    traceback.print_exc()
+            if stop:
+                return
@@ -0,0 +1,17 @@
+"""
+测试在无界面的环境下运行：Windows 专用的依赖用 MagicMock 代替，界面操作由各测试中的假对象完成
+"""
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WINDOWS_MODULES = ('uiautomation', 'pythoncom', 'win32clipboard', 'win32con', 'win32gui', 'winreg', 'wmi', 'pyautogui')
+
+if sys.platform != 'win32':
+    for name in WINDOWS_MODULES:
+        sys.modules.setdefault(name, mock.MagicMock(name=name))
+    # utils 只在 Windows 上导出窗口和剪切板函数，core 依赖这些名称；导入时按 Windows 处理，函数本身不会被调用
+    with mock.patch.object(sys, 'platform', 'win32'):
+        import utils  # noqa: F401
@@ -0,0 +1,29 @@
+import pytest
+
+from service.batch import COMPRESSION_GZIP, BatchReader, encode_batch
+
+
+def _read(tasks, defaults=None, compression=None):
+    return list(BatchReader(encode_batch(tasks, defaults, batch_id='b1', compression=compression)))
+
+
+@pytest.mark.parametrize('compression', [None, COMPRESSION_GZIP])
+def test_variables_are_expanded_per_task(compression):
+    tasks = _read([{"chatNames": ["A"], "vars": {"name": "张三"}}, {"chatNames": ["B"], "vars": {"name": "李四"}}],
+                  defaults={"messages": ["${name}您好"]}, compression=compression)
+    assert [(task.task_id, task.content["messages"]) for task in tasks] == [('b1-1', ['张三您好']),
+                                                                           ('b1-2', ['李四您好'])]
+
+
+def test_stray_dollar_signs_are_sent_unchanged():
+    [task] = _read([{"chatNames": ["A"], "messages": ["${name}：价格 $5，$$ 与 $USD 照常显示"],
+                     "vars": {"name": "张三"}}])
+    assert task.error is None
+    assert task.content["messages"] == ["张三：价格 $5，$ 与 $USD 照常显示"]
+
+
+def test_undefined_braced_variable_invalidates_only_that_task():
+    tasks = _read([{"chatNames": ["A"], "vars": {"name": "张三"}}, {"chatNames": ["B"], "vars": {"nmae": "李四"}}],
+                  defaults={"messages": ["${name}您好"]})
+    assert tasks[0].error is None
+    assert tasks[1].content is None and 'name' in tasks[1].error
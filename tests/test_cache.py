@@ -0,0 +1,116 @@
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from utils.cache_utils import INDEX_FILE, AttachmentCache
+from utils.download_utils import HttpDownloader
+
+
+class EtagHandler(http.server.BaseHTTPRequestHandler):
+    """路径的第一段决定内容；always304 对任何请求都返回 304"""
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
+        name = self.path.strip('/').split('/')[0]
+        body = b'\x89PNG\r\n\x1a\n' + name.encode().ljust(1000, b'\0')
+        etag = f'"{name}"'
+        if name == 'always304' or self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    EtagHandler.requests = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), EtagHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def downloader():
+    downloader = HttpDownloader(proxies={})
+    yield downloader
+    downloader.close()
+
+
+def test_hit_revalidate_and_dedupe(base_url, downloader, tmp_path):
+    cache = AttachmentCache(str(tmp_path), downloader=downloader, revalidate_after=60)
+    first = cache.fetch(f'{base_url}/banner/a.png')
+    assert first.endswith('.png') and cache.fetch(f'{base_url}/banner/a.png') == first
+    # 相同内容的另一个 URL 只保存一份
+    assert cache.fetch(f'{base_url}/banner/b.png') == first
+    cache.revalidate_after = 0
+    assert cache.fetch(f'{base_url}/banner/a.png') == first
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["deduplicated"], stats["revalidated"]) == (1, 2, 1, 1)
+    assert stats["files"] == 1
+    assert EtagHandler.requests[-1] == ('/banner/a.png', '"banner"')
+
+
+def test_always_304_does_not_recurse(base_url, downloader, tmp_path):
+    cache = AttachmentCache(str(tmp_path), downloader=downloader)
+    assert cache.fetch(f'{base_url}/always304/a.png') is None
+    assert cache.get_stats()["errors"] == 1
+    assert len(EtagHandler.requests) == 1
+
+
+def test_304_after_eviction_retries_once_without_validators(base_url, downloader, tmp_path):
+    cache = AttachmentCache(str(tmp_path), downloader=downloader, revalidate_after=0)
+    path = cache.fetch(f'{base_url}/logo/a.png')
+    cache.release([path])
+    cache.clear()
+    assert cache.fetch(f'{base_url}/logo/a.png') is not None
+    assert [validator for _, validator in EtagHandler.requests] == [None, None]
+
+
+def test_lru_eviction_skips_pinned_files(base_url, downloader, tmp_path):
+    cache = AttachmentCache(str(tmp_path), downloader=downloader, max_bytes=2500)
+    pinned = cache.fetch(f'{base_url}/one/a.png')
+    second = cache.fetch(f'{base_url}/two/a.png')
+    cache.release([second])
+    cache.fetch(f'{base_url}/three/a.png')
+    assert os.path.exists(pinned) and not os.path.exists(second)
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_index_written_on_interval_and_flush(base_url, downloader, tmp_path):
+    cache = AttachmentCache(str(tmp_path), downloader=downloader, save_interval=3600)
+    index_path = tmp_path / INDEX_FILE
+    cache.release([cache.fetch(f'{base_url}/one/a.png')])
+    written = os.path.getmtime(index_path)
+    for name in ('two', 'three'):
+        cache.release([cache.fetch(f'{base_url}/{name}/a.png')])
+    assert os.path.getmtime(index_path) == written
+    assert len(json.loads(index_path.read_text())["urls"]) == 1
+    cache.flush()
+    assert len(json.loads(index_path.read_text())["urls"]) == 3
+
+
+def test_unindexed_files_are_counted_after_restart(base_url, downloader, tmp_path):
+    cache = AttachmentCache(str(tmp_path), downloader=downloader, save_interval=3600)
+    cache.release([cache.fetch(f'{base_url}/one/a.png')])
+    cache.release([cache.fetch(f'{base_url}/two/a.png')])
+    # 未 flush 即退出：第二个文件不在索引中，重启后仍计入容量并可被淘汰
+    restarted = AttachmentCache(str(tmp_path), downloader=downloader, max_bytes=10 ** 6)
+    assert restarted.get_stats()["files"] == 2
+    restarted.max_bytes = 0
+    restarted.clear()
+    assert [name for name in os.listdir(tmp_path) if name != INDEX_FILE] == []
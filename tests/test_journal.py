@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from utils.journal_utils import DONE, FAILED, QUEUED, SENDING, TaskJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = TaskJournal(str(tmp_path / 'journal.db'), synchronous='OFF')
+    yield journal
+    journal.close()
+
+
+def test_mark_does_not_wait_for_commit(journal):
+    ids = [journal.add('mqtt', ['chat'], ['消息'], None) for _ in range(3)]
+    # 另一个调用方正在提交时，更新状态也立即返回
+    with journal._commit_lock:
+        thread = threading.Thread(target=journal.mark, args=(ids, DONE))
+        thread.start()
+        thread.join(1)
+        assert not thread.is_alive()
+    assert journal.counts() == {DONE: 3}
+
+
+def test_pending_marks_are_committed_on_close(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    journal = TaskJournal(path)
+    task_id = journal.add('mqtt', ['chat'], ['消息'], None)
+    journal.mark([task_id], SENDING)
+    journal.close()
+    # 关闭后不再抛出异常
+    journal.mark([task_id], DONE)
+
+    reopened = TaskJournal(path)
+    try:
+        assert [task.state for task in reopened.recover()] == [SENDING]
+        assert reopened.counts() == {FAILED: 1}
+    finally:
+        reopened.close()
+
+
+def test_failed_write_only_rolls_back_itself(journal):
+    results = {}
+
+    def run(name, fn):
+        try:
+            results[name] = fn()
+        except Exception as e:
+            results[name] = e
+
+    threads = [threading.Thread(target=run, args=('good', lambda: journal.add('mqtt', ['chat'], ['消息'], None))),
+               threading.Thread(target=run, args=('bad', lambda: journal._submit(
+                   lambda connection: connection.execute('INSERT INTO missing VALUES (1)'))))]
+    # 两个写操作积压后合并到同一事务，失败的写操作只回滚自己的保存点
+    with journal._commit_lock:
+        for thread in threads:
+            thread.start()
+        while journal.get_stats()["pending"] < 2:
+            pass
+    for thread in threads:
+        thread.join()
+    assert journal.get_stats()["commits"] == 1
+    assert 'no such table' in str(results['bad'])
+    assert journal.counts() == {QUEUED: 1}
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.screen_corpus import make_synthetic_screenshot
+from config import Image
+from utils.match_utils import (MODE_EXACT, MODE_PYRAMID, get_display_scale, locate_template, match_template,
+                               pyramid_match, reset_display_scales)
+from utils.template_utils import Template, template_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    # 模板按相对于工作目录的路径加载
+    monkeypatch.chdir(ROOT)
+    reset_display_scales()
+    yield
+    reset_display_scales()
+
+
+def _fresh(path):
+    """不带上次命中位置的模板，避免测试之间互相影响"""
+    template = template_registry.get(path)
+    return Template(template.path, template.image, template.mask)
+
+
+@pytest.mark.parametrize('path', [Image.GROUP_IMAGE, Image.EMOJI_IMAGE])
+def test_pyramid_match_agrees_with_full_resolution(path):
+    shot = make_synthetic_screenshot(1920, 1080, seed=1)
+    template = _fresh(path)
+    exact_val, exact_loc = match_template(shot.screen, template)
+    pyramid_val, pyramid_loc = pyramid_match(shot.screen, template)
+    assert exact_loc == pyramid_loc == shot.anchors[path]
+    assert pyramid_val == pytest.approx(exact_val, abs=1e-3)
+
+
+@pytest.mark.parametrize('scale', [1.25, 1.5, 2.0])
+@pytest.mark.parametrize('mode', [MODE_EXACT, MODE_PYRAMID])
+def test_locate_finds_scaled_template_and_caches_scale(scale, mode):
+    shot = make_synthetic_screenshot(2560, 1600, scale=scale, seed=2)
+    template = _fresh(Image.GROUP_IMAGE)
+    box = locate_template(shot.screen, template, mode=mode, display_key='display-1')
+    height, width = template.get_variant(scale)[0].shape[:2]
+    assert box == shot.anchors[Image.GROUP_IMAGE] + (width, height)
+    assert get_display_scale('display-1') == scale
+    assert get_display_scale('display-2') is None
+
+
+def test_cached_scale_is_the_only_scale_tried():
+    shot = make_synthetic_screenshot(1920, 1080, scale=1.0, seed=3)
+    locate_template(shot.screen, _fresh(Image.GROUP_IMAGE), display_key='display-1')
+    # 该显示器已缓存 1.0，不会再尝试 1.5
+    scaled = make_synthetic_screenshot(2560, 1600, scale=1.5, seed=3)
+    assert locate_template(scaled.screen, _fresh(Image.GROUP_IMAGE), display_key='display-1', log_miss=False) is None
+    reset_display_scales()
+    assert locate_template(scaled.screen, _fresh(Image.GROUP_IMAGE), display_key='display-1') is not None
+
+
+def test_last_hit_is_searched_first():
+    shot = make_synthetic_screenshot(1920, 1080, seed=4)
+    template = _fresh(Image.EMOJI_IMAGE)
+    first = locate_template(shot.screen, template)
+    assert template.last_hit == first[:2]
+    assert locate_template(shot.screen, template) == first
+    assert template.memory_hits == 1
+
+
+def test_missing_template_returns_none():
+    screen = np.full((900, 1200, 3), 245, dtype=np.uint8)
+    template = _fresh(Image.GROUP_IMAGE)
+    for mode in (MODE_EXACT, MODE_PYRAMID):
+        assert locate_template(screen, template, mode=mode, log_miss=False) is None
+    assert template.match_misses == 2
@@ -0,0 +1,159 @@
+import json
+import random
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from benchmarks.fake_broker import FakeBroker
+from core.wx_operation_service import WeChatService, set_wechat_service
+from service.mqtt_service import WxMqtt
+from service.reconnect import ReconnectBackoff
+from utils.dedup_utils import DedupCache, set_dedup_cache
+
+TOPIC = 'wx/test/tasks'
+
+
+class RecordingWx:
+    """记录每个节点发送的聊天"""
+
+    def __init__(self, node_id, sent):
+        self.node_id = node_id
+        self.sent = sent
+        self.current_chat = None
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def send_prepared(self, name, broadcast, **kwargs):
+        self.sent.append((self.node_id, name))
+        self.current_chat = name
+
+
+@pytest.fixture
+def broker():
+    broker = FakeBroker()
+    broker.start()
+    set_dedup_cache(DedupCache(path=None))
+    yield broker
+    broker.stop()
+
+
+@pytest.fixture
+def start_node(broker):
+    nodes, sent = [], []
+
+    def start(node_id, share_group=''):
+        service = WeChatService(prefetch_depth=0)
+        wx = RecordingWx(node_id, sent)
+        service._get_wx_instance = lambda: wx
+        # WxMqtt 创建时取得全局微信服务，每个节点使用各自的服务
+        set_wechat_service(service)
+        node = WxMqtt('127.0.0.1', broker.port, subscribe_topic=TOPIC, client_id=f'test-{node_id}',
+                      share_group=share_group, node_id=node_id)
+        node.backoff = ReconnectBackoff(0.05, 0.2)
+        node.start()
+        assert broker.wait_subscribed(node.client_id)
+        nodes.append(node)
+        return node
+
+    start.sent = sent
+    yield start
+    for node in nodes:
+        node.stop()
+
+
+def _publish(broker, content, topic=TOPIC):
+    broker.route(topic, json.dumps(content, ensure_ascii=False).encode(), qos=1)
+
+
+def _wait(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _task(i, **fields):
+    return dict({"method": "sendWechatMessage", "chatNames": [f"chat{i}"], "messages": [f"通知 {i}"],
+                 "taskId": f"t{i}"}, **fields)
+
+
+def test_backoff_doubles_to_cap_and_resets():
+    backoff = ReconnectBackoff(1, 8, jitter=False)
+    assert [backoff.next_delay() for _ in range(5)] == [1, 2, 4, 8, 8]
+    backoff.reset()
+    assert backoff.next_delay() == 1
+    jittered = ReconnectBackoff(1, 8, rng=random.Random(0))
+    delays = [jittered.next_delay() for _ in range(20)]
+    assert all(1 <= delay <= 8 for delay in delays) and len(set(delays)) == 20
+
+
+def test_reconnects_with_persistent_session_after_outage(broker, start_node):
+    node = start_node('n1')
+    broker.stop()
+    assert _wait(lambda: not node.is_connected())
+    time.sleep(0.3)
+    broker.start()
+    assert _wait(node.is_connected)
+    assert broker.wait_subscribed(node.client_id)
+    assert [client_id for _, client_id in broker.connects] == [node.client_id] * 2
+    assert node.reconnect_stats.summary()["reconnects"] == 1
+
+    _publish(broker, _task(1))
+    assert _wait(lambda: start_node.sent == [('n1', 'chat1')])
+
+
+def test_duplicate_delivery_is_sent_once(broker, start_node):
+    node = start_node('n1')
+    for _ in range(3):
+        _publish(broker, _task(1))
+    assert _wait(lambda: node.inbox.get_stats()["processed"] == 3)
+    node.wechat_service.message_queue.join()
+    assert start_node.sent == [('n1', 'chat1')]
+
+
+def test_shared_subscription_splits_work_and_honours_pinned_nodes(broker, start_node):
+    nodes = [start_node(node_id, share_group='wechat') for node_id in ('n1', 'n2', 'n3')]
+    pinned = {}
+    for i in range(30):
+        fields = {}
+        if i % 5 == 0:
+            fields["node"] = pinned[f"chat{i}"] = nodes[i % 3].node_id
+        _publish(broker, _task(i, **fields))
+    assert _wait(lambda: len(start_node.sent) >= 30)
+    time.sleep(0.3)
+
+    sent = dict((chat, node_id) for node_id, chat in start_node.sent)
+    assert len(start_node.sent) == len(sent) == 30
+    assert all(sent[chat] == node_id for chat, node_id in pinned.items())
+    assert {node_id for node_id, _ in start_node.sent} == {'n1', 'n2', 'n3'}
+
+
+def test_plain_subscription_delivers_every_task_to_every_node(broker, start_node):
+    start_node('n1')
+    start_node('n2')
+    _publish(broker, _task(1, taskId=None))
+    # 每个节点都收到任务，同一进程内共用的去重记录保证只发送一次
+    assert _wait(lambda: len(start_node.sent) >= 1)
+    time.sleep(0.3)
+    assert len(start_node.sent) == 1
+
+
+def test_status_is_retained_and_offline_after_stop(broker, start_node):
+    node = start_node('n1')
+    _publish(broker, _task(1))
+    assert _wait(lambda: start_node.sent)
+    node.wechat_service.message_queue.join()
+    status = node.publish_status()
+    assert (status["status"], status["succeeded"], status["uiThreadAlive"]) == ('online', 1, True)
+    assert _wait(lambda: json.loads(broker.retained(node.status_topic).get(node.status_topic, b'{}'))
+                 .get("succeeded") == 1)
+
+    node.stop()
+    assert _wait(lambda: json.loads(broker.retained(node.status_topic)[node.status_topic])["status"] == 'offline')
+    # 负载报告被清除
+    assert broker.retained(node.load_topic) == {}
@@ -0,0 +1,174 @@
+import http.server
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from core.wx_operation_service import WeChatService
+from utils.cache_utils import AttachmentCache, set_attachment_cache
+from utils.download_utils import HttpDownloader
+from utils.journal_utils import DONE, FAILED, SENDING, TaskJournal
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 1000
+
+
+class Recorder:
+    """按发生顺序记录图片请求和界面发送"""
+
+    def __init__(self):
+        self.events = []
+        self.condition = threading.Condition()
+
+    def add(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def wait_for(self, event, timeout=10):
+        with self.condition:
+            return self.condition.wait_for(lambda: event in self.events, timeout)
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    recorder: Recorder = None
+
+    def do_GET(self):
+        self.recorder.add(('request', self.path.strip('/')))
+        time.sleep(0.05)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(PNG)))
+        self.end_headers()
+        self.wfile.write(PNG)
+
+    def log_message(self, *args):
+        pass
+
+
+class GatedWx:
+    """第一个聊天的发送等到 gate 打开后才完成，其余发送立即完成"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.gate = threading.Event()
+        self.current_chat = None
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def send_prepared(self, name, broadcast, **kwargs):
+        if name == 'a':
+            self.recorder.add(('sending', name))
+            assert self.gate.wait(10)
+        self.recorder.add(('send', name))
+        self.current_chat = name
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    # CF_HDROP 数据按 Windows 的 2 字节 WCHAR 构造，这里只需记录附件
+    monkeypatch.setattr('core.wx_operation_service.PreparedBroadcast',
+                        lambda messages, file_paths: (messages, file_paths))
+    recorder = ImageHandler.recorder = Recorder()
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    downloader = HttpDownloader(proxies={})
+    set_attachment_cache(AttachmentCache(str(tmp_path), downloader=downloader))
+    recorder.base_url = f'http://127.0.0.1:{httpd.server_port}'
+    yield recorder
+    httpd.shutdown()
+    httpd.server_close()
+    downloader.close()
+
+
+def _submit_while_first_is_sending(recorder, service, **kwargs):
+    """a 正在发送时提交 b、c（各带一张图片），返回全部完成后的事件顺序"""
+    wx = GatedWx(recorder)
+    service._get_wx_instance = lambda: wx
+    done = threading.Semaphore(0)
+    service.send_message_to_chats(['a'], ['hi'], callback=lambda result: done.release())
+    assert recorder.wait_for(('sending', 'a'))
+    for name in ('b', 'c'):
+        service.send_message_to_chats([name], ['hi'], [f'{recorder.base_url}/{name}.png'],
+                                      callback=lambda result: done.release())
+    return wx, done
+
+
+def _finish(wx, done, recorder):
+    wx.gate.set()
+    for _ in range(3):
+        assert done.acquire(timeout=10)
+    return [event for event in recorder.events if event[0] != 'sending']
+
+
+def test_without_prefetch_only_the_head_task_is_prepared(recorder):
+    service = WeChatService(group_by_recipient=True, prefetch_depth=0)
+    wx, done = _submit_while_first_is_sending(recorder, service)
+    time.sleep(0.2)
+    events = _finish(wx, done, recorder)
+    # b 下载完就发送，不等 c 的图片
+    assert events == [('send', 'a'), ('request', 'b.png'), ('send', 'b'), ('request', 'c.png'), ('send', 'c')]
+
+
+def test_prefetch_downloads_while_ui_is_busy(recorder):
+    service = WeChatService(group_by_recipient=False, prefetch_depth=2)
+    wx, done = _submit_while_first_is_sending(recorder, service)
+    assert recorder.wait_for(('request', 'b.png')) and recorder.wait_for(('request', 'c.png'))
+    events = _finish(wx, done, recorder)
+    assert events.index(('request', 'c.png')) < events.index(('send', 'a'))
+    assert [event for event in events if event[0] == 'send'] == [('send', 'a'), ('send', 'b'), ('send', 'c')]
+
+
+def test_prefetch_stops_at_the_byte_budget(recorder):
+    # b 的附件已占满预取额度，c 要等 b 发送并释放后才下载
+    service = WeChatService(group_by_recipient=False, prefetch_depth=4, prefetch_max_bytes=len(PNG))
+    wx, done = _submit_while_first_is_sending(recorder, service)
+    assert recorder.wait_for(('request', 'b.png'))
+    time.sleep(0.3)
+    assert ('request', 'c.png') not in recorder.events
+    events = _finish(wx, done, recorder)
+    assert events.index(('send', 'b')) < events.index(('request', 'c.png'))
+
+
+def test_failing_callback_still_marks_tasks_done(recorder):
+    service = WeChatService(group_by_recipient=False, prefetch_depth=0)
+    wx = GatedWx(recorder)
+    wx.gate.set()
+    service._get_wx_instance = lambda: wx
+    results = []
+
+    def broken(result):
+        raise RuntimeError("发布结果失败")
+
+    service.send_message_to_chats(['a'], ['hi'], callback=broken)
+    service.send_message_to_chats(['b'], ['hi'], callback=results.append)
+    joined = threading.Thread(target=service.message_queue.join, daemon=True)
+    joined.start()
+    joined.join(10)
+    assert not joined.is_alive()
+    assert [result["success"] for result in results] == [True]
+
+
+def test_recovered_results_are_held_until_a_handler_is_set(recorder, tmp_path, monkeypatch):
+    journal = TaskJournal(str(tmp_path / 'tasks.db'))
+    journal.add('mqtt:a', ['a'], ['hi'], None, task_id='queued')
+    interrupted = journal.add('mqtt:a', ['b'], ['hi'], None, task_id='interrupted')
+    journal.mark([interrupted], SENDING)
+    wx = GatedWx(recorder)
+    wx.gate.set()
+    # 恢复和界面线程都在构造时开始，只能替换类上的方法
+    monkeypatch.setattr(WeChatService, '_get_wx_instance', lambda self: wx)
+    service = WeChatService(prefetch_depth=0, journal=journal)
+    joined = threading.Thread(target=service.message_queue.join, daemon=True)
+    joined.start()
+    joined.join(10)
+    assert not joined.is_alive()
+
+    results = []
+    service.set_result_handler('mqtt:a', results.append)
+    assert {result["taskId"]: result.get("reason", result["success"]) for result in results} == \
+        {'interrupted': 'interrupted', 'queued': True}
+    assert journal.counts() == {DONE: 1, FAILED: 1}
+    journal.close()
@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+
+from core.rate_limit import SendRateLimiter, TokenBucket, VirtualClock
+from core.wx_operation_service import WeChatService, _PreparedTask
+
+
+def test_token_bucket_burst_then_refill():
+    bucket = TokenBucket(rate=0.5, burst=3, now=0.0)
+    for _ in range(3):
+        assert bucket.delay(0.0) == 0.0
+        bucket.consume(0.0)
+    assert bucket.delay(0.0) == 2.0
+    assert bucket.delay(1.0) == 1.0
+    assert bucket.delay(2.0) == 0.0
+    bucket.consume(2.0)
+    assert bucket.delay(2.0) == 2.0
+
+
+def test_token_bucket_refill_caps_at_burst():
+    bucket = TokenBucket(rate=1.0, burst=2, now=0.0)
+    bucket.consume(0.0)
+    bucket.consume(0.0)
+    assert bucket.delay(100.0) == 0.0
+    bucket.consume(100.0)
+    bucket.consume(100.0)
+    assert bucket.delay(100.0) == 1.0
+
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, burst=1, now=0.0)
+    for _ in range(100):
+        bucket.consume(0.0)
+    assert bucket.delay(0.0) == 0.0
+
+
+def test_limiter_per_chat_and_global():
+    clock = VirtualClock()
+    limiter = SendRateLimiter(global_rate=1.0, global_burst=3, chat_rate=0.1, chat_burst=1, clock=clock)
+    limiter.acquire('a')
+    # a 的桶已空，需等 10 秒；b 只受全局限制
+    assert limiter.delay('a') == 10.0
+    assert limiter.delay('b') == 0.0
+    limiter.acquire('b')
+    limiter.acquire('c')
+    # 全局突发用完，每秒补充一次
+    assert limiter.delay('d') == 1.0
+    limiter.wait(limiter.delay('d'))
+    assert clock() == 1.0
+    assert limiter.delay('d') == 0.0
+    assert limiter.get_stats() == {"sends": 3, "waits": 1, "waited": 1.0, "chats": 3}
+
+
+def test_limiter_drops_idle_buckets():
+    clock = VirtualClock()
+    limiter = SendRateLimiter(global_rate=0, chat_rate=1.0, chat_burst=1, clock=clock)
+    limiter.MAX_IDLE_BUCKETS = 2
+    limiter.acquire('a')
+    limiter.acquire('b')
+    clock.sleep(5)
+    limiter.acquire('c')
+    assert limiter.get_stats()["chats"] == 1
+
+
+class RecordingWx:
+    """记录置顶、发送和等待的顺序"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.current_chat = None
+        self.events = []
+
+    @contextmanager
+    def batch(self):
+        self.events.append('topmost')
+        yield self
+        self.events.append('restore')
+
+    def send_prepared(self, name, broadcast, **kwargs):
+        self.events.append((name, self.clock()))
+        self.current_chat = name
+
+
+def _task(task_id, chat_names):
+    return _PreparedTask(task_id, chat_names, None, [], 0, None, None, 0, None)
+
+
+def test_service_sends_allowed_chats_first_and_waits_outside_batch():
+    clock = VirtualClock()
+    wx = RecordingWx(clock)
+    limiter = SendRateLimiter(global_rate=0, chat_rate=0.1, chat_burst=1, clock=clock,
+                              sleep=lambda seconds: (wx.events.append(('wait', seconds)), clock.sleep(seconds)))
+    service = WeChatService(group_by_recipient=False, prefetch_depth=0, rate_limiter=limiter)
+    service._get_wx_instance = lambda: wx
+
+    results = service._send_prepared_tasks([_task('t1', ['a']), _task('t2', ['a']), _task('t3', ['b'])])
+
+    assert [result["success"] for result in results] == [True, True, True]
+    # t2 的 a 被限速时先发送 t3 的 b，等待时窗口不置顶
+    assert wx.events == ['topmost', ('a', 0.0), ('b', 0.0), 'restore', ('wait', 10.0), 'topmost', ('a', 10.0),
+                         'restore']
@@ -1,8 +1,26 @@
-from utils.clipboard_utils import copy_files_to_clipboard
+import sys
+
+from utils.capture_utils import (CaptureBackend, PyAutoGuiCapture, GdiCapture, ArrayCapture, get_capture_backend,
+                                 set_capture_backend)
+from utils.cache_utils import (AttachmentCache, get_attachment_cache, set_attachment_cache)
 from utils.config_utils import (get_config, write_config)
+from utils.dedup_utils import (DedupCache, get_dedup_cache, set_dedup_cache)
+from utils.download_utils import (HttpDownloader, DownloadError, DownloadResult, get_downloader, guess_extension)
 from utils.file_io_utils import (read_file, write_file, get_resource_path, get_pid, get_temp_file_path, path_exists,
                                  delete_file, delete_old_files_with_extension, join_path)
-from utils.hash_utils import get_file_sha256
-from utils.image_clicker import (find_image_on_screen, click_below_image)
-from utils.process_utils import (get_specific_process, is_process_running)
-from utils.window_utils import (minimize_wechat, wake_up_window)
+from utils.hash_utils import (get_file_sha256, get_json_sha256)
+from utils.journal_utils import (TaskJournal, JournaledTask)
+from utils.json_utils import (create_json_decoder, get_json_decoder, set_json_decoder)
+from utils.match_utils import (match_template, pyramid_match, locate_template, locate_templates, reset_display_scales,
+                               MODE_EXACT, MODE_PYRAMID)
+from utils.template_utils import (Template, TemplateRegistry, template_registry)
+from utils.text_utils import (ZWSP, count_emoji, insert_zwsp_after_emoji, normalize_text)
+from utils.wait_utils import (WaitStats, wait_stats, wait_until, region_changed)
+
+# 以下模块依赖 Windows 桌面环境，其余模块可在无界面环境下导入（如离线跑基准测试）
+if sys.platform == 'win32':
+    from utils.clipboard_utils import (copy_files_to_clipboard, build_file_drop_buffer, get_clipboard_sequence,
+                                       clipboard_changed)
+    from utils.image_clicker import (find_image_on_screen, find_images_on_screen, click_below, click_below_image)
+    from utils.process_utils import (get_specific_process, is_process_running)
+    from utils.window_utils import (minimize_wechat, get_wechat_exe_path, wake_up_window, is_window_alive)
@@ -0,0 +1,266 @@
+"""附件缓存：按 URL 记录 ETag/Last-Modified，文件按内容的 SHA-256 存储，相同内容只保存一份，超出容量时按最近最少使用淘汰"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from config import Cache
+from utils.download_utils import DownloadError, HttpDownloader, get_downloader
+from utils.file_io_utils import get_temp_file_path, join_path
+from utils.hash_utils import get_file_sha256
+
+INDEX_FILE = 'index.json'
+PART_SUFFIX = '.part'
+
+
+class AttachmentCache:
+    """
+    磁盘附件缓存。
+
+    fetch 返回的文件在 release 之前不会被淘汰，调用方发送完毕后需要 release。
+
+    Attributes:
+    ----------
+    directory: str
+        缓存目录
+    max_bytes: int
+        缓存容量上限（字节）
+    revalidate_after: float
+        条目在多少秒内不经校验直接使用
+    downloader: HttpDownloader
+        下载服务，默认使用全局下载服务
+    save_interval: float
+        最多每隔多少秒写一次索引，退出前调用 flush 写入剩余的修改
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = Cache.MAX_BYTES,
+                 revalidate_after: float = Cache.REVALIDATE_AFTER, downloader: Optional[HttpDownloader] = None,
+                 save_interval: float = Cache.SAVE_INTERVAL):
+        self.directory = directory or get_temp_file_path(Cache.DIRECTORY)
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.downloader = downloader or get_downloader()
+        self.save_interval = save_interval
+        # URL -> {sha256, etag, last_modified, checked_at}
+        self._urls: Dict[str, dict] = {}
+        # sha256 -> {file, size}，按最近使用排序
+        self._blobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._stats = {"hits": 0, "revalidated": 0, "misses": 0, "deduplicated": 0, "evictions": 0, "errors": 0}
+        self._dirty = False
+        self._saved_at = float('-inf')
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    # ---------------------------------------------------------------- 公共接口
+
+    def fetch(self, url: str) -> Optional[str]:
+        """
+        获取 URL 对应的本地文件，必要时下载或向服务器校验。文件扩展名根据文件头识别
+
+        Args:
+            url: 附件 URL
+
+        Returns:
+            Optional[str]: 本地文件路径，下载失败时为 None
+        """
+        with self._lock:
+            entry = self._urls.get(url)
+            blob = self._blobs.get(entry["sha256"]) if entry else None
+            if blob and time.time() - entry["checked_at"] < self.revalidate_after:
+                self._stats["hits"] += 1
+                return self._pin(entry["sha256"])
+            validators = {k: entry[k] for k in ("etag", "last_modified") if entry and entry.get(k)} if blob else {}
+
+        try:
+            return self._download(url, validators)
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            print(f"下载附件失败 {url}: {e}")
+            return None
+
+    def release(self, file_paths: Iterable[str]) -> None:
+        """释放 fetch 返回的文件，使其可以被淘汰"""
+        with self._lock:
+            for file_path in file_paths:
+                sha256 = os.path.basename(file_path).split('.', 1)[0]
+                count = self._pins.get(sha256, 0) - 1
+                if count > 0:
+                    self._pins[sha256] = count
+                else:
+                    self._pins.pop(sha256, None)
+            self._evict()
+
+    def flush(self) -> None:
+        """立即写入索引"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 命中、校验命中、未命中、去重、淘汰、失败次数，以及条目数和占用字节数
+        """
+        with self._lock:
+            return dict(self._stats, urls=len(self._urls), files=len(self._blobs), bytes=self._total_bytes)
+
+    def clear(self) -> None:
+        """删除所有未被占用的缓存文件"""
+        with self._lock:
+            max_bytes, self.max_bytes = self.max_bytes, 0
+            try:
+                self._evict()
+            finally:
+                self.max_bytes = max_bytes
+
+    # ---------------------------------------------------------------- 内部实现
+
+    def _download(self, url: str, validators: dict) -> str:
+        headers = {}
+        if validators.get("etag"):
+            headers['If-None-Match'] = validators["etag"]
+        if validators.get("last_modified"):
+            headers['If-Modified-Since'] = validators["last_modified"]
+
+        part_path = join_path(self.directory, uuid.uuid4().hex + PART_SUFFIX)
+        try:
+            result = self.downloader.download(url, part_path, headers)
+            if result.status == 304:
+                with self._lock:
+                    entry = self._urls.get(url)
+                    if entry and entry["sha256"] in self._blobs:
+                        entry["checked_at"] = time.time()
+                        self._stats["revalidated"] += 1
+                        self._dirty = True
+                        self._maybe_save()
+                        return self._pin(entry["sha256"])
+                if not validators:
+                    raise DownloadError("服务器对无条件请求返回了 304")
+                # 校验期间文件被淘汰，不带校验信息重新下载一次
+                return self._download(url, {})
+
+            sha256 = get_file_sha256(part_path)
+            with self._lock:
+                self._stats["misses"] += 1
+                if sha256 in self._blobs:
+                    # 内容已缓存（可能来自其他 URL），丢弃本次下载
+                    self._stats["deduplicated"] += 1
+                else:
+                    file_name = sha256 + result.extension
+                    os.replace(part_path, join_path(self.directory, file_name))
+                    size = os.path.getsize(join_path(self.directory, file_name))
+                    self._blobs[sha256] = {"file": file_name, "size": size}
+                    self._total_bytes += size
+                self._urls[url] = {"sha256": sha256, "etag": result.headers.get('ETag'),
+                                   "last_modified": result.headers.get('Last-Modified'), "checked_at": time.time()}
+                self._dirty = True
+                path = self._pin(sha256)
+                self._evict()
+                return path
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def _pin(self, sha256: str) -> str:
+        """标记文件正在使用并移到最近使用的位置，调用方需持有锁"""
+        self._blobs.move_to_end(sha256)
+        self._pins[sha256] = self._pins.get(sha256, 0) + 1
+        return join_path(self.directory, self._blobs[sha256]["file"])
+
+    def _evict(self) -> None:
+        """淘汰最近最少使用且未被占用的文件直到不超过容量，调用方需持有锁"""
+        changed = False
+        for sha256 in list(self._blobs):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if sha256 in self._pins:
+                continue
+            blob = self._blobs.pop(sha256)
+            self._total_bytes -= blob["size"]
+            self._stats["evictions"] += 1
+            changed = True
+            try:
+                os.remove(join_path(self.directory, blob["file"]))
+            except FileNotFoundError:
+                pass
+        if changed:
+            self._urls = {url: entry for url, entry in self._urls.items() if entry["sha256"] in self._blobs}
+            self._dirty = True
+        self._maybe_save()
+
+    def _load_index(self) -> None:
+        """
+        读取索引，丢弃文件已不存在的条目，并清理上次异常退出遗留的未完成下载。
+        索引是定期写入的，上次退出前新下载、尚未写入索引的文件也计入容量，以便之后淘汰
+        """
+        file_names = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(PART_SUFFIX):
+                os.remove(join_path(self.directory, file_name))
+            elif file_name != INDEX_FILE:
+                file_names.append(file_name)
+
+        try:
+            with open(join_path(self.directory, INDEX_FILE), encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        # 未写入索引的文件视为最久未使用
+        indexed = {blob["file"] for _, blob in index.get("blobs", [])}
+        blobs = [(file_name.split('.', 1)[0], {"file": file_name}) for file_name in file_names
+                 if file_name not in indexed]
+        for sha256, blob in blobs + index.get("blobs", []):
+            file_path = join_path(self.directory, blob["file"])
+            if os.path.exists(file_path):
+                blob["size"] = os.path.getsize(file_path)
+                self._blobs[sha256] = blob
+                self._total_bytes += blob["size"]
+        self._urls = {url: entry for url, entry in index.get("urls", {}).items() if entry["sha256"] in self._blobs}
+        self._dirty = bool(blobs)
+
+    def _maybe_save(self) -> None:
+        """有修改且距上次写入超过 save_interval 时写入索引，调用方需持有锁"""
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self._save_index()
+
+    def _save_index(self) -> None:
+        """先写临时文件再替换，避免中途退出留下损坏的索引，调用方需持有锁"""
+        index_path = join_path(self.directory, INDEX_FILE)
+        temp_path = index_path + PART_SUFFIX
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"urls": self._urls, "blobs": list(self._blobs.items())}, f)
+        os.replace(temp_path, index_path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+
+# 全局附件缓存，首次使用时创建
+_attachment_cache: Optional[AttachmentCache] = None
+_attachment_cache_lock = threading.Lock()
+
+
+def get_attachment_cache() -> AttachmentCache:
+    """获取全局附件缓存"""
+    global _attachment_cache
+    with _attachment_cache_lock:
+        if _attachment_cache is None:
+            _attachment_cache = AttachmentCache()
+        return _attachment_cache
+
+
+def set_attachment_cache(cache: AttachmentCache) -> None:
+    """替换全局附件缓存，例如在基准测试中使用独立目录"""
+    global _attachment_cache
+    with _attachment_cache_lock:
+        _attachment_cache = cache
@@ -0,0 +1,232 @@
+"""屏幕截图后端，image_clicker 通过统一接口截图，便于替换实现以及无界面环境下测试"""
+
+import ctypes
+import sys
+import threading
+from ctypes import wintypes
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+# (left, top, width, height)
+Region = Tuple[int, int, int, int]
+
+
+class CaptureBackend:
+    """
+    截图后端基类。
+
+    grab/grab_gray 返回的数组可能是后端内部复用的缓冲区，只在下一次截图前有效，调用方不应长期持有。
+    """
+
+    def screen_size(self) -> Tuple[int, int]:
+        """返回屏幕尺寸 (width, height)"""
+        raise NotImplementedError
+
+    def grab(self, region: Region) -> np.ndarray:
+        """截取指定区域，返回 BGR 图像"""
+        raise NotImplementedError
+
+    def grab_gray(self, region: Region) -> np.ndarray:
+        """截取指定区域，返回灰度图像"""
+        return cv2.cvtColor(self.grab(region), cv2.COLOR_BGR2GRAY)
+
+    def close(self) -> None:
+        """释放后端占用的资源"""
+
+
+class PyAutoGuiCapture(CaptureBackend):
+    """基于 pyautogui.screenshot 的截图后端，每次截图都会分配新的 PIL 图像和数组"""
+
+    def screen_size(self) -> Tuple[int, int]:
+        import pyautogui
+        width, height = pyautogui.size()
+        return width, height
+
+    def grab(self, region: Region) -> np.ndarray:
+        import pyautogui
+        screenshot = pyautogui.screenshot(region=region)
+        return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR)
+
+
+class _BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [("biSize", wintypes.DWORD),
+                ("biWidth", wintypes.LONG),
+                ("biHeight", wintypes.LONG),
+                ("biPlanes", wintypes.WORD),
+                ("biBitCount", wintypes.WORD),
+                ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD),
+                ("biXPelsPerMeter", wintypes.LONG),
+                ("biYPelsPerMeter", wintypes.LONG),
+                ("biClrUsed", wintypes.DWORD),
+                ("biClrImportant", wintypes.DWORD)]
+
+
+class _BITMAPINFO(ctypes.Structure):
+    _fields_ = [("bmiHeader", _BITMAPINFOHEADER),
+                ("bmiColors", wintypes.DWORD * 3)]
+
+
+class GdiCapture(CaptureBackend):
+    """
+    基于 GDI BitBlt 的截图后端。
+
+    屏幕内容直接复制到预先创建的 DIB Section 中，NumPy 数组直接映射这块内存（BGRA），
+    BGR/灰度结果也写入复用的缓冲区。区域尺寸不变时，连续截图不再分配整帧内存。
+    """
+
+    SRCCOPY = 0x00CC0020
+    CAPTUREBLT = 0x40000000
+    DIB_RGB_COLORS = 0
+    BI_RGB = 0
+
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._gdi32 = ctypes.windll.gdi32
+        self._gdi32.CreateCompatibleDC.restype = wintypes.HDC
+        self._gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+        self._gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+        self._gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.POINTER(_BITMAPINFO), wintypes.UINT,
+                                                 ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+        self._gdi32.SelectObject.restype = wintypes.HGDIOBJ
+        self._gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+        self._gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+        self._gdi32.DeleteDC.argtypes = [wintypes.HDC]
+        self._gdi32.BitBlt.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                       wintypes.HDC, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+        self._user32.GetDC.restype = wintypes.HDC
+        self._user32.GetDC.argtypes = [wintypes.HWND]
+        self._user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+
+        self._lock = threading.Lock()
+        self._screen_dc = self._user32.GetDC(None)
+        self._mem_dc = self._gdi32.CreateCompatibleDC(self._screen_dc)
+        self._bitmap = None
+        self._size: Tuple[int, int] = (0, 0)
+        self._bgra: Optional[np.ndarray] = None
+        self._bgr: Optional[np.ndarray] = None
+        self._gray: Optional[np.ndarray] = None
+
+    def screen_size(self) -> Tuple[int, int]:
+        return self._user32.GetSystemMetrics(0), self._user32.GetSystemMetrics(1)
+
+    def _ensure_buffers(self, width: int, height: int) -> None:
+        """区域尺寸变化时重新创建 DIB Section 及复用缓冲区"""
+        if self._size == (width, height):
+            return
+        if self._bitmap:
+            self._gdi32.DeleteObject(self._bitmap)
+
+        bmi = _BITMAPINFO()
+        bmi.bmiHeader.biSize = ctypes.sizeof(_BITMAPINFOHEADER)
+        bmi.bmiHeader.biWidth = width
+        bmi.bmiHeader.biHeight = -height  # 负值表示自上而下的行序，与 NumPy 一致
+        bmi.bmiHeader.biPlanes = 1
+        bmi.bmiHeader.biBitCount = 32
+        bmi.bmiHeader.biCompression = self.BI_RGB
+        bits = ctypes.c_void_p()
+        self._bitmap = self._gdi32.CreateDIBSection(self._mem_dc, ctypes.byref(bmi), self.DIB_RGB_COLORS,
+                                                    ctypes.byref(bits), None, 0)
+        if not self._bitmap:
+            raise OSError("CreateDIBSection 失败")
+        self._gdi32.SelectObject(self._mem_dc, self._bitmap)
+
+        buffer = (ctypes.c_ubyte * (width * height * 4)).from_address(bits.value)
+        self._bgra = np.ctypeslib.as_array(buffer).reshape(height, width, 4)
+        self._bgr = np.empty((height, width, 3), dtype=np.uint8)
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._size = (width, height)
+
+    def _blit(self, region: Region) -> np.ndarray:
+        left, top, width, height = region
+        self._ensure_buffers(width, height)
+        if not self._gdi32.BitBlt(self._mem_dc, 0, 0, width, height, self._screen_dc, left, top,
+                                  self.SRCCOPY | self.CAPTUREBLT):
+            raise OSError("BitBlt 失败")
+        self._gdi32.GdiFlush()
+        return self._bgra
+
+    def grab(self, region: Region) -> np.ndarray:
+        with self._lock:
+            return cv2.cvtColor(self._blit(region), cv2.COLOR_BGRA2BGR, dst=self._bgr)
+
+    def grab_gray(self, region: Region) -> np.ndarray:
+        with self._lock:
+            return cv2.cvtColor(self._blit(region), cv2.COLOR_BGRA2GRAY, dst=self._gray)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._bitmap:
+                self._gdi32.DeleteObject(self._bitmap)
+                self._bitmap = None
+            if self._mem_dc:
+                self._gdi32.DeleteDC(self._mem_dc)
+                self._mem_dc = None
+            if self._screen_dc:
+                self._user32.ReleaseDC(None, self._screen_dc)
+                self._screen_dc = None
+            self._size = (0, 0)
+
+
+class ArrayCapture(CaptureBackend):
+    """
+    以内存中的图像（或图片文件）作为“屏幕”的截图后端，用于无界面环境下的测试和基准测试。
+    截图直接返回对应区域的视图，不复制数据。
+    """
+
+    def __init__(self, frame: Union[np.ndarray, str]):
+        self.frame = None
+        self.set_frame(frame)
+
+    def set_frame(self, frame: Union[np.ndarray, str]) -> None:
+        """
+        替换当前“屏幕”内容
+
+        Args:
+            frame: BGR 图像或图片文件路径
+        """
+        if isinstance(frame, str):
+            image = cv2.imdecode(np.fromfile(frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"无法加载截图: {frame}")
+            frame = image
+        self.frame = frame
+
+    def screen_size(self) -> Tuple[int, int]:
+        height, width = self.frame.shape[:2]
+        return width, height
+
+    def grab(self, region: Region) -> np.ndarray:
+        left, top, width, height = region
+        return self.frame[top:top + height, left:left + width]
+
+
+_backend: Optional[CaptureBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_capture_backend() -> CaptureBackend:
+    """获取当前截图后端，Windows 下默认使用 GdiCapture，其它平台使用 PyAutoGuiCapture"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = GdiCapture() if sys.platform == 'win32' else PyAutoGuiCapture()
+        return _backend
+
+
+def set_capture_backend(backend: CaptureBackend) -> Optional[CaptureBackend]:
+    """
+    替换截图后端
+
+    Args:
+        backend: 新的截图后端
+
+    Returns:
+        之前使用的截图后端
+    """
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+        return previous
@@ -2,7 +2,7 @@ import ctypes
 import os
 import time
 from ctypes import wintypes
-from typing import (Iterable, Callable, List)
+from typing import (Iterable, Callable, List, Optional)
 
 import win32clipboard
 
@@ -57,6 +57,29 @@ def set_clipboard_data(fmt: int, buf: ctypes.Array) -> bool:
         win32clipboard.CloseClipboard()
 
 
+def get_clipboard_sequence() -> int:
+    """
+    获取剪切板序列号，剪切板内容每次变化时序列号都会增加。
+
+    Returns:
+        int: 剪切板序列号
+    """
+    return win32clipboard.GetClipboardSequenceNumber()
+
+
+def clipboard_changed(since: int) -> Callable[[], bool]:
+    """
+    创建“剪切板内容已变化”条件，用于 wait_until。
+
+    Args:
+        since (int): 基准序列号，通常为写入剪切板前调用 get_clipboard_sequence 的结果
+
+    Returns:
+        Callable[[], bool]: 条件函数
+    """
+    return lambda: get_clipboard_sequence() != since
+
+
 def get_clipboard_files() -> List[str]:
     """
     获取剪切板中的文件路径列表。
@@ -98,25 +121,27 @@ def validate_clipboard_files(file_paths: Iterable[str], fmt: int, buf: ctypes.Ar
     raise ValueError("剪切板文件路径不对哇！")
 
 
-def copy_files_to_clipboard(file_paths: Iterable[str]) -> bool:
+CF_HDROP = 15
+
+
+class DROPFILES(ctypes.Structure):
+    _fields_ = [("pFiles", wintypes.DWORD),
+                ("pt", wintypes.POINT),
+                ("fNC", wintypes.BOOL),
+                ("fWide", wintypes.BOOL)]
+
+
+def build_file_drop_buffer(file_paths: Iterable[str]) -> ctypes.Array:
     """
-    将一系列文件路径复制到Windows剪切板。这允许用户在其他应用程序中，如文件资源管理器中粘贴这些文件。
+    构造 CF_HDROP 格式的剪切板数据。同一组文件发送给多个聊天时只需构造一次。
 
     Args:
         file_paths (Iterable): 一个包含文件路径的可迭代对象，每个路径都是一个字符串。
 
     Returns:
-        bool: 如果成功将文件路径复制到剪切板，则返回 True，否则返回 False
+        ctypes.Array: DROPFILES 结构及其后的文件路径列表
     """
-    # 定义所需的 Windows 结构和函数
-    CF_HDROP = 15
-
-    class DROPFILES(ctypes.Structure):
-        _fields_ = [("pFiles", wintypes.DWORD),
-                    ("pt", wintypes.POINT),
-                    ("fNC", wintypes.BOOL),
-                    ("fWide", wintypes.BOOL)]
-
+    file_paths = [os.path.normpath(path) for path in file_paths]
     offset = ctypes.sizeof(DROPFILES)
     length = sum(len(p) + 1 for p in file_paths) + 1
     size = offset + length * ctypes.sizeof(wintypes.WCHAR)
@@ -124,12 +149,28 @@ def copy_files_to_clipboard(file_paths: Iterable[str]) -> bool:
     df = DROPFILES.from_buffer(buf)
     df.pFiles, df.fWide = offset, True
     for path in file_paths:
-        path = os.path.normpath(path)
         array_t = ctypes.c_wchar * (len(path) + 1)
         path_buf = array_t.from_buffer(buf, offset)
         path_buf.value = path
         offset += ctypes.sizeof(path_buf)
     buf[offset:offset + ctypes.sizeof(wintypes.WCHAR)] = b'\0\0'
+    return buf
+
+
+def copy_files_to_clipboard(file_paths: Iterable[str], buf: Optional[ctypes.Array] = None) -> bool:
+    """
+    将一系列文件路径复制到Windows剪切板。这允许用户在其他应用程序中，如文件资源管理器中粘贴这些文件。
+
+    Args:
+        file_paths (Iterable): 一个包含文件路径的可迭代对象，每个路径都是一个字符串。
+        buf (ctypes.Array, optional): 预先用 build_file_drop_buffer 构造的剪切板数据，为 None 时现场构造
+
+    Returns:
+        bool: 如果成功将文件路径复制到剪切板，则返回 True，否则返回 False
+    """
+    file_paths = [os.path.normpath(file) for file in file_paths]
+    if buf is None:
+        buf = build_file_drop_buffer(file_paths)
 
     # 验证文件是否成功复制到剪切板
-    return validate_clipboard_files([os.path.normpath(file) for file in file_paths], CF_HDROP, buf=buf)
+    return validate_clipboard_files(file_paths, CF_HDROP, buf=buf)
@@ -0,0 +1,167 @@
+"""消息去重：记录一段时间内见过的消息键，丢弃重复投递、生产者重试以及多个连接订阅同一主题收到的相同消息"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Set
+
+from config import Dedup
+
+PART_SUFFIX = '.part'
+
+
+class DedupCache:
+    """
+    有容量上限的去重记录，每个键在各自的有效期内视为已见过，超出容量时淘汰最久未出现的键。
+
+    指定 path 时记录会定期写入文件，重启后仍能识别上次运行见过的消息。
+    检查（check）与记录（record）分开：消息成功加入发送队列后才记录，在此之前崩溃或入队失败时，重发的消息不会被当作重复。
+
+    Attributes:
+    ----------
+    max_entries: int
+        最多记录的键数
+    path: Optional[str]
+        持久化文件路径，None 表示只保存在内存中
+    save_interval: float
+        最多每隔多少秒写一次文件
+    clock: Callable[[], float]
+        时钟，需要跨进程可比较，默认 time.time
+    """
+
+    def __init__(self, max_entries: int = Dedup.MAX_ENTRIES, path: Optional[str] = Dedup.PATH,
+                 save_interval: float = Dedup.SAVE_INTERVAL, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.path = os.path.abspath(path) if path else None
+        self.save_interval = save_interval
+        self.clock = clock
+        # 键 -> 过期时间，按最近出现的顺序排列
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        # 已通过检查、正在入队的键，只保存在内存中
+        self._pending: Set[str] = set()
+        self._stats = {"accepted": 0, "duplicates": 0, "evictions": 0}
+        self._dirty = False
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        if self.path:
+            self._load()
+
+    def check(self, key: str) -> bool:
+        """
+        检查一个键，未出现过时将其标记为正在入队，入队成功后调用 record，失败时调用 discard
+
+        Args:
+            key: 消息键
+
+        Returns:
+            bool: 有效期内已记录过、或另一条相同消息正在入队时返回 True
+        """
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if key in self._pending or (expires_at is not None and expires_at > self.clock()):
+                if expires_at is not None:
+                    self._entries.move_to_end(key)
+                self._stats["duplicates"] += 1
+                return True
+            self._pending.add(key)
+            return False
+
+    def record(self, key: str, ttl: float) -> None:
+        """
+        记录一个已加入发送队列的键
+
+        Args:
+            key: 消息键
+            ttl: 记录后多少秒内再次出现视为重复
+        """
+        with self._lock:
+            now = self.clock()
+            self._pending.discard(key)
+            self._entries[key] = now + ttl
+            self._entries.move_to_end(key)
+            self._stats["accepted"] += 1
+            self._evict(now)
+            self._dirty = True
+            self._maybe_save(now)
+
+    def discard(self, key: str) -> None:
+        """删除一个键，例如消息未能加入发送队列时，允许服务器重发或生产者重试"""
+        with self._lock:
+            self._pending.discard(key)
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+                self._maybe_save(self.clock())
+
+    def flush(self) -> None:
+        """立即写入文件"""
+        with self._lock:
+            if self.path and self._dirty:
+                self._save(self.clock())
+
+    def get_stats(self) -> dict:
+        """已接受、判定为重复、因容量淘汰的消息数，以及当前记录的键数"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    # ---------------------------------------------------------------- 内部实现，调用方需持有锁
+
+    def _evict(self, now: float) -> None:
+        # 最久未出现的键在最前；已过期的直接丢弃，超出容量时也从最前淘汰
+        while self._entries:
+            key, expires_at = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            if expires_at > now:
+                self._stats["evictions"] += 1
+
+    def _maybe_save(self, now: float) -> None:
+        if self.path and now - self._saved_at >= self.save_interval:
+            self._save(now)
+
+    def _save(self, now: float) -> None:
+        """先写临时文件再替换，避免中途退出留下损坏的文件"""
+        temp_path = self.path + PART_SUFFIX
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump([[key, expires_at] for key, expires_at in self._entries.items() if expires_at > now], f)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"保存去重记录失败: {e}")
+        self._saved_at = now
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        now = self.clock()
+        self._entries.update((key, expires_at) for key, expires_at in entries if expires_at > now)
+        self._evict(now)
+        self._saved_at = now
+
+
+# 全局去重记录，进程内所有 MQTT 连接共用
+_dedup_cache: Optional[DedupCache] = None
+_dedup_cache_lock = threading.Lock()
+
+
+def get_dedup_cache() -> DedupCache:
+    """获取全局去重记录"""
+    global _dedup_cache
+    with _dedup_cache_lock:
+        if _dedup_cache is None:
+            _dedup_cache = DedupCache()
+        return _dedup_cache
+
+
+def set_dedup_cache(cache: DedupCache) -> None:
+    """替换全局去重记录，例如只保存在内存中或使用独立文件"""
+    global _dedup_cache
+    with _dedup_cache_lock:
+        _dedup_cache = cache
@@ -0,0 +1,319 @@
+"""HTTP 下载：按主机复用长连接，分块流式写入磁盘，限制超时和大小，并根据文件头识别图片类型。
+与 urllib 一样使用 HTTP_PROXY/HTTPS_PROXY/NO_PROXY 环境变量（Windows 上为系统代理设置）中的代理"""
+
+import base64
+import concurrent.futures
+import http.client
+import os
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit
+
+from config import Download
+
+# 文件头 -> 扩展名
+MAGIC_NUMBERS = [
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'BM', '.bmp'),
+]
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# 复用的连接被服务器关闭时抛出的异常，此时换新连接重试一次
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                           BrokenPipeError, ConnectionAbortedError)
+
+HostKey = Tuple[str, str, int]
+
+
+class DownloadError(Exception):
+    """下载失败：状态码异常、超出大小限制或超时"""
+
+
+def guess_extension(head: bytes, url: str = '') -> str:
+    """
+    根据文件头识别图片类型，无法识别时使用 URL 路径中的扩展名，默认 .jpg
+
+    Args:
+        head: 文件开头的若干字节
+        url: 文件的 URL
+
+    Returns:
+        str: 扩展名
+    """
+    for magic, extension in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    extension = os.path.splitext(urlsplit(url).path)[1].lower()
+    return extension if extension in IMAGE_EXTENSIONS else '.jpg'
+
+
+class DownloadResult:
+    """
+    一次下载的结果
+
+    Attributes:
+    ----------
+    status: int
+        最终的 HTTP 状态码，304 表示内容未修改且未写入文件
+    headers: http.client.HTTPMessage
+        响应头
+    size: int
+        写入的字节数
+    extension: str
+        根据文件头识别的扩展名
+    """
+
+    def __init__(self, status: int, headers, size: int = 0, extension: str = ''):
+        self.status = status
+        self.headers = headers
+        self.size = size
+        self.extension = extension
+
+
+class HttpDownloader:
+    """
+    长期存在的下载服务。每个主机保留若干空闲的长连接供后续请求复用，所有并发下载共用一个线程池。
+
+    Attributes:
+    ----------
+    max_bytes: int
+        单个文件的大小上限（字节）
+    connect_timeout: float
+        建立连接的超时（秒）
+    read_timeout: float
+        两次读取之间的超时（秒）
+    total_timeout: float
+        单个文件下载的总时长上限（秒），防止服务器极慢地逐字节返回
+    proxies: Dict[str, str]
+        协议 -> 代理地址，默认为 urllib.request.getproxies()；"no" 为不使用代理的主机列表
+    """
+
+    def __init__(self, max_workers: int = Download.WORKERS, connections_per_host: int = Download.CONNECTIONS_PER_HOST,
+                 connect_timeout: float = Download.CONNECT_TIMEOUT, read_timeout: float = Download.READ_TIMEOUT,
+                 total_timeout: float = Download.TOTAL_TIMEOUT, max_bytes: int = Download.MAX_BYTES,
+                 chunk_size: int = Download.CHUNK_SIZE, proxies: Optional[Dict[str, str]] = None):
+        # 使用系统代理设置时，例外主机也按系统设置判断
+        self._system_proxies = proxies is None
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self.connections_per_host = connections_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='download')
+        # 主机 -> 空闲连接及其归还时间
+        self._idle: Dict[HostKey, List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._host_slots: Dict[HostKey, threading.BoundedSemaphore] = {}
+        self._stats = {"requests": 0, "reused": 0, "bytes": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """在下载线程池中执行函数"""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def download(self, url: str, file_path: str, headers: Optional[Dict[str, str]] = None) -> DownloadResult:
+        """
+        下载 URL 到指定文件，自动跟随重定向
+
+        Args:
+            url: 文件 URL
+            file_path: 写入的文件路径
+            headers: 额外的请求头，如 If-None-Match
+
+        Returns:
+            DownloadResult: 下载结果
+
+        Raises:
+            DownloadError: 状态码异常、超出大小限制或超时
+            OSError: 网络或磁盘错误
+        """
+        deadline = time.monotonic() + self.total_timeout
+        try:
+            for _ in range(Download.MAX_REDIRECTS + 1):
+                result = self._request(url, file_path, headers or {}, deadline)
+                if result.status not in REDIRECT_CODES:
+                    return result
+                url = urljoin(url, result.headers.get('Location', ''))
+            raise DownloadError(f"重定向次数过多: {url}")
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+
+    def get_stats(self) -> dict:
+        """获取请求数、复用连接数、下载字节数和失败次数"""
+        with self._lock:
+            return dict(self._stats, idle_connections=sum(len(idle) for idle in self._idle.values()))
+
+    def close(self) -> None:
+        """关闭线程池和所有空闲连接"""
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            for idle in self._idle.values():
+                for connection, _ in idle:
+                    connection.close()
+            self._idle.clear()
+
+    # ---------------------------------------------------------------- 内部实现
+
+    def _request(self, url: str, file_path: str, headers: Dict[str, str], deadline: float) -> DownloadResult:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise DownloadError(f"不支持的地址: {url}")
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        proxy = self._proxy(parts.scheme, parts.hostname)
+        if proxy is not None and parts.scheme == 'http':
+            # 经代理的 HTTP 请求使用完整地址；HTTPS 通过 CONNECT 隧道，请求与直连相同
+            target = parts._replace(fragment='').geturl()
+            headers = dict(headers, **_proxy_headers(proxy))
+
+        slot = self._slot(key)
+        if not slot.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise DownloadError(f"等待连接超时: {url}")
+        try:
+            connection, reused = self._checkout(key)
+            try:
+                try:
+                    connection.request('GET', target, headers=headers)
+                    response = connection.getresponse()
+                except STALE_CONNECTION_ERRORS:
+                    if not reused:
+                        raise
+                    # 服务器已关闭空闲连接，换新连接重试
+                    connection.close()
+                    connection, reused = self._new_connection(key), False
+                    connection.request('GET', target, headers=headers)
+                    response = connection.getresponse()
+
+                with self._lock:
+                    self._stats["requests"] += 1
+                    self._stats["reused"] += reused
+
+                if response.status == 304 or response.status in REDIRECT_CODES:
+                    response.read()
+                    result = DownloadResult(response.status, response.headers)
+                elif 200 <= response.status < 300:
+                    result = self._stream(response, file_path, deadline, url)
+                else:
+                    response.read(self.chunk_size)
+                    raise DownloadError(f"HTTP {response.status} {response.reason}: {url}")
+            except BaseException:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(key, connection)
+            return result
+        finally:
+            slot.release()
+
+    def _stream(self, response: http.client.HTTPResponse, file_path: str, deadline: float,
+                url: str) -> DownloadResult:
+        """分块写入文件，不把整个文件读入内存"""
+        length = response.getheader('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise DownloadError(f"文件大小 {length} 超出上限 {self.max_bytes}")
+
+        size, head = 0, b''
+        with open(file_path, 'wb') as f:
+            while True:
+                chunk = response.read(self.chunk_size)
+                if not chunk:
+                    break
+                if not head:
+                    head = chunk[:16]
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise DownloadError(f"文件大小超出上限 {self.max_bytes}")
+                if time.monotonic() > deadline:
+                    raise DownloadError(f"下载超过 {self.total_timeout} 秒")
+                f.write(chunk)
+
+        with self._lock:
+            self._stats["bytes"] += size
+        return DownloadResult(response.status, response.headers, size, guess_extension(head, url))
+
+    def _slot(self, key: HostKey) -> threading.BoundedSemaphore:
+        with self._lock:
+            if key not in self._host_slots:
+                self._host_slots[key] = threading.BoundedSemaphore(self.connections_per_host)
+            return self._host_slots[key]
+
+    def _checkout(self, key: HostKey) -> Tuple[http.client.HTTPConnection, bool]:
+        """取出一个空闲连接，没有或已闲置过久时新建。返回连接以及是否为复用的连接"""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                connection, returned_at = idle.pop()
+                if now - returned_at < Download.IDLE_TIMEOUT:
+                    return connection, True
+                connection.close()
+        return self._new_connection(key), False
+
+    def _checkin(self, key: HostKey, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append((connection, time.monotonic()))
+
+    def _proxy(self, scheme: str, host: str) -> Optional[SplitResult]:
+        """该主机使用的代理，不使用代理时返回 None"""
+        proxy = self.proxies.get(scheme)
+        if not proxy:
+            return None
+        if self._system_proxies:
+            bypass = urllib.request.proxy_bypass(host)
+        else:
+            bypass = urllib.request.proxy_bypass_environment(host, self.proxies)
+        if bypass:
+            return None
+        return urlsplit(proxy if '://' in proxy else f'http://{proxy}')
+
+    def _new_connection(self, key: HostKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        proxy = self._proxy(scheme, host)
+        if proxy is None:
+            connection = connection_class(host, port, timeout=self.connect_timeout)
+        elif scheme == 'https':
+            connection = connection_class(proxy.hostname, proxy.port or 80, timeout=self.connect_timeout)
+            connection.set_tunnel(host, port, headers=_proxy_headers(proxy))
+        else:
+            connection = connection_class(proxy.hostname, proxy.port or 80, timeout=self.connect_timeout)
+        connection.connect()
+        # 连接建立后改用读取超时
+        connection.sock.settimeout(self.read_timeout)
+        return connection
+
+
+def _proxy_headers(proxy: SplitResult) -> Dict[str, str]:
+    """代理地址中带有用户名和密码时的 Proxy-Authorization 请求头"""
+    if proxy.username is None:
+        return {}
+    credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}".encode()
+    return {'Proxy-Authorization': 'Basic ' + base64.b64encode(credentials).decode()}
+
+
+# 全局下载服务，首次使用时创建
+_downloader: Optional[HttpDownloader] = None
+_downloader_lock = threading.Lock()
+
+
+def get_downloader() -> HttpDownloader:
+    """获取全局下载服务"""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = HttpDownloader()
+        return _downloader
@@ -1,4 +1,5 @@
 import hashlib
+import json
 
 
 def get_file_sha256(file_path):
@@ -23,3 +24,17 @@ def get_file_sha256(file_path):
         return sha256_hash.hexdigest()
     except FileNotFoundError:
         return None
+
+
+def get_json_sha256(value):
+    """
+    获取可 JSON 序列化对象的 SHA-256 哈希值，字典按键排序，相同内容得到相同的哈希值
+
+    Args:
+        value: 可 JSON 序列化的对象
+
+    Returns:
+        str: SHA-256 哈希值
+    """
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
@@ -1,11 +1,15 @@
-from typing import Tuple, Optional
+from typing import Dict, Iterable, Tuple, Optional
 
-import cv2
-import numpy as np
 import pyautogui
+import ctypes
 import os
 import sys
 
+from config import Image
+from utils.capture_utils import get_capture_backend
+from utils.match_utils import (locate_template, locate_templates)
+from utils.template_utils import template_registry
+
 
 def get_resource_path(relative_path):
     """获取资源文件的绝对路径"""
@@ -18,70 +22,117 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-def find_image_on_screen(image_path: str, confidence: float = 0.8) -> Optional[Tuple[int, int, int, int]]:
+def get_display_key() -> str:
+    """获取当前显示器的标识（分辨率与DPI），用于缓存模板缩放比例"""
+    screen_width, screen_height = get_capture_backend().screen_size()
+    try:
+        dpi = ctypes.windll.user32.GetDpiForSystem()
+    except (AttributeError, OSError):
+        dpi = 96
+    return f"{screen_width}x{screen_height}@{dpi}"
+
+
+def clip_region(region: Optional[Tuple[int, int, int, int]]) -> Tuple[int, int, int, int]:
+    """
+    将区域裁剪到屏幕范围内，region 为 None 时返回整个屏幕
+
+    Args:
+        region: 区域 (left, top, width, height)
+
+    Returns:
+        屏幕内的区域 (left, top, width, height)
+    """
+    screen_width, screen_height = get_capture_backend().screen_size()
+    if region is None:
+        return 0, 0, screen_width, screen_height
+
+    left, top, width, height = region
+    right, bottom = min(left + width, screen_width), min(top + height, screen_height)
+    left, top = max(0, left), max(0, top)
+    if right <= left or bottom <= top:
+        return 0, 0, screen_width, screen_height
+    return left, top, right - left, bottom - top
+
+
+def find_image_on_screen(image_path: str, confidence: float = Image.CONFIDENCE,
+                         region: Optional[Tuple[int, int, int, int]] = None,
+                         log_miss: bool = True) -> Optional[Tuple[int, int, int, int]]:
     """
     在屏幕上查找指定图像
 
     Args:
         image_path: 图片文件路径
-        confidence: 匹配度阈值，范围0-1，默认0.8
+        confidence: 匹配度阈值，范围0-1，默认为 ImageConfig.CONFIDENCE
+        region: 搜索区域 (left, top, width, height)，通常为微信窗口的矩形，默认为整个屏幕
+        log_miss: 未找到时是否打印最高匹配度，轮询等待时关闭
 
     Returns:
         匹配区域的坐标 (left, top, width, height)，如果没有找到则返回None
     """
     try:
-        # 使用资源路径处理函数获取正确的图片路径
-        full_image_path = get_resource_path(image_path)
-
-        # 读取模板图像
-        template = cv2.imread(full_image_path, cv2.IMREAD_UNCHANGED)
+        # 从注册表获取已预加载的模板，避免每次从磁盘解码
+        template = template_registry.get(image_path)
         if template is None:
-            print(f"无法加载图片: {full_image_path}")
             return None
 
-        # 获取当前屏幕截图
-        screenshot = pyautogui.screenshot()
-        screen_np = np.array(screenshot)
-        screen_bgr = cv2.cvtColor(screen_np, cv2.COLOR_RGB2BGR)
+        # 只截取搜索区域，截图写入截图后端复用的缓冲区
+        region = clip_region(region)
+        screen_bgr = get_capture_backend().grab(region)
 
-        # 进行模板匹配
-        result = cv2.matchTemplate(screen_bgr, template, cv2.TM_CCOEFF_NORMED)
+        # 先搜索上次命中位置附近，未命中再搜索整个区域
+        return locate_template(screen_bgr, template, confidence, origin=region[:2], display_key=get_display_key(),
+                               log_miss=log_miss)
 
-        # 找到最大匹配值的位置
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+    except Exception as e:
+        print(f"查找图像时发生错误: {str(e)}")
+        return None
 
-        if max_val >= confidence:
-            # 获取模板尺寸
-            h, w = template.shape[:2]
 
-            # 返回匹配区域的坐标 (left, top, width, height)
-            return max_loc[0], max_loc[1], w, h
-        else:
-            print(f"未找到匹配图像，最高匹配度: {max_val:.2f}, 阈值: {confidence}")
-            return None
+def find_images_on_screen(image_paths: Iterable[str], confidence: float = Image.CONFIDENCE,
+                          region: Optional[Tuple[int, int, int, int]] = None, parallel: bool = False,
+                          log_miss: bool = True) -> Dict[str, Optional[Tuple[int, int, int, int]]]:
+    """
+    截取一次屏幕，在同一帧中查找多个图像
+
+    Args:
+        image_paths: 图片文件路径列表
+        confidence: 匹配度阈值，范围0-1，默认为 ImageConfig.CONFIDENCE
+        region: 搜索区域 (left, top, width, height)，默认为整个屏幕
+        parallel: 是否多线程并行匹配
+        log_miss: 未找到时是否打印最高匹配度，轮询等待时关闭
+
+    Returns:
+        图片路径 -> 匹配区域的坐标 (left, top, width, height)，没有找到的图片对应 None
+    """
+    image_paths = list(image_paths)
+    hits = dict.fromkeys(image_paths)
+    try:
+        templates = [template for template in map(template_registry.get, image_paths) if template is not None]
+        if not templates:
+            return hits
 
+        region = clip_region(region)
+        screen_bgr = get_capture_backend().grab(region)
+
+        hits.update(locate_templates(screen_bgr, templates, confidence, origin=region[:2],
+                                     display_key=get_display_key(), parallel=parallel, log_miss=log_miss))
     except Exception as e:
         print(f"查找图像时发生错误: {str(e)}")
-        return None
+    return hits
 
 
-def click_below_image(image_path: str, offset_y: int = 50, confidence: float = 0.8) -> bool:
+def click_below(coords: Optional[Tuple[int, int, int, int]], offset_y: int = 50) -> bool:
     """
-    识别图片并在识别结果下方offset_y像素处点击
+    在已识别区域下方offset_y像素处点击
 
     Args:
-        image_path: 图片文件路径
+        coords: 识别区域 (left, top, width, height)，为 None 时不点击
         offset_y: 在识别结果下方多少像素处点击，默认50像素
-        confidence: 匹配度阈值，范围0-1，默认0.8
 
     Returns:
         是否成功点击
     """
-    # 查找图像
-    coords = find_image_on_screen(image_path, confidence)
-
     if coords is None:
-        print(f"未找到图像: {image_path}")
         return False
 
     left, top, width, height = coords
@@ -103,3 +154,27 @@ def click_below_image(image_path: str, offset_y: int = 50, confidence: float = 0
     except Exception as e:
         print(f"点击时发生错误: {str(e)}")
         return False
+
+
+def click_below_image(image_path: str, offset_y: int = 50, confidence: float = Image.CONFIDENCE,
+                      region: Optional[Tuple[int, int, int, int]] = None) -> bool:
+    """
+    识别图片并在识别结果下方offset_y像素处点击
+
+    Args:
+        image_path: 图片文件路径
+        offset_y: 在识别结果下方多少像素处点击，默认50像素
+        confidence: 匹配度阈值，范围0-1，默认为 ImageConfig.CONFIDENCE
+        region: 搜索区域 (left, top, width, height)，默认为整个屏幕
+
+    Returns:
+        是否成功点击
+    """
+    # 查找图像
+    coords = find_image_on_screen(image_path, confidence, region)
+
+    if coords is None:
+        print(f"未找到图像: {image_path}")
+        return False
+
+    return click_below(coords, offset_y)
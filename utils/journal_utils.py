@@ -0,0 +1,293 @@
+"""
+任务日志：排队的发送任务先写入 SQLite（WAL 模式）再进入内存队列，进程崩溃或重启后可以恢复。
+需要结果的写操作（记录新任务等）由调用方在自己的线程中提交：等待提交锁期间其他线程积压的写操作，
+由取得锁的调用方合并为一个事务提交（group commit），突发入队时只需少量提交。
+更新任务状态不等待提交，只加入积压队列，由后台线程或下一个提交的调用方一并提交，界面线程不等待磁盘。
+每个写操作在单独的保存点中执行，失败时只回滚该写操作
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+from config import Journal
+
+QUEUED = 'queued'
+SENDING = 'sending'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    deadline REAL,
+    state TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state);
+"""
+
+
+class JournaledTask:
+    """
+    从日志中恢复的任务
+
+    Attributes:
+    ----------
+    task_id: int
+        任务编号
+    source: str
+        任务来源
+    payload: dict
+        任务内容，包含 task_id、chat_names、messages、image_urls
+    priority: int
+        优先级
+    deadline: Optional[float]
+        截止时间
+    state: str
+        崩溃前的状态
+    """
+
+    def __init__(self, task_id: int, source: str, payload: dict, priority: int, deadline: Optional[float],
+                 state: str):
+        self.task_id = task_id
+        self.source = source
+        self.payload = payload
+        self.priority = priority
+        self.deadline = deadline
+        self.state = state
+
+
+class _Write:
+    """等待提交的写操作"""
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any], wait: bool = True):
+        self.fn = fn
+        self.wait = wait  # 为 False 时没有调用方等待结果，失败只打印
+        self.result = None
+        self.error: Optional[Exception] = None
+        self.done = False
+
+
+class TaskJournal:
+    """
+    基于 SQLite WAL 的持久化任务日志。
+
+    Attributes:
+    ----------
+    path: str
+        数据库文件路径
+    max_batch: int
+        一个事务最多合并的写操作数
+    """
+
+    def __init__(self, path: str = Journal.PATH, synchronous: str = Journal.SYNCHRONOUS,
+                 max_batch: int = Journal.MAX_BATCH, write_timeout: float = Journal.WRITE_TIMEOUT):
+        self.path = os.path.abspath(path)
+        self.max_batch = max_batch
+        self.write_timeout = write_timeout
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 同一时刻只有一个负责提交的调用方使用连接
+        self._connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(f'PRAGMA synchronous={synchronous}')
+        self._connection.executescript(SCHEMA)
+        self._pending: List[_Write] = []
+        self._closed = False
+        self._commits = 0
+        self._writes = 0
+        self._lock = threading.Lock()  # 保护 _pending 和统计
+        self._commit_lock = threading.Lock()  # 同一时刻只有一个调用方提交
+        # 后台提交不等待的写操作（任务状态更新）
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='journal-flusher', daemon=True)
+        self._flusher.start()
+
+    # ---------------------------------------------------------------- 公共接口
+
+    def add(self, source: str, chat_names: List[str], messages: Optional[List[str]],
+            image_urls: Optional[List[str]], priority: int = 0, deadline: Optional[float] = None,
+            task_id: Optional[str] = None) -> int:
+        """
+        记录新任务，提交后才返回
+
+        Args:
+            task_id: 生产者看到的任务编号，恢复后发布结果时沿用
+
+        Returns:
+            int: 日志中的任务编号
+        """
+        payload = json.dumps({"task_id": task_id, "chat_names": chat_names, "messages": messages,
+                              "image_urls": image_urls}, ensure_ascii=False)
+        now = time.time()
+        return self._submit(lambda connection: connection.execute(
+            'INSERT INTO tasks (source, payload, priority, deadline, state, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', (source, payload, priority, deadline, QUEUED, now, now)).lastrowid)
+
+    def mark(self, task_ids: Iterable[int], state: str, error: Optional[str] = None) -> None:
+        """更新任务状态，只加入积压队列、不等待提交，也不抛出异常（日志已关闭时打印后丢弃）"""
+        rows = [(state, error, time.time(), task_id) for task_id in task_ids if task_id is not None]
+        if not rows:
+            return
+        write = _Write(lambda connection: connection.executemany(
+            'UPDATE tasks SET state = ?, error = ?, updated_at = ? WHERE id = ?', rows), wait=False)
+        with self._lock:
+            if self._closed:
+                print(f"任务日志已关闭，未记录任务状态 {state}: {[row[3] for row in rows]}")
+                return
+            self._pending.append(write)
+        self._wakeup.set()
+
+    def recover(self, resend_interrupted: bool = Journal.RESEND_INTERRUPTED) -> List[JournaledTask]:
+        """
+        取出上次运行未完成的任务。发送中被中断的任务可能已经部分发出，默认标记为失败而不重发
+
+        Args:
+            resend_interrupted: 是否重发发送中被中断的任务
+
+        Returns:
+            List[JournaledTask]: 未完成的任务，按编号排序；state 为 SENDING 的是被中断的任务，
+            不重发时已标记为失败，由调用方报告其结果
+        """
+        def recover(connection: sqlite3.Connection) -> List[JournaledTask]:
+            rows = connection.execute('SELECT id, source, payload, priority, deadline, state FROM tasks '
+                                      'WHERE state IN (?, ?) ORDER BY id', (QUEUED, SENDING)).fetchall()
+            if not resend_interrupted:
+                connection.execute('UPDATE tasks SET state = ?, error = ?, updated_at = ? WHERE state = ?',
+                                   (FAILED, 'interrupted', time.time(), SENDING))
+            return [JournaledTask(task_id, source, json.loads(payload), priority, deadline, state)
+                    for task_id, source, payload, priority, deadline, state in rows]
+
+        return self._submit(recover)
+
+    def purge(self, days: float = Journal.RETENTION_DAYS) -> int:
+        """
+        删除早于指定天数的已完成或失败任务
+
+        Returns:
+            int: 删除的任务数
+        """
+        cutoff = time.time() - days * 86400
+        return self._submit(lambda connection: connection.execute(
+            'DELETE FROM tasks WHERE state IN (?, ?) AND updated_at < ?', (DONE, FAILED, cutoff)).rowcount)
+
+    def counts(self) -> dict:
+        """各状态的任务数"""
+        return self._submit(lambda connection: dict(connection.execute(
+            'SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall()))
+
+    def get_stats(self) -> dict:
+        """写操作数与事务提交次数，两者之比即平均每次提交合并的写操作数"""
+        with self._lock:
+            return {"writes": self._writes, "commits": self._commits, "pending": len(self._pending)}
+
+    def close(self) -> None:
+        """提交剩余的写操作后关闭"""
+        with self._lock:
+            self._closed = True
+        # 后台线程提交完积压的状态更新后退出
+        self._wakeup.set()
+        self._flusher.join(timeout=self.write_timeout)
+        # 需要结果的写操作由各自的调用方提交，取得提交锁即说明当前没有提交在进行
+        if self._commit_lock.acquire(timeout=self.write_timeout):
+            self._commit_lock.release()
+        self._connection.close()
+
+    # ---------------------------------------------------------------- 内部实现
+
+    def _submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        执行写操作并等待提交
+
+        Raises:
+            RuntimeError: 任务日志已关闭
+            TimeoutError: write_timeout 秒内未能取得提交锁
+        """
+        write = _Write(fn)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("任务日志已关闭")
+            self._pending.append(write)
+        if not self._commit_lock.acquire(timeout=self.write_timeout):
+            raise TimeoutError(f"任务日志写入超过 {self.write_timeout} 秒未完成")
+        try:
+            # 写操作可能已由前一个取得锁的调用方一并提交
+            self._drain(lambda: not write.done)
+        finally:
+            self._commit_lock.release()
+        if write.error:
+            raise write.error
+        return write.result
+
+    def _flush_loop(self) -> None:
+        """后台提交积压的写操作，日志关闭且积压清空后退出"""
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._commit_lock:
+                self._drain(lambda: bool(self._pending))
+            with self._lock:
+                if self._closed and not self._pending:
+                    return
+
+    def _drain(self, more: Callable[[], bool]) -> None:
+        """持有提交锁时调用，按 max_batch 分批提交积压的写操作，直到 more 返回 False"""
+        while more():
+            with self._lock:
+                if len(self._pending) <= self.max_batch:
+                    batch, self._pending = self._pending, []
+                else:
+                    batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # 提交失败只影响本批写操作
+                for item in batch:
+                    item.error = item.error or e
+            with self._lock:
+                self._commits += 1
+                self._writes += len(batch)
+            for item in batch:
+                if item.error and not item.wait:
+                    print(f"任务日志写入失败: {item.error}")
+                item.done = True
+
+    def _commit(self, batch: List[_Write]) -> None:
+        connection = self._connection
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')  # 上一次异常留下的事务
+        connection.execute('BEGIN')
+        try:
+            if len(batch) == 1:
+                # 只有一个写操作时不需要保存点，失败时回滚整个事务
+                write = batch[0]
+                try:
+                    write.result = write.fn(connection)
+                except Exception as e:
+                    write.error = e
+                    connection.execute('ROLLBACK')
+                    return
+            else:
+                for write in batch:
+                    connection.execute('SAVEPOINT write')
+                    try:
+                        write.result = write.fn(connection)
+                    except Exception as e:
+                        write.error = e
+                        connection.execute('ROLLBACK TO write')
+                    connection.execute('RELEASE write')
+            connection.execute('COMMIT')
+        except Exception:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
@@ -0,0 +1,67 @@
+"""JSON 解码：按配置选择解码器，已安装 orjson 时默认使用 orjson，否则使用标准库 json，也可以通过 set_json_decoder 替换"""
+
+import json
+import threading
+from typing import Any, Callable, Optional, Union
+
+from config import Mqtt
+
+JsonDecoder = Callable[[Union[bytes, str]], Any]
+
+DECODER_AUTO = 'auto'
+DECODER_ORJSON = 'orjson'
+DECODER_JSON = 'json'
+
+
+def _orjson_decoder() -> Optional[JsonDecoder]:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson.loads
+
+
+def create_json_decoder(name: str = Mqtt.JSON_DECODER) -> JsonDecoder:
+    """
+    按名称创建 JSON 解码器
+
+    Args:
+        name: auto、orjson 或 json
+
+    Returns:
+        JsonDecoder: 接受 UTF-8 字节串或字符串，解码失败时抛出 ValueError
+
+    Raises:
+        ValueError: 名称未知，或指定 orjson 但未安装
+    """
+    if name == DECODER_JSON:
+        return json.loads
+    if name in (DECODER_AUTO, DECODER_ORJSON):
+        decoder = _orjson_decoder()
+        if decoder is not None:
+            return decoder
+        if name == DECODER_ORJSON:
+            raise ValueError("未安装 orjson")
+        return json.loads
+    raise ValueError(f"未知的 JSON 解码器: {name}")
+
+
+# 全局 JSON 解码器，首次使用时按配置创建
+_json_decoder: Optional[JsonDecoder] = None
+_json_decoder_lock = threading.Lock()
+
+
+def get_json_decoder() -> JsonDecoder:
+    """获取全局 JSON 解码器"""
+    global _json_decoder
+    with _json_decoder_lock:
+        if _json_decoder is None:
+            _json_decoder = create_json_decoder()
+        return _json_decoder
+
+
+def set_json_decoder(decoder: JsonDecoder) -> None:
+    """替换全局 JSON 解码器"""
+    global _json_decoder
+    with _json_decoder_lock:
+        _json_decoder = decoder
@@ -0,0 +1,230 @@
+"""模板匹配算法，只依赖 OpenCV/NumPy，可脱离桌面环境运行"""
+
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Image
+from utils.template_utils import Template
+
+# (left, top, width, height)
+Box = Tuple[int, int, int, int]
+
+MODE_EXACT = 'exact'  # 单一尺度全分辨率匹配
+MODE_PYRAMID = 'pyramid'  # 先在缩小的图像上粗匹配，再在全分辨率下精修
+
+# 粗匹配时模板的最小边长，小于该值时直接做全分辨率匹配
+MIN_COARSE_SIZE = 8
+
+# 多模板并行匹配的线程池，OpenCV 匹配时会释放 GIL
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# 显示器 -> 命中的模板缩放比例
+_display_scales: Dict[str, float] = {}
+_display_scales_lock = threading.Lock()
+
+
+def get_display_scale(display_key: Optional[str]) -> Optional[float]:
+    """获取显示器已缓存的模板缩放比例"""
+    return _display_scales.get(display_key) if display_key else None
+
+
+def reset_display_scales() -> None:
+    """清空缓存的显示器缩放比例（例如修改了系统缩放设置后）"""
+    with _display_scales_lock:
+        _display_scales.clear()
+
+
+def _set_display_scale(display_key: Optional[str], scale: float) -> None:
+    if display_key:
+        with _display_scales_lock:
+            _display_scales[display_key] = scale
+
+
+def _match(screen: np.ndarray, image: np.ndarray, mask: Optional[np.ndarray]) -> Tuple[float, Tuple[int, int]]:
+    screen_h, screen_w = screen.shape[:2]
+    image_h, image_w = image.shape[:2]
+    if screen_h < image_h or screen_w < image_w:
+        return -1.0, (0, 0)
+
+    result = cv2.matchTemplate(screen, image, cv2.TM_CCOEFF_NORMED, mask=mask)
+    if mask is not None:
+        # 带掩码匹配时平坦区域会产生 inf/nan
+        result[~np.isfinite(result)] = 0
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, max_loc
+
+
+def match_template(screen: np.ndarray, template: Template, scale: float = 1.0) -> Tuple[float, Tuple[int, int]]:
+    """
+    在截图中执行一次 TM_CCOEFF_NORMED 匹配。
+
+    Args:
+        screen: BGR 截图
+        template: 模板
+        scale: 模板缩放比例
+
+    Returns:
+        (最高匹配度, 最高匹配位置的左上角坐标)，截图小于模板时匹配度为 -1
+    """
+    image, _, mask = template.get_variant(scale)
+    return _match(screen, image, mask)
+
+
+def pyramid_match(screen: np.ndarray, template: Template, scale: float = 1.0,
+                  coarse_screen: Optional[np.ndarray] = None,
+                  coarse_factor: float = Image.COARSE_FACTOR) -> Tuple[float, Tuple[int, int]]:
+    """
+    由粗到细的模板匹配：先在缩小的灰度图上定位最佳候选，再只在候选附近做全分辨率匹配。
+
+    Args:
+        screen: BGR 截图
+        template: 模板
+        scale: 模板缩放比例
+        coarse_screen: 预先缩小的灰度截图，为 None 时在此计算
+        coarse_factor: 粗匹配的缩小比例
+
+    Returns:
+        (最高匹配度, 最高匹配位置的左上角坐标)
+    """
+    image = template.get_variant(scale)[0]
+    image_h, image_w = image.shape[:2]
+    if min(image_h, image_w) * coarse_factor < MIN_COARSE_SIZE:
+        return match_template(screen, template, scale)
+
+    if coarse_screen is None:
+        coarse_screen = downscale_gray(screen, coarse_factor)
+    _, coarse_gray, coarse_mask = template.get_variant(scale * coarse_factor)
+    coarse_val, (coarse_x, coarse_y) = _match(coarse_screen, coarse_gray, coarse_mask)
+    if coarse_val < 0:
+        return coarse_val, (0, 0)
+
+    # 粗匹配的坐标误差约为 1/coarse_factor 像素，在其周围留出余量后精修
+    margin = int(math.ceil(2 / coarse_factor)) + 2
+    screen_h, screen_w = screen.shape[:2]
+    left = max(0, int(coarse_x / coarse_factor) - margin)
+    top = max(0, int(coarse_y / coarse_factor) - margin)
+    right = min(screen_w, left + image_w + 2 * margin)
+    bottom = min(screen_h, top + image_h + 2 * margin)
+    max_val, (x, y) = match_template(screen[top:bottom, left:right], template, scale)
+    return max_val, (left + x, top + y)
+
+
+def downscale_gray(screen: np.ndarray, factor: float) -> np.ndarray:
+    """将 BGR 截图转为灰度并按比例缩小"""
+    gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+
+def locate_template(screen: np.ndarray, template: Template, confidence: float = Image.CONFIDENCE,
+                    origin: Tuple[int, int] = (0, 0), padding: int = Image.LAST_HIT_PADDING,
+                    mode: str = Image.MATCH_MODE, display_key: Optional[str] = None,
+                    coarse_screen: Optional[np.ndarray] = None, log_miss: bool = True) -> Optional[Box]:
+    """
+    在截图中定位模板。先在上次命中位置附近的小窗口内搜索，未命中时再扩大到整张截图。
+
+    显示器的缩放比例未知时依次尝试 Image.SCALE_FACTORS 中的比例，命中的比例按 display_key 缓存，
+    之后该显示器只使用这一比例匹配。
+
+    Args:
+        screen: BGR 截图
+        template: 模板
+        confidence: 匹配度阈值
+        origin: 截图左上角对应的屏幕坐标
+        padding: 上次命中位置向四周扩展的像素数
+        mode: 匹配方式，MODE_EXACT 或 MODE_PYRAMID
+        display_key: 显示器标识，用于缓存命中的缩放比例
+        coarse_screen: pyramid 模式下预先缩小的灰度截图，为 None 时在需要时计算
+        log_miss: 未找到时是否打印最高匹配度，轮询等待时关闭
+
+    Returns:
+        匹配区域的屏幕坐标 (left, top, width, height)，未找到返回 None
+    """
+    origin_x, origin_y = origin
+    screen_h, screen_w = screen.shape[:2]
+    cached_scale = get_display_scale(display_key)
+    scales = (cached_scale,) if cached_scale is not None else Image.SCALE_FACTORS
+
+    if template.last_hit is not None and template.last_scale in scales:
+        image = template.get_variant(template.last_scale)[0]
+        image_h, image_w = image.shape[:2]
+        hit_x, hit_y = template.last_hit[0] - origin_x, template.last_hit[1] - origin_y
+        left, top = max(0, hit_x - padding), max(0, hit_y - padding)
+        right = min(screen_w, hit_x + image_w + padding)
+        bottom = min(screen_h, hit_y + image_h + padding)
+        if right > left and bottom > top:
+            max_val, (x, y) = match_template(screen[top:bottom, left:right], template, template.last_scale)
+            if max_val >= confidence:
+                template.record_match(True, from_memory=True)
+                template.last_hit = (origin_x + left + x, origin_y + top + y)
+                return template.last_hit + (image_w, image_h)
+
+    if mode == MODE_PYRAMID and coarse_screen is None:
+        coarse_screen = downscale_gray(screen, Image.COARSE_FACTOR)
+
+    best_val = -1.0
+    for scale in scales:
+        if mode == MODE_PYRAMID:
+            max_val, (x, y) = pyramid_match(screen, template, scale, coarse_screen=coarse_screen)
+        else:
+            max_val, (x, y) = match_template(screen, template, scale)
+        best_val = max(best_val, max_val)
+        if max_val >= confidence:
+            _set_display_scale(display_key, scale)
+            template.record_match(True)
+            template.last_hit = (origin_x + x, origin_y + y)
+            template.last_scale = scale
+            image_h, image_w = template.get_variant(scale)[0].shape[:2]
+            return template.last_hit + (image_w, image_h)
+
+    template.record_match(False)
+    if log_miss:
+        print(f"未找到匹配图像，最高匹配度: {best_val:.2f}, 阈值: {confidence}")
+    return None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Image.MATCH_WORKERS, thread_name_prefix='template-match')
+        return _executor
+
+
+def locate_templates(screen: np.ndarray, templates: Iterable[Template], confidence: float = Image.CONFIDENCE,
+                     origin: Tuple[int, int] = (0, 0), mode: str = Image.MATCH_MODE,
+                     display_key: Optional[str] = None, parallel: bool = False,
+                     log_miss: bool = True) -> Dict[str, Optional[Box]]:
+    """
+    在同一张截图中定位多个模板，截图及其缩小后的灰度图只计算一次。
+
+    Args:
+        screen: BGR 截图
+        templates: 模板列表
+        confidence: 匹配度阈值
+        origin: 截图左上角对应的屏幕坐标
+        mode: 匹配方式，MODE_EXACT 或 MODE_PYRAMID
+        display_key: 显示器标识，用于缓存命中的缩放比例
+        parallel: 是否在线程池中并行匹配各模板
+        log_miss: 未找到时是否打印最高匹配度
+
+    Returns:
+        Dict[str, Optional[Box]]: 模板路径 -> 匹配区域的屏幕坐标，未找到为 None
+    """
+    templates = list(templates)
+    coarse_screen = downscale_gray(screen, Image.COARSE_FACTOR) if mode == MODE_PYRAMID else None
+
+    def locate(template: Template) -> Optional[Box]:
+        return locate_template(screen, template, confidence, origin=origin, mode=mode, display_key=display_key,
+                               coarse_screen=coarse_screen, log_miss=log_miss)
+
+    if parallel and len(templates) > 1:
+        boxes = list(_get_executor().map(locate, templates))
+    else:
+        boxes = [locate(template) for template in templates]
+    return {template.path: box for template, box in zip(templates, boxes)}
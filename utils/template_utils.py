@@ -0,0 +1,205 @@
+"""模板图像注册表，模板只从磁盘解码一次并缓存其预计算变体"""
+
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Image
+from utils.file_io_utils import get_resource_path
+
+
+class Template:
+    """
+    已加载的模板图像。
+
+    图像统一保存为与屏幕截图一致的 BGR 三通道格式；PNG 自带的 alpha 通道被拆分为单通道匹配掩码，
+    而不是作为第4个通道参与匹配。
+
+    Attributes:
+    ----------
+    path: str
+        模板的相对路径（注册表中的键）
+    image: np.ndarray
+        BGR 模板图像
+    gray: np.ndarray
+        灰度模板图像
+    mask: Optional[np.ndarray]
+        alpha 掩码，完全不透明的模板为 None
+    variants: Dict[float, Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]]
+        缩放比例 -> (BGR, 灰度, 掩码)
+    last_hit: Optional[Tuple[int, int]]
+        上次命中位置左上角的屏幕坐标
+    last_scale: float
+        上次命中时使用的缩放比例
+    """
+
+    def __init__(self, path: str, image: np.ndarray, mask: Optional[np.ndarray] = None):
+        self.path = path
+        self.image = image
+        self.mask = mask
+        self.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.height, self.width = image.shape[:2]
+        self.variants = {1.0: (self.image, self.gray, self.mask)}
+        self.match_hits = 0
+        self.match_misses = 0
+        self.memory_hits = 0
+        self.last_hit: Optional[Tuple[int, int]] = None
+        self.last_scale: float = 1.0
+        self._lock = threading.Lock()
+
+    def get_variant(self, scale: float) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        获取指定缩放比例的模板变体，首次访问时计算并缓存。
+
+        Args:
+            scale: 缩放比例，1.0 表示原始尺寸
+
+        Returns:
+            (BGR 图像, 灰度图像, 掩码)
+        """
+        variant = self.variants.get(scale)
+        if variant is not None:
+            return variant
+
+        width = max(1, int(round(self.width * scale)))
+        height = max(1, int(round(self.height * scale)))
+        # 缩小用 INTER_AREA 抗锯齿，放大用 INTER_LINEAR
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        image = cv2.resize(self.image, (width, height), interpolation=interpolation)
+        gray = cv2.resize(self.gray, (width, height), interpolation=interpolation)
+        mask = None
+        if self.mask is not None:
+            mask = cv2.resize(self.mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+        with self._lock:
+            return self.variants.setdefault(scale, (image, gray, mask))
+
+    def record_match(self, found: bool, from_memory: bool = False) -> None:
+        """记录一次匹配结果"""
+        with self._lock:
+            if found:
+                self.match_hits += 1
+                if from_memory:
+                    self.memory_hits += 1
+            else:
+                self.match_misses += 1
+
+
+def load_template(path: str, full_path: str) -> Optional[Template]:
+    """
+    从磁盘读取模板并转换为屏幕截图的通道布局。
+
+    Args:
+        path: 模板的相对路径
+        full_path: 模板的绝对路径
+
+    Returns:
+        Template 对象，读取失败返回 None
+    """
+    # cv2.imread 不支持中文路径，使用 imdecode 读取
+    try:
+        data = np.fromfile(full_path, dtype=np.uint8)
+    except (FileNotFoundError, OSError):
+        return None
+    raw = cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+    if raw is None:
+        return None
+
+    mask = None
+    if raw.ndim == 2:
+        image = cv2.cvtColor(raw, cv2.COLOR_GRAY2BGR)
+    elif raw.shape[2] == 4:
+        image = np.ascontiguousarray(raw[:, :, :3])
+        alpha = raw[:, :, 3]
+        # 完全不透明时不需要掩码，避免走较慢的带掩码匹配
+        if not np.all(alpha == 255):
+            mask = np.ascontiguousarray(alpha)
+    else:
+        image = raw
+
+    return Template(path, image, mask)
+
+
+class TemplateRegistry:
+    """
+    模板注册表，每个模板只从磁盘加载一次。
+
+    Attributes:
+    ----------
+    downscale_factors: Tuple[float, ...]
+        加载时预计算的缩小比例
+    """
+
+    def __init__(self, downscale_factors: Iterable[float] = Image.DOWNSCALE_FACTORS):
+        self.downscale_factors = tuple(downscale_factors)
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._load_failures = 0
+
+    def get(self, image_path: str) -> Optional[Template]:
+        """
+        获取模板，未加载时从磁盘读取并缓存。
+
+        Args:
+            image_path: 图片相对路径
+
+        Returns:
+            Template 对象，无法加载时返回 None
+        """
+        template = self._templates.get(image_path)
+        if template is not None:
+            with self._lock:
+                self._hits += 1
+            return template
+
+        full_path = get_resource_path(image_path)
+        template = load_template(image_path, full_path)
+        with self._lock:
+            self._misses += 1
+            if template is None:
+                self._load_failures += 1
+                print(f"无法加载图片: {full_path}")
+                return None
+            template = self._templates.setdefault(image_path, template)
+
+        for scale in self.downscale_factors:
+            template.get_variant(scale)
+        return template
+
+    def preload(self, *image_paths: str) -> None:
+        """预加载模板"""
+        for image_path in image_paths:
+            self.get(image_path)
+
+    def clear(self) -> None:
+        """清空缓存的模板及统计信息"""
+        with self._lock:
+            self._templates.clear()
+            self._hits = self._misses = self._load_failures = 0
+
+    def get_stats(self) -> dict:
+        """
+        获取注册表统计信息。
+
+        Returns:
+            dict: 缓存命中/未命中次数以及每个模板的匹配命中/未命中次数
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "load_failures": self._load_failures,
+                "templates": {
+                    path: {"match_hits": t.match_hits, "match_misses": t.match_misses,
+                           "memory_hits": t.memory_hits}
+                    for path, t in self._templates.items()
+                },
+            }
+
+
+# 全局模板注册表
+template_registry = TemplateRegistry()
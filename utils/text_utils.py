@@ -0,0 +1,61 @@
+"""文本处理，emoji 统计与防吞字填充"""
+
+import re
+
+ZWSP = '\u200b'
+
+# 微信会“吞掉”的字符集合。原先逐段列出的区间合并后为以下几项（U+24C2 之后的区间已覆盖
+# 表情、符号、CJK 字符以及全部辅助平面字符），模块加载时编译一次。
+EMOJI_PATTERN = re.compile("["
+                           "\u200d"  # zero width joiner
+                           "\u231a"
+                           "\u23cf"
+                           "\u23e9"
+                           "\u24c2-\U0010ffff"
+                           "]+", flags=re.UNICODE)
+
+
+def count_emoji(text: str) -> int:
+    """
+    统计文本中需要填充零宽空格的字符数量
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: 字符数量
+
+    Examples:
+        >>> count_emoji('hello 👋')
+        1
+    """
+    # 纯 ASCII 文本不含任何匹配字符
+    if text.isascii():
+        return 0
+    return sum(map(len, EMOJI_PATTERN.findall(text)))
+
+
+def insert_zwsp_after_emoji(text: str) -> str:
+    """
+    统计文本中emoji的数量，在整个字符串末尾添加相应数量的零宽空格 \u200b，避免微信吞字问题。
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        str: 填充后的文本
+    """
+    return text + ZWSP * count_emoji(text)
+
+
+def normalize_text(text: str) -> str:
+    """
+    统一换行符为 \\n
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        str: 处理后的文本
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n')
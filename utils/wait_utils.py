@@ -0,0 +1,124 @@
+"""条件等待：轮询就绪条件并在满足时立即返回，同时记录每类等待的实际耗时，用于根据数据调整 IntervalConfig"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Interval
+from utils.capture_utils import get_capture_backend
+
+
+class WaitStats:
+    """
+    按名称记录条件等待的实际耗时
+
+    Attributes:
+    ----------
+    max_samples: int
+        每类等待保留的最近样本数
+    """
+
+    def __init__(self, max_samples: int = 500):
+        self.max_samples = max_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._timeouts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed: float, satisfied: bool) -> None:
+        """记录一次等待"""
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.max_samples)).append(elapsed)
+            if not satisfied:
+                self._timeouts[name] = self._timeouts.get(name, 0) + 1
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        获取各类等待的统计信息
+
+        Returns:
+            dict: 名称 -> {count, timeouts, mean_ms, p50_ms, p95_ms, max_ms}
+        """
+        with self._lock:
+            items = {name: list(samples) for name, samples in self._samples.items()}
+            timeouts = dict(self._timeouts)
+
+        result = {}
+        for name, samples in items.items():
+            samples_ms = np.array(samples) * 1000
+            result[name] = {
+                "count": len(samples),
+                "timeouts": timeouts.get(name, 0),
+                "mean_ms": round(float(samples_ms.mean()), 1),
+                "p50_ms": round(float(np.percentile(samples_ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(samples_ms, 95)), 1),
+                "max_ms": round(float(samples_ms.max()), 1),
+            }
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._timeouts.clear()
+
+
+# 全局等待统计
+wait_stats = WaitStats()
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = Interval.WAIT_TIMEOUT,
+               interval: float = Interval.POLL_INTERVAL, name: Optional[str] = None) -> bool:
+    """
+    轮询条件直到满足或超时
+
+    Args:
+        condition: 就绪条件，返回 True 表示已就绪；抛出的异常视为未就绪
+        timeout: 最长等待时间（秒）
+        interval: 轮询间隔（秒）
+        name: 等待名称，指定时记录到 wait_stats
+
+    Returns:
+        bool: 条件是否在超时前满足
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    while True:
+        try:
+            satisfied = bool(condition())
+        except Exception:
+            satisfied = False
+        now = time.perf_counter()
+        if satisfied or now >= deadline:
+            break
+        time.sleep(min(interval, deadline - now))
+
+    if name:
+        wait_stats.record(name, time.perf_counter() - start, satisfied)
+    return satisfied
+
+
+def region_changed(region: Tuple[int, int, int, int], min_pixels: int = Interval.REGION_CHANGE_PIXELS,
+                   threshold: int = 32) -> Callable[[], bool]:
+    """
+    创建“屏幕区域发生变化”条件，调用时立即截取区域作为基准
+
+    Args:
+        region: 屏幕区域 (left, top, width, height)
+        min_pixels: 至少多少像素变化才视为发生变化，用于忽略光标闪烁
+        threshold: 灰度差超过该值的像素视为变化
+
+    Returns:
+        Callable[[], bool]: 条件函数
+    """
+    backend = get_capture_backend()
+    # 截图后端可能复用缓冲区，基准图必须复制
+    baseline = backend.grab_gray(region).copy()
+
+    def condition() -> bool:
+        diff = cv2.absdiff(backend.grab_gray(region), baseline)
+        return cv2.countNonZero(cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)[1]) >= min_pixels
+
+    return condition
@@ -25,7 +25,16 @@ def minimize_wechat(class_name, name):
         win32gui.SendMessage(hwnd, win32con.WM_CLOSE, 0, 0)
 
 
-def wake_up_window(process_name: str = WeChat.WeChat_PROCESS_NAME) -> bool:
+def get_wechat_exe_path(process_name: str = WeChat.WeChat_PROCESS_NAME) -> str:
+    """
+    获取微信可执行文件路径
+
+    Args:
+        process_name(str): 微信进程名
+
+    Returns:
+        str: 可执行文件路径，找不到时返回空字符串
+    """
     # 方法1：从注册表获取（如果已安装但未运行）
     try:
         key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE,
@@ -34,15 +43,41 @@ def wake_up_window(process_name: str = WeChat.WeChat_PROCESS_NAME) -> bool:
         winreg.CloseKey(key)
         exe_path = os.path.join(path, process_name)
         if os.path.exists(exe_path):
-            subprocess.Popen(exe_path)
-            return True
+            return exe_path
 
     except FileNotFoundError:
         pass
 
     # 方法2：检查微信进程（如果正在运行）
-    if exe_path := get_wechat_path(proc_name=process_name):
+    return get_wechat_path(proc_name=process_name)
+
+
+def wake_up_window(process_name: str = WeChat.WeChat_PROCESS_NAME, exe_path: str = '') -> bool:
+    """
+    启动微信，微信已运行时会唤起其主窗口
+
+    Args:
+        process_name(str): 微信进程名
+        exe_path(str): 已知的可执行文件路径，为空时重新查找
+
+    Returns:
+        bool: 是否成功启动
+    """
+    if exe_path := exe_path or get_wechat_exe_path(process_name):
         subprocess.Popen(exe_path)
         return True
 
     return False
+
+
+def is_window_alive(hwnd: int) -> bool:
+    """
+    窗口句柄是否仍然有效且窗口可见
+
+    Args:
+        hwnd(int): 窗口句柄
+
+    Returns:
+        bool: 窗口存在且可见返回 True
+    """
+    return bool(hwnd) and bool(win32gui.IsWindow(hwnd)) and bool(win32gui.IsWindowVisible(hwnd))